@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: EAAWG_ArraySim
+   :platform: Windows, Linux
+   :synopsis: Array oriented simulation of a complete realization
+
+.. moduleauthor:: Nick Martin <nick.martin@alumni.stanford.edu>
+
+Alternative to the day by day loop in EAAWGmp.WG_Worker_Main. All of the
+random streams for a realization are drawn in bulk at the start. The wet and
+dry state sequence, the precipitation depths, the extreme events, and the
+Tmax and Tmin recursion are then calculated over NumPy arrays.
+
+The same distributions, parameters, and H0_REAL columns are produced as
+with the day by day loop. The random streams are consumed in a different
+order so an individual realization is not identical to the loop version
+for the same seeds.
+
+"""
+# Copyright and License
+"""
+Copyright 2023 Southwest Research Institute
+
+Module Author: Nick Martin <nick.martin@alumni.stanford.edu>
+
+This file is part of a custom weather generator framework with extreme events,
+hereafter WG Framework.
+
+WG Framework is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+WG Framework is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+# imports
+import numpy as np
+import EAAWG_Profile as WGPRF
+
+# parameters
+SPELL_BLOCK = 256
+"""Spell lengths drawn at one time for each month with run length spells"""
+
+
+#--------------------------------------------------------------------------
+# functions
+def drawByMonth( monArr, drawFunc ):
+    """Fill a daily array with values drawn from the distribution for the
+    month of each day.
+
+    Each month is drawn as a single block from drawFunc so that the number
+    of sampler calls is 12 rather than the number of days.
+
+    Args:
+        monArr (np.ndarray): (TotDays,) integer month for each day, 1 - 12
+        drawFunc (function): called as drawFunc( mon, asize ) and returns
+                             an np.ndarray of asize values for month mon
+
+    Returns:
+        outArr (np.ndarray): (TotDays,) drawn values
+
+    """
+    # start
+    outArr = np.zeros( len( monArr ), dtype=np.float64 )
+    for mon in range( 1, 13, 1 ):
+        monIndex = np.flatnonzero( monArr == mon )
+        if len( monIndex ) < 1:
+            continue
+        # end if
+        outArr[monIndex] = drawFunc( mon, len( monIndex ) )
+    # end for
+    # return
+    return outArr
+
+
+def calcStateSequence( startWet, wetSpellArr, drySpellArr ):
+    """Calculate the daily wet and dry state sequence from spell lengths.
+
+    Follows the Markov renewal logic of the day by day loop. A new spell
+    starts on the day that the previous spell is exhausted and uses the
+    spell length sampled for that day.
+
+    Args:
+        startWet (bool): True if the first day is wet
+        wetSpellArr (np.ndarray): (TotDays,) wet spell length for each day
+        drySpellArr (np.ndarray): (TotDays,) dry spell length for each day
+
+    Returns:
+        tuple: (wetArr, startArr) boolean np.ndarray, True on wet days and
+               True on days where the state changed
+
+    """
+    # start
+    totDays = len( wetSpellArr )
+    wetArr = np.zeros( totDays, dtype=bool )
+    startArr = np.zeros( totDays, dtype=bool )
+    isWet = startWet
+    jJ = 0
+    while jJ < totDays:
+        if isWet:
+            spellLen = max( int( wetSpellArr[jJ] ), 1 )
+            wetArr[jJ:jJ+spellLen] = True
+        else:
+            spellLen = max( int( drySpellArr[jJ] ), 1 )
+        # end if
+        if jJ > 0:
+            startArr[jJ] = True
+        # end if
+        jJ += spellLen
+        isWet = not isWet
+    # end while
+    # return
+    return wetArr, startArr
+
+
+def calcSpellRuns( startWet, monArr, Real, block_size=SPELL_BLOCK ):
+    """Calculate the daily wet and dry state sequence from alternating
+    spells, drawing only one spell length per spell.
+
+    Each spell length comes from the distribution for the month of the
+    spell's first day and that month's sampler in the Realization, so
+    there is one draw per spell rather than one per day. The spells are
+    expanded to days with np.repeat.
+
+    Args:
+        startWet (bool): True if the first day is wet
+        monArr (np.ndarray): (TotDays,) integer month for each day, 1 - 12
+        Real (EAAWG_Realization.Realization): realization state, reseeded
+
+    KWargs:
+        block_size (int): spell lengths drawn at one time for each month
+
+    Returns:
+        tuple: (wetArr, startArr) boolean np.ndarray, True on wet days and
+               True on days where the state changed
+
+    """
+    # imports
+    import EAAWG_Dists_Samples as WGDS
+    # start
+    totDays = len( monArr )
+    monList = monArr.tolist()
+    dryBufs = dict()
+    wetBufs = dict()
+    for mon in range( 1, 13, 1 ):
+        dryBufs[mon] = WGDS.BufferedStream( Real.dryDists[mon].ranArray,
+                                            Real.drySamp[mon].ranstate,
+                                            block_size=block_size )
+        wetBufs[mon] = WGDS.BufferedStream( Real.wetDists[mon].ranArray,
+                                            Real.wetSamp[mon].ranstate,
+                                            block_size=block_size )
+    # end for
+    # alternating spells until the days are covered
+    spellLens = list()
+    isWet = startWet
+    jJ = 0
+    while jJ < totDays:
+        if isWet:
+            spellLen = max( int( wetBufs[monList[jJ]].next() ), 1 )
+        else:
+            spellLen = max( int( dryBufs[monList[jJ]].next() ), 1 )
+        # end if
+        spellLens.append( spellLen )
+        jJ += spellLen
+        isWet = not isWet
+    # end while
+    # expand to days, the first spell has the starting state
+    spellLens = np.array( spellLens, dtype=np.int64 )
+    spellWet = ( np.arange( len( spellLens ) ) % 2 ) == ( 0 if startWet else 1 )
+    wetArr = np.repeat( spellWet, spellLens )[:totDays]
+    startArr = np.zeros( totDays, dtype=bool )
+    spellStarts = np.cumsum( spellLens )[:-1]
+    startArr[spellStarts] = True
+    # return
+    return wetArr, startArr
+
+
+def fillWetDepths( wetArr, monArr, Real ):
+    """Draw precipitation depths for the wet days only.
+
+    Args:
+        wetArr (np.ndarray): (TotDays,) boolean, True on wet days
+        monArr (np.ndarray): (TotDays,) integer month for each day, 1 - 12
+        Real (EAAWG_Realization.Realization): realization state, reseeded
+
+    Returns:
+        depthArr (np.ndarray): (TotDays,) depths, 0.0 on dry days
+
+    """
+    # start
+    depthArr = np.zeros( len( wetArr ), dtype=np.float64 )
+    wetIndex = np.flatnonzero( wetArr )
+    depthArr[wetIndex] = drawByMonth( monArr[wetIndex], lambda mon, asize:
+                     Real.depthDists[mon].ranArray( asize,
+                                        Real.depthSamp[mon].ranstate, mon ) )
+    # return
+    return depthArr
+
+
+def calcEventDepths( Real, eligDays, TotDays ):
+    """Trigger the custom events over the days that are eligible.
+
+    Events can only be triggered on wet days that are not the first day of a
+    wet spell. Uses and updates the event timeline in the Realization so
+    that the standard event outputs work unchanged.
+
+    Args:
+        Real (EAAWG_Realization.Realization): realization being simulated
+        eligDays (np.ndarray): sorted indexes of days that can have events
+        TotDays (int): total number of days in realization
+
+    Returns:
+        tuple: (evMask, evDepth) np.ndarray, True on days with an event and
+               the summed event precipitation depth
+
+    """
+    # start
+    evMask = np.zeros( TotDays, dtype=bool )
+    evDepth = np.zeros( TotDays, dtype=np.float64 )
+    numElig = len( eligDays )
+    EvTimeline = Real.timeline
+    while True:
+        # first eligible day on or after the next trigger day
+        kK = int( np.searchsorted( eligDays, EvTimeline.nextDay, side='left' ) )
+        if kK >= numElig:
+            break
+        # end if
+        jJ = int( eligDays[kK] )
+        evMask[jJ] = True
+        evDepth[jJ] = EvTimeline.trigger( jJ )
+    # end while
+    # return
+    return evMask, evDepth
+
+
+def drawStreams( SimCal, Real ):
+    """Draw the daily spell lengths and precipitation depths for a
+    realization in bulk from the family samplers in the Realization.
+
+    Args:
+        SimCal (EAAWG_Calendar.SimCalendar): simulation calendar
+        Real (EAAWG_Realization.Realization): realization state, reseeded
+
+    Returns:
+        tuple: (drySpellArr, wetSpellArr, depthArr), the (TotDays,) dry and
+               wet spell lengths and precipitation depths
+
+    """
+    # start
+    monArr = SimCal.month
+    drySpellArr = drawByMonth( monArr, lambda mon, asize:
+                     Real.dryDists[mon].ranArray( asize,
+                                                  Real.dryBulkSamp.ranstate ) )
+    wetSpellArr = drawByMonth( monArr, lambda mon, asize:
+                     Real.wetDists[mon].ranArray( asize,
+                                                  Real.wetBulkSamp.ranstate ) )
+    depthArr = drawByMonth( monArr, lambda mon, asize:
+                     Real.depthDists[mon].ranArray( asize,
+                                        Real.depthBulkSamp.ranstate, mon ) )
+    # return
+    return drySpellArr, wetSpellArr, depthArr
+
+
+def simulateRealization( SimCal, Real, SeedDict, spells="daily" ):
+    """Simulate a complete realization and fill Real.H0_REAL.
+
+    Args:
+        SimCal (EAAWG_Calendar.SimCalendar): simulation calendar
+        Real (EAAWG_Realization.Realization): realization state, reseeded
+                   here
+        SeedDict (dict): seeds by stream from EAAWG_Seeds.realizationSeeds
+
+    KWargs:
+        spells (str): "daily" for spell lengths and depths drawn for every
+                      day, or "runs" for one spell length draw per spell,
+                      see calcSpellRuns, and depths only for wet days. The
+                      two give different, equally valid, realizations.
+
+    Returns:
+        None.
+
+    """
+    # imports
+    import EAAWG_OtherWeather as WGOW
+    import EAAWG_HighRealResults as WGHRR
+    # start
+    TotDays = SimCal.numDays
+    doyArr = SimCal.doy
+    with WGPRF.phase( "sampling" ):
+        # reseed the realization and start the events
+        Real.reseed( SeedDict )
+        Real.setEventTrackers( TotDays )
+        startWet = Real.startWet()
+        # the loop version seeds the error samplers with the same seed so
+        #  Tmax and Tmin see the same white noise variate each day
+        epsOne = Real.epsDists[0].ranArray( TotDays, Real.epsSamp[0].ranstate )
+        if spells != "runs":
+            drySpellArr, wetSpellArr, depthArr = drawStreams( SimCal, Real )
+        # end if
+    # end with
+    if spells == "runs":
+        with WGPRF.phase( "states" ):
+            wetArr, startArr = calcSpellRuns( startWet, SimCal.month, Real )
+            depthArr = fillWetDepths( wetArr, SimCal.month, Real )
+        # end with
+    else:
+        # wet and dry states
+        with WGPRF.phase( "states" ):
+            wetArr, startArr = calcStateSequence( startWet, wetSpellArr,
+                                                  drySpellArr )
+        # end with
+    # end if
+    epsArr = np.repeat( epsOne.reshape( TotDays, 1 ), WGOW.NUM_OTHER, axis=1 )
+    # precipitation depths and events
+    with WGPRF.phase( "events" ):
+        eligDays = np.flatnonzero( wetArr & ( ~startArr ) )
+        evMask, evDepth = calcEventDepths( Real, eligDays, TotDays )
+    # end with
+    precipArr = np.where( wetArr, depthArr, 0.0 )
+    precipArr = np.where( evMask, evDepth, precipArr )
+    # other weather
+    with WGPRF.phase( "temperature" ):
+        MaxT, MinT = WGOW.calcTempSeries( epsArr, wetArr, doyArr )
+    # end with
+    # now fill the realization tracking array
+    Real.createOutputs( TotDays )
+    Real.H0_REAL[:, WGHRR.TMAX_IND] = MaxT
+    Real.H0_REAL[:, WGHRR.TMIN_IND] = MinT
+    Real.H0_REAL[:, WGHRR.PRE_IND] = precipArr
+    # return
+    return
+
+
+#EOF
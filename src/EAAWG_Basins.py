@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: EAAWG_Basins
+   :platform: Windows, Linux
+   :synopsis: Basin configuration table and basin switching
+
+.. moduleauthor:: Nick Martin <nick.martin@alumni.stanford.edu>
+
+Each basin directory, under calibration/ and final/, has an EAAWG_Inputs.py
+with the basin parameters and an eaa_wg/EAAWG_ProcCalib_Results.py with the
+calibration targets. A basin configuration table lists the basin
+directories. The parameters are read from the basin files, without running
+them, and activateBasin then switches a process to that basin by setting
+the EAAWG_Inputs and EAAWG_ProcCalib_Results module variables. Input tables
+and arrays are cached separately for each basin so that they are only
+loaded once per process.
+
+The table is a CSV file with the columns
+
+  * basin: basin name
+  * basin_dir: basin directory, relative to the table file
+  * inputs_file: optional, defaults to basin_dir/EAAWG_Inputs.py
+  * calib_file: optional, defaults to
+    basin_dir/eaa_wg/EAAWG_ProcCalib_Results.py
+
+"""
+# Copyright and License
+"""
+Copyright 2023 Southwest Research Institute
+
+Module Author: Nick Martin <nick.martin@alumni.stanford.edu>
+
+This file is part of a custom weather generator framework with extreme events,
+hereafter WG Framework.
+
+WG Framework is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+WG Framework is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+# imports
+import os
+import ast
+import copy
+import pandas as pd
+import EAAWG_Inputs as WGI
+import EAAWG_ProcCalib_Results as RProc
+import EAAWG_RealStore as WGRS
+import EAAWG_Seeds as WGSEED
+
+# parameters
+BASIN_PARAM_NAMES = [ "OUT_LABEL", "OUT_SUB_DIR", "START_DATE", "END_DATE",
+                      "K_c", "LAT_DEG", "bas", "A_DATA_LIST", "B_DATA_LIST",
+                      "DRY_SPELL_PARAMS", "WET_SPELL_PARAMS",
+                      "PRE_DEPTH_PARAMS", "MON_MAX_PP", "AVE_WET_TMAX_ADD",
+                      "AVE_DRY_TMAX_ADD", "AVE_WET_TMIN_ADD",
+                      "AVE_DRY_TMIN_ADD", "EVENT_DICT" ]
+"""EAAWG_Inputs variables read from the basin inputs file"""
+CALIB_PARAM_NAMES = [ "CN2020_Ann_Ave_P", "DROUGHT_TARGETS" ]
+"""EAAWG_ProcCalib_Results variables read from the basin calibration file"""
+PARAM_EVAL_NAMES = { "__builtins__" : {}, "int" : int, "float" : float,
+                     "pd" : pd, "list" : list, "dict" : dict, }
+"""Names available when evaluating the basin file assignments"""
+
+# module level variables
+ACTIVE_BASIN = None
+"""Name of the basin this process is set to"""
+BASIN_DATA = dict()
+"""Input table and array caches for each basin, keyed by basin name"""
+
+
+#--------------------------------------------------------------------------
+# custom classes
+class BasinError(Exception):
+    """Custom exception error for basin configuration issues
+    """
+    def __init__(self, arg):
+        super().__init__( arg )
+
+
+class BasinConfig(object):
+    """Parameters and locations for one basin. Can be pickled to send to
+    pool workers.
+    """
+
+    def __init__( self, name, basin_dir, inputs_file=None, calib_file=None ):
+        """Default initialization method. Reads the basin files.
+
+        Args:
+            name (str): basin name
+            basin_dir (str): basin directory
+
+        KWargs:
+            inputs_file (str): basin inputs file, defaults to
+                               basin_dir/EAAWG_Inputs.py
+            calib_file (str): basin calibration file, defaults to
+                              basin_dir/eaa_wg/EAAWG_ProcCalib_Results.py
+
+        """
+        super().__init__()
+        self.name = name
+        self.basin_dir = os.path.normpath( os.path.abspath( basin_dir ) )
+        if inputs_file is None:
+            inputs_file = os.path.join( self.basin_dir, "EAAWG_Inputs.py" )
+        # end if
+        if calib_file is None:
+            calib_file = os.path.join( self.basin_dir, "eaa_wg",
+                                       "EAAWG_ProcCalib_Results.py" )
+        # end if
+        self.inputs_file = os.path.normpath( os.path.abspath( inputs_file ) )
+        self.calib_file = os.path.normpath( os.path.abspath( calib_file ) )
+        self.params = readParamFile( self.inputs_file, BASIN_PARAM_NAMES )
+        """EAAWG_Inputs values for the basin"""
+        self.params["EVENT_KEYS"] = list( self.params["EVENT_DICT"].keys() )
+        self.calib = readParamFile( self.calib_file, CALIB_PARAM_NAMES )
+        """EAAWG_ProcCalib_Results values for the basin"""
+
+
+#--------------------------------------------------------------------------
+# functions
+def readParamFile( filePath, names ):
+    """Read the values of module level assignments from a basin source file
+    without running the file. The last assignment to a name is used, the
+    same as when the file is imported.
+
+    Args:
+        filePath (str): python source file
+        names (list): variable names to read
+
+    Returns:
+        dict: values keyed by variable name
+
+    """
+    # start
+    if not os.path.isfile( filePath ):
+        ErrorMsg = "Basin file %s does not exist!!!" % filePath
+        raise BasinError( ErrorMsg )
+    # end if
+    with open( filePath, 'r' ) as IF:
+        srcTree = ast.parse( IF.read(), filename=filePath )
+    # end with
+    ValDict = dict()
+    for node in srcTree.body:
+        if not isinstance( node, ast.Assign ):
+            continue
+        # end if
+        if ( len( node.targets ) != 1 ) or \
+                ( not isinstance( node.targets[0], ast.Name ) ):
+            continue
+        # end if
+        vName = node.targets[0].id
+        if vName not in names:
+            continue
+        # end if
+        vExpr = ast.Expression( body=node.value )
+        ValDict[vName] = eval( compile( vExpr, filePath, "eval" ),
+                               dict( PARAM_EVAL_NAMES ) )
+    # end for
+    MissList = [ x for x in names if x not in ValDict ]
+    if len( MissList ) > 0:
+        ErrorMsg = "Basin file %s is missing %s!!!" % ( filePath, MissList )
+        raise BasinError( ErrorMsg )
+    # end if
+    # return
+    return ValDict
+
+
+def readBasinTable( tablePath, basins=None ):
+    """Read the basin configuration table
+
+    Args:
+        tablePath (str): CSV basin configuration table
+
+    KWargs:
+        basins (list): basin names to keep, None for all
+
+    Returns:
+        dict: BasinConfig keyed by basin name, in table order
+
+    """
+    # start
+    tableDir = os.path.dirname( os.path.abspath( tablePath ) )
+    TableDF = pd.read_csv( tablePath, dtype=str, skipinitialspace=True )
+    TableDF = TableDF.where( TableDF.notna(), None )
+    CfgDict = dict()
+    for _, tRow in TableDF.iterrows():
+        if ( basins is not None ) and ( tRow["basin"] not in basins ):
+            continue
+        # end if
+        FileDict = dict()
+        for colName in [ "inputs_file", "calib_file" ]:
+            if ( colName in tRow.index ) and ( tRow[colName] is not None ):
+                FileDict[colName] = os.path.join( tableDir, tRow[colName] )
+            # end if
+        # end for
+        CfgDict[tRow["basin"]] = BasinConfig(
+                                    tRow["basin"],
+                                    os.path.join( tableDir, tRow["basin_dir"] ),
+                                    **FileDict )
+    # end for
+    if ( basins is not None ) and ( len( CfgDict ) != len( basins ) ):
+        ErrorMsg = "Basins %s are not in %s!!!" % \
+                   ( [ x for x in basins if x not in CfgDict ], tablePath )
+        raise BasinError( ErrorMsg )
+    # end if
+    # return
+    return CfgDict
+
+
+def setModuleValues( module, ValDict ):
+    """Set module variables. Dictionaries and lists are updated in place
+    because some are bound at import time, like MON_MAX_PP as a default
+    argument in EAAWG_PrecipDepth."""
+    for vName, vVal in ValDict.items():
+        curVal = getattr( module, vName, None )
+        if isinstance( curVal, dict ) and isinstance( vVal, dict ):
+            curVal.clear()
+            curVal.update( copy.deepcopy( vVal ) )
+        elif isinstance( curVal, list ) and isinstance( vVal, list ):
+            curVal[:] = copy.deepcopy( vVal )
+        else:
+            setattr( module, vName, vVal )
+        # end if
+    # end for
+
+
+def activateBasin( basinCfg ):
+    """Switch this process to a basin. Does nothing if the basin is already
+    active. Simulation structures built for another basin are rebuilt by
+    EAAWGmp.initWorker on the next realization.
+
+    Args:
+        basinCfg (BasinConfig): basin to switch to
+
+    Returns:
+        None.
+
+    """
+    # globals
+    global ACTIVE_BASIN, BASIN_DATA
+    # start
+    if ACTIVE_BASIN == basinCfg.name:
+        return
+    # end if
+    setModuleValues( WGI, basinCfg.params )
+    setModuleValues( RProc, basinCfg.calib )
+    WGI.CUR_DIR = basinCfg.basin_dir
+    WGI.OUT_DIR = os.path.normpath( os.path.join( basinCfg.basin_dir, "Results" ) )
+    WGI.INPUT_DIR = os.path.normpath( os.path.join( basinCfg.basin_dir, "Inputs" ) )
+    WGI.INPUT_CACHE_FILE = os.path.normpath( os.path.join( WGI.INPUT_DIR,
+                                        "%s_OWeath_Arrays.npz" % WGI.bas ) )
+    # input caches for this basin
+    if basinCfg.name not in BASIN_DATA:
+        BASIN_DATA[basinCfg.name] = { "tables" : dict(), "arrays" : dict(), }
+    # end if
+    WGI.BASIN_CACHE = BASIN_DATA[basinCfg.name]["tables"]
+    WGI.OW_ARRAYS = BASIN_DATA[basinCfg.name]["arrays"]
+    # outputs and streams that depend on the basin
+    WGRS.WRITE_STORE = None
+    WGRS.WRITE_LABEL = None
+    WGSEED.PHILOX_KEY = None
+    ACTIVE_BASIN = basinCfg.name
+    # return
+    return
+
+
+#EOF
@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: EAAWG_Batch
+   :platform: Windows, Linux
+   :synopsis: Multi-basin driver with one shared process pool
+
+.. moduleauthor:: Nick Martin <nick.martin@alumni.stanford.edu>
+
+python EAAWG_Batch.py 36 ../final/Basins.csv --num_real 1000 --engine array
+
+Simulate 1000 realizations for every basin in the basin configuration
+table, see EAAWG_Basins, with 36 workers. All (basin, realization) tasks go
+to one pool, grouped by basin, so the workers stay busy across basins
+rather than running the basins one after the other. Each worker loads a
+basin's parameters and inputs once and switches basins between tasks.
+Outputs and CollOuts.dat are written to each basin directory.
+
+python EAAWG_Batch.py 36 ../calibration/Basins.csv --num_real 168 --basins Frio Nueces --summarize --output none
+
+Calibration collation for two of the basins.
+
+With --profile, each basin directory gets a profile report of its tasks,
+see EAAWG_Profile.
+
+"""
+# Copyright and License
+"""
+Copyright 2023 Southwest Research Institute
+
+Module Author: Nick Martin <nick.martin@alumni.stanford.edu>
+
+This file is part of a custom weather generator framework with extreme events,
+hereafter WG Framework.
+
+WG Framework is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+WG Framework is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+# imports
+import argparse
+from multiprocessing import Pool
+import os
+import sys
+import EAAWGmp as WGMP
+import EAAWG_Basins as WGBA
+import EAAWG_Inputs as WGI
+import EAAWG_ProcCalib_Results as RProc
+import EAAWG_Schedule as WGSCH
+import EAAWG_Writer as WGWR
+import EAAWG_Codecs as WGCOD
+import EAAWG_Schema as WGSCM
+import EAAWG_Profile as WGPRF
+import EAAWG_LaneSim as WGLS
+
+# module level variables
+BASIN_CONFIGS = dict()
+"""Basin configurations for this process, keyed by basin name"""
+
+
+#-----------------------------------------------------------------------
+# custom functions
+def initBatchWorker( BasinConfigs, Profile=False ):
+    """Pool initializer. Keep the basin configurations in the worker.
+
+    Args:
+        BasinConfigs (dict): EAAWG_Basins.BasinConfig keyed by basin name
+        Profile (bool): time the phases of each task, see EAAWG_Profile
+
+    Returns:
+        None.
+
+    """
+    # globals
+    global BASIN_CONFIGS
+    # start
+    BASIN_CONFIGS = BasinConfigs
+    WGPRF.setProfiling( Profile )
+    # return
+    return
+
+
+def Batch_Worker( BasinName, RealNum, Engine, ExtraArgs ):
+    """Run a single realization, or the realizations of a lane group for
+    the lanes engine, for a basin
+
+    Args:
+        BasinName (str): basin name, key in BASIN_CONFIGS
+        RealNum (int): the current realization number, a tuple of them for
+                       "lanes"
+        Engine (str): "loop", "array", or "lanes"
+        ExtraArgs (tuple): trailing arguments for the EAAWGmp worker, see
+                           EAAWGmp.workerExtraArgs
+
+    Returns:
+        int, tuple, or list. EAAWGmp worker return
+
+    """
+    # start
+    WGBA.activateBasin( BASIN_CONFIGS[BasinName] )
+    if Engine == "lanes":
+        WorkerFunc = WGMP.WG_Worker_Lanes
+    elif Engine == "array":
+        WorkerFunc = WGMP.WG_Worker_Array
+    else:
+        WorkerFunc = WGMP.WG_Worker_Main
+    # end if
+    # return
+    return WorkerFunc( RealNum, WGMP.STD_NORM_DEF_SEED, WGMP.PDEPTH_DEF_SEED,
+                       WGMP.WET_STA_DEF_SEED, WGMP.DRY_STA_DEF_SEED,
+                       WGMP.EVENT_RECUR_DEF_SEED, WGMP.EVENT_MAG_DEF_SEED,
+                       *ExtraArgs )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Multi-basin weather generator')
+    parser.add_argument(
+        'nbr_workers', type=int, help='Number of workers e.g. 1, 2, 4, 8')
+    parser.add_argument(
+        'basin_table', help='Basin configuration table, CSV')
+    parser.add_argument(
+        '--basins',
+        nargs='+',
+        default=None,
+        help='Only run these basins from the table')
+    parser.add_argument(
+        '--num_real',
+        type=int,
+        default=WGMP.DEF_NUM_REALIZATIONS,
+        help='Number of realizations for each basin')
+    parser.add_argument(
+        '--engine',
+        choices=['loop', 'array', 'lanes'],
+        default='loop',
+        help='Simulation engine, day by day loop, bulk array, or lanes, '
+             'see EAAWGmp')
+    parser.add_argument(
+        '--lanes',
+        type=int,
+        default=None,
+        help='Realizations simulated together with the lanes engine')
+    parser.add_argument(
+        '--spells',
+        choices=['daily', 'runs'],
+        default='daily',
+        help='Spell generation with the array engine, see EAAWGmp')
+    parser.add_argument(
+        '--buffered',
+        action='store_true',
+        help='Use block buffered sampling with the loop engine')
+    parser.add_argument(
+        '--current_month',
+        action='store_true',
+        help='Only sample the current month each day with the loop engine')
+    parser.add_argument(
+        '--backend',
+        choices=['scipy', 'numpy'],
+        default='scipy',
+        help='Sampling backend, SciPy distributions or NumPy Generators')
+    parser.add_argument(
+        '--output',
+        choices=['pickle', 'store', 'none'],
+        default='pickle',
+        help='Realization output, one pickle each, a single basin store, '
+             'or none; none requires --summarize')
+    parser.add_argument(
+        '--summarize',
+        action='store_true',
+        help='Calculate PEST collation summaries in the workers')
+    parser.add_argument(
+        '--seeding',
+        choices=['legacy', 'philox'],
+        default='legacy',
+        help='Random stream seeding, see EAAWGmp')
+    parser.add_argument(
+        '--root_seed',
+        type=int,
+        default=None,
+        help='Root seed for philox seeding')
+    parser.add_argument(
+        '--chunk_size',
+        type=int,
+        default=WGMP.CHUNK_SIZE,
+        help='Fixed number of realizations sent to a worker at a time')
+    parser.add_argument(
+        '--codec',
+        choices=WGCOD.CODECS,
+        default=WGCOD.DEF_CODEC,
+        help='Compression for pickle realization files')
+    parser.add_argument(
+        '--schema',
+        choices=WGSCM.SCHEMAS,
+        default=WGSCM.DEF_SCHEMA,
+        help='Columns kept in pickle realization files')
+    parser.add_argument(
+        '--writers',
+        type=int,
+        default=WGWR.NUM_WRITERS,
+        help='Background output writer threads in each worker')
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Time each phase of the realizations and write a profile '
+             'report for each basin')
+    parser.add_argument(
+        '--quiet',
+        action='store_true',
+        help='Do not print progress as realizations finish')
+    args = parser.parse_args()
+    num_proc = args.nbr_workers
+    num_real = args.num_real
+    if ( args.output == "none" ) and ( not args.summarize ):
+        parser.error( "--output none requires --summarize" )
+    # end if
+    if ( args.chunk_size is not None ) and ( args.chunk_size < 1 ):
+        parser.error( "--chunk_size must be at least 1" )
+    # end if
+    if args.codec not in WGCOD.availableCodecs():
+        parser.error( "codec %s is not available, use one of %s" %
+                      ( args.codec, WGCOD.availableCodecs() ) )
+    # end if
+    if ( args.spells != "daily" ) and ( args.engine != "array" ):
+        parser.error( "--spells %s requires --engine array" % args.spells )
+    # end if
+    if args.engine == "lanes":
+        if args.backend != "numpy":
+            parser.error( "--engine lanes requires --backend numpy" )
+        # end if
+        if args.lanes is None:
+            args.lanes = WGLS.DEF_LANES
+        elif args.lanes < 1:
+            parser.error( "--lanes must be at least 1" )
+        # end if
+    elif args.lanes is not None:
+        parser.error( "--lanes requires --engine lanes" )
+    # end if
+    ExtraArgs = WGMP.workerExtraArgs( args )
+    try:
+        BasinConfigs = WGBA.readBasinTable( args.basin_table,
+                                            basins=args.basins )
+    except WGBA.BasinError as e:
+        parser.error( str( e ) )
+    # end try
+    BasinNames = list( BasinConfigs.keys() )
+    # load each basin's inputs once here so that forked workers inherit
+    #  them and clear the previous outputs
+    for BasinName in BasinNames:
+        WGBA.activateBasin( BasinConfigs[BasinName] )
+        os.makedirs( os.path.join( WGI.OUT_DIR, WGI.OUT_SUB_DIR ), exist_ok=True )
+        WGI.loadBasinInputs( )
+        WGMP.delPrevOutputs( )
+        if args.output == "store":
+            WGMP.createOutputStore( WGMP.START_REAL, num_real )
+        # end if
+    # end for
+    RealNums = list( range( WGMP.START_REAL, WGMP.START_REAL + num_real, 1 ) )
+    # the lanes engine takes the realizations of a lane group as a task
+    if args.engine == 'lanes':
+        TaskReals = WGLS.laneGroups( RealNums, args.lanes,
+                                     start_real=WGMP.START_REAL )
+    else:
+        TaskReals = RealNums
+    # end if
+    print("Using %d processes for %d basins and %d realizations each" %
+          ( num_proc, len( BasinNames ), num_real ) )
+    # tasks grouped by basin so that workers seldom switch basins
+    AllArgs = [ ( bName, rNum, args.engine, ExtraArgs ) for bName in BasinNames
+                for rNum in TaskReals ]
+    # phase times by basin when profiling
+    ProfReps = { x : WGPRF.ProfileReport() for x in BasinNames }
+    def profileTask( tIndex, workerID, elapsed, times ):
+        """Add the phase times of a finished task to its basin's report"""
+        bName, rNum = AllArgs[tIndex][0:2]
+        ProfReps[bName].add( ( list( rNum ) if args.engine == 'lanes' else
+                               [ rNum ] ), workerID, elapsed, times )
+    with Pool( processes=num_proc, initializer=initBatchWorker,
+               initargs=( BasinConfigs, args.profile ) ) as pool:
+        results = WGSCH.runTasks( pool, num_proc, Batch_Worker, AllArgs,
+                                  chunk_size=args.chunk_size,
+                                  progress=( None if args.quiet else
+                                             WGSCH.printProgress ),
+                                  on_profile=profileTask,
+                                  task_sizes=( [ len( x[1] ) for x in AllArgs ]
+                                               if args.engine == 'lanes'
+                                               else None ) )
+    # end of with block
+    # one result per realization
+    if args.engine == 'lanes':
+        results = [ x for tRes in results for x in tRes ]
+    # end if
+    # collate each basin
+    TotFails = 0
+    for bI, BasinName in enumerate( BasinNames ):
+        bResults = results[( bI * num_real ):( ( bI + 1 ) * num_real )]
+        if args.summarize:
+            Summaries = [ x[1] for x in bResults ]
+            bResults = [ x[0] for x in bResults ]
+        else:
+            Summaries = None
+        # end if
+        bFails = sum( bResults )
+        TotFails += bFails
+        if args.profile:
+            WGBA.activateBasin( BasinConfigs[BasinName] )
+            ProfRep = ProfReps[BasinName]
+            ProfRep.write( WGPRF.profilePath( WGI.OUT_LABEL ) )
+            print("%s profile\n%s" % ( BasinName,
+                                       "".join( ProfRep.reportLines() ) ))
+        # end if
+        if bFails == 0:
+            WGBA.activateBasin( BasinConfigs[BasinName] )
+            RProc.processOutputsForPEST( num_real, out_format=args.output,
+                                         summaries=Summaries,
+                                         start_real=WGMP.START_REAL )
+            print("%s: finished %d realizations successfully" %
+                  ( BasinName, num_real ) )
+        else:
+            print("%s: finished %d successful runs out of %d realizations" %
+                  ( BasinName, num_real - bFails, num_real ) )
+        # end if
+    # end for
+    if TotFails == 0:
+        sys.exit(0)
+    else:
+        sys.exit(-2)
+    # end if
+    # end of main
+
+
+# EOF
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: EAAWG_Calendar
+   :platform: Windows, Linux
+   :synopsis: Simulation calendar shared by all realizations
+
+.. moduleauthor:: Nick Martin <nick.martin@alumni.stanford.edu>
+
+All realizations cover the same days so the calendar quantities are
+calculated once, as integer arrays, and then indexed by the day counter.
+This replaces per day datetime objects in the simulation loop and gives
+post-processing month and year group indexes without resampling.
+
+"""
+# Copyright and License
+"""
+Copyright 2023 Southwest Research Institute
+
+Module Author: Nick Martin <nick.martin@alumni.stanford.edu>
+
+This file is part of a custom weather generator framework with extreme events,
+hereafter WG Framework.
+
+WG Framework is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+WG Framework is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+# imports
+import numpy as np
+import pandas as pd
+import EAAWG_Inputs as WGI
+
+# module level variables
+SIM_CALENDAR = None
+"""Calendar for this process, built on first use by getCalendar"""
+
+
+#--------------------------------------------------------------------------
+# custom classes
+class SimCalendar(object):
+    """Daily simulation calendar as integer arrays.
+
+    Day of the year runs from 1 to 366 in leap years and from 1 to 365
+    otherwise, the same as pd.DatetimeIndex.dayofyear, so that it indexes
+    the 366 day Fourier smoothed climatology directly.
+    """
+
+    def __init__( self, start_date, end_date ):
+        """Default initialization method
+
+        Args:
+            start_date (pd.Timestamp): first simulation day
+            end_date (pd.Timestamp): last simulation day
+
+        """
+        super().__init__()
+        self.start_date = pd.Timestamp( start_date )
+        self.end_date = pd.Timestamp( end_date )
+        self.DT_INDEX = pd.date_range( start=start_date, end=end_date, freq='D' )
+        """Index for all outputs"""
+        self.numDays = len( self.DT_INDEX )
+        self.year = self.DT_INDEX.year.to_numpy().astype( np.int64 )
+        self.month = self.DT_INDEX.month.to_numpy().astype( np.int64 )
+        self.doy = self.DT_INDEX.dayofyear.to_numpy().astype( np.int64 )
+        self.monthList = self.month.tolist()
+        """Month for each day as a list for fast scalar access in loops"""
+        # group indexes and starting offsets for months and years
+        monKey = ( self.year * 12 ) + ( self.month - 1 )
+        self.monStarts = np.flatnonzero( np.r_[ True, monKey[1:] != monKey[:-1] ] )
+        """Day index of the first simulation day in each month"""
+        self.monCode = np.cumsum( np.r_[ 0, ( monKey[1:] != monKey[:-1] ).astype( np.int64 ) ] )
+        """Month group, 0 to number of months - 1, for each day"""
+        self.yearStarts = np.flatnonzero( np.r_[ True, self.year[1:] != self.year[:-1] ] )
+        """Day index of the first simulation day in each year"""
+
+
+#--------------------------------------------------------------------------
+# functions
+def getCalendar( start_date=None, end_date=None ):
+    """Get the simulation calendar for this process. Built once and then
+    reused for every realization.
+
+    KWargs:
+        start_date (pd.Timestamp): first day, defaults to WGI.START_DATE
+        end_date (pd.Timestamp): last day, defaults to WGI.END_DATE
+
+    Returns:
+        SimCalendar: the calendar
+
+    """
+    # globals
+    global SIM_CALENDAR
+    # start
+    if start_date is None:
+        start_date = WGI.START_DATE
+    # end if
+    if end_date is None:
+        end_date = WGI.END_DATE
+    # end if
+    if ( SIM_CALENDAR is None ) or ( SIM_CALENDAR.start_date != start_date ) or \
+            ( SIM_CALENDAR.end_date != end_date ):
+        SIM_CALENDAR = SimCalendar( start_date, end_date )
+    # end if
+    # return
+    return SIM_CALENDAR
+
+
+#EOF
@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: EAAWG_Checkpoint
+   :platform: Windows, Linux
+   :synopsis: Checkpoint and resume for long realization runs
+
+.. moduleauthor:: Nick Martin <nick.martin@alumni.stanford.edu>
+
+As each realization finishes, the main process appends a record to the run
+checkpoint, a JSON lines file in the outputs directory. The record has the
+realization number, the seeds for each random stream, and a SHA-256 hash of
+the realization output: the pickle file, the realization's slice of the
+store, or the summary when no daily outputs are written. Summaries
+calculated in the workers are appended to a separate pickle file so they
+do not need to be recalculated.
+
+When a run is restarted with resume, the checkpoint run settings must match
+the new run. Realizations whose record, seeds, and output hash all check
+out are skipped. Missing, partially written, or corrupt realizations are
+run again.
+
+"""
+# Copyright and License
+"""
+Copyright 2023 Southwest Research Institute
+
+Module Author: Nick Martin <nick.martin@alumni.stanford.edu>
+
+This file is part of a custom weather generator framework with extreme events,
+hereafter WG Framework.
+
+WG Framework is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+WG Framework is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+# imports
+import os
+import json
+import pickle
+import hashlib
+import EAAWG_Inputs as WGI
+import EAAWG_RealStore as WGRS
+import EAAWG_Seeds as WGSEED
+
+# parameters
+CHECKPOINT_EXT = "_Checkpoint.jsonl"
+"""File name ending for the run checkpoint"""
+CHECKPOINT_SUMMARY_EXT = "_Checkpoint_Summaries.pickle"
+"""File name ending for the checkpointed realization summaries"""
+CHECKPOINT_VERSION = 1
+"""Checkpoint file format version"""
+HASH_BLOCK = 1048576
+"""Bytes read at a time when hashing output files"""
+
+
+#--------------------------------------------------------------------------
+# custom classes
+class CheckpointError(Exception):
+    """Custom exception error for checkpoint and resume issues
+    """
+    def __init__(self, arg):
+        super().__init__( arg )
+
+
+class CheckpointWriter(object):
+    """Appends realization records to the run checkpoint
+    """
+
+    def __init__( self, out_label, RunSettings, BaseSeeds, append=False ):
+        """Default initialization method. Starts a new checkpoint unless
+        append.
+
+        Args:
+            out_label (str): file label for the run
+            RunSettings (dict): run settings, must be JSON serializable
+            BaseSeeds (list): the six base seeds passed to the workers
+
+        KWargs:
+            append (bool): add to the existing checkpoint from resume
+
+        """
+        super().__init__()
+        self.out_label = out_label
+        self.outFormat = RunSettings["output"]
+        self.baseSeeds = list( BaseSeeds )
+        self.store = None
+        mode = "a" if append else "w"
+        if append:
+            trimPartial( out_label )
+        # end if
+        self.recFile = open( checkpointPath( out_label, CHECKPOINT_EXT ), mode )
+        self.sumFile = open( checkpointPath( out_label, CHECKPOINT_SUMMARY_EXT ),
+                             "%sb" % mode )
+        if not append:
+            self.writeLine( { "version" : CHECKPOINT_VERSION,
+                              "settings" : RunSettings, } )
+        # end if
+
+    def writeLine( self, lineDict ):
+        """Append a line and push it to disk"""
+        self.recFile.write( "%s\n" % json.dumps( lineDict ) )
+        self.recFile.flush()
+        os.fsync( self.recFile.fileno() )
+
+    def record( self, RealNum, tRes ):
+        """Record a finished realization. Failed realizations are not
+        recorded so they are run again on resume.
+
+        Args:
+            RealNum (int): realization number
+            tRes (int or tuple): worker return
+
+        """
+        if isinstance( tRes, tuple ):
+            retCode, tSummary = tRes
+        else:
+            retCode, tSummary = tRes, None
+        # end if
+        if retCode != 0:
+            return
+        # end if
+        sumBytes = None
+        if tSummary is not None:
+            sumBytes = pickle.dumps( tSummary, protocol=pickle.HIGHEST_PROTOCOL )
+            pickle.dump( ( int( RealNum ), sumBytes ), self.sumFile,
+                         protocol=pickle.HIGHEST_PROTOCOL )
+            self.sumFile.flush()
+            os.fsync( self.sumFile.fileno() )
+        # end if
+        if ( self.outFormat == "store" ) and ( self.store is None ):
+            self.store = WGRS.RealizationStore( out_label=self.out_label )
+        # end if
+        self.writeLine( { "real" : int( RealNum ),
+                          "seeds" : seedRecord( RealNum, self.baseSeeds ),
+                          "hash" : outputHash( RealNum, self.outFormat,
+                                               sum_bytes=sumBytes,
+                                               store=self.store ), } )
+
+    def close( self ):
+        """Close the checkpoint files"""
+        self.recFile.close()
+        self.sumFile.close()
+        self.store = None
+
+
+#--------------------------------------------------------------------------
+# functions
+def checkpointPath( out_label, fileExt ):
+    """File path for a checkpoint file with ending fileExt"""
+    return os.path.normpath( os.path.join( WGI.OUT_DIR, WGI.OUT_SUB_DIR,
+                                           "%s%s" % ( out_label, fileExt ) ) )
+
+
+def seedRecord( RealNum, BaseSeeds ):
+    """Seeds for each random stream of a realization in JSON form. Philox
+    streams are recorded as [realization, stream ID].
+
+    Args:
+        RealNum (int): realization number
+        BaseSeeds (list): the six base seeds passed to the workers
+
+    Returns:
+        dict: seeds keyed by stream family
+
+    """
+    SeedDict = WGSEED.realizationSeeds( RealNum, *BaseSeeds )
+    RecDict = dict()
+    for stream, seed in SeedDict.items():
+        if isinstance( seed, WGSEED.StreamSeed ):
+            RecDict[stream] = [ seed.realNum, seed.streamID ]
+        else:
+            RecDict[stream] = int( seed )
+        # end if
+    # end for
+    # return
+    return RecDict
+
+
+def outputHash( RealNum, OutFormat, sum_bytes=None, store=None ):
+    """SHA-256 hash of a realization output
+
+    Args:
+        RealNum (int): realization number
+        OutFormat (str): realization output, "pickle", "store", or "none"
+
+    KWargs:
+        sum_bytes (bytes): pickled summary, used for "none"
+        store (EAAWG_RealStore.RealizationStore): open store, used for
+                  "store"
+
+    Returns:
+        str: hex digest, or None if the output is missing
+
+    """
+    # start
+    hObj = hashlib.sha256()
+    if OutFormat == "store":
+        rIndex = store.realIndex( RealNum )
+        if store.done[rIndex] != 1:
+            return None
+        # end if
+        hObj.update( store.data[rIndex, :, :].tobytes() )
+    elif OutFormat == "pickle":
+        H0OutFP = os.path.normpath( os.path.join( WGI.OUT_DIR, WGI.OUT_SUB_DIR,
+                                    "%s_R%d_DF.pickle" % ( WGI.OUT_LABEL,
+                                                           RealNum ) ) )
+        if not os.path.isfile( H0OutFP ):
+            return None
+        # end if
+        with open( H0OutFP, 'rb' ) as IF:
+            for fBlock in iter( lambda: IF.read( HASH_BLOCK ), b"" ):
+                hObj.update( fBlock )
+            # end for
+        # end with
+    else:
+        if sum_bytes is None:
+            return None
+        # end if
+        hObj.update( sum_bytes )
+    # end if
+    # return
+    return hObj.hexdigest()
+
+
+def trimPartial( out_label ):
+    """Remove a partial last entry, from a run that was stopped while
+    writing, from the checkpoint files so that new entries can be appended.
+
+    Args:
+        out_label (str): file label for the run
+
+    """
+    # start
+    CkptFP = checkpointPath( out_label, CHECKPOINT_EXT )
+    if os.path.isfile( CkptFP ):
+        with open( CkptFP, 'r+b' ) as IOF:
+            fBytes = IOF.read()
+            IOF.truncate( fBytes.rfind( b"\n" ) + 1 )
+        # end with
+    # end if
+    SumFP = checkpointPath( out_label, CHECKPOINT_SUMMARY_EXT )
+    if os.path.isfile( SumFP ):
+        with open( SumFP, 'r+b' ) as IOF:
+            goodEnd = 0
+            while True:
+                try:
+                    pickle.load( IOF )
+                except ( EOFError, pickle.UnpicklingError, ValueError ):
+                    break
+                # end try
+                goodEnd = IOF.tell()
+            # end while
+            IOF.truncate( goodEnd )
+        # end with
+    # end if
+    # return
+    return
+
+
+def readSummaries( out_label ):
+    """Read the checkpointed summaries. A partial last entry, from a run
+    that was stopped while writing, is ignored.
+
+    Args:
+        out_label (str): file label for the run
+
+    Returns:
+        dict: pickled summary bytes keyed by realization number
+
+    """
+    # start
+    SumDict = dict()
+    SumFP = checkpointPath( out_label, CHECKPOINT_SUMMARY_EXT )
+    if not os.path.isfile( SumFP ):
+        return SumDict
+    # end if
+    with open( SumFP, 'rb' ) as IF:
+        while True:
+            try:
+                RealNum, sumBytes = pickle.load( IF )
+            except ( EOFError, pickle.UnpicklingError, ValueError ):
+                break
+            # end try
+            SumDict[RealNum] = sumBytes
+        # end while
+    # end with
+    # return
+    return SumDict
+
+
+def resumeCheckpoint( out_label, RunSettings, BaseSeeds ):
+    """Find the realizations that are complete in an existing checkpoint
+
+    Args:
+        out_label (str): file label for the run
+        RunSettings (dict): run settings for the new run
+        BaseSeeds (list): the six base seeds passed to the workers
+
+    Returns:
+        tuple: (sorted list of complete realization numbers, dict of
+               summaries keyed by realization number). Both are empty if
+               there is no checkpoint.
+
+    """
+    # start
+    CkptFP = checkpointPath( out_label, CHECKPOINT_EXT )
+    if not os.path.isfile( CkptFP ):
+        return list(), dict()
+    # end if
+    RecDict = dict()
+    with open( CkptFP, 'r' ) as IF:
+        try:
+            Header = json.loads( IF.readline() )
+        except ValueError:
+            Header = dict()
+        # end try
+        if ( Header.get( "version", None ) != CHECKPOINT_VERSION ) or \
+                ( Header.get( "settings", None ) !=
+                  json.loads( json.dumps( RunSettings ) ) ):
+            ErrorMsg = "Checkpoint %s is from a run with different " \
+                       "settings!!! Run without resume to start over." % CkptFP
+            raise CheckpointError( ErrorMsg )
+        # end if
+        for tLine in IF:
+            try:
+                tRec = json.loads( tLine )
+            except ValueError:
+                # partial last line
+                break
+            # end try
+            RecDict[tRec["real"]] = tRec
+        # end for
+    # end with
+    OutFormat = RunSettings["output"]
+    Summarize = RunSettings["summarize"]
+    SumBytes = readSummaries( out_label ) if Summarize else dict()
+    store = None
+    if ( OutFormat == "store" ) and ( len( RecDict ) > 0 ):
+        try:
+            store = WGRS.RealizationStore( out_label=out_label )
+        except WGRS.RealStoreError:
+            return list(), dict()
+        # end try
+    # end if
+    DoneReals = list()
+    Summaries = dict()
+    for RealNum in sorted( RecDict.keys() ):
+        tRec = RecDict[RealNum]
+        if Summarize and ( RealNum not in SumBytes ):
+            continue
+        # end if
+        if tRec["seeds"] != seedRecord( RealNum, BaseSeeds ):
+            continue
+        # end if
+        try:
+            tHash = outputHash( RealNum, OutFormat,
+                                sum_bytes=SumBytes.get( RealNum, None ),
+                                store=store )
+        except WGRS.RealStoreError:
+            continue
+        # end try
+        if ( tHash is None ) or ( tHash != tRec["hash"] ):
+            continue
+        # end if
+        DoneReals.append( RealNum )
+        if Summarize:
+            Summaries[RealNum] = pickle.loads( SumBytes[RealNum] )
+        # end if
+    # end for
+    # return
+    return DoneReals, Summaries
+
+
+#EOF
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: EAAWG_Codecs
+   :platform: Windows, Linux
+   :synopsis: Compression codecs for the realization pickle files
+
+.. moduleauthor:: Nick Martin <nick.martin@alumni.stanford.edu>
+
+Realization DataFrames are written to the _DF.pickle files with one of the
+codecs in CODECS.
+
+  * zip: the original format, a zip archive from pandas to_pickle. Still
+    the default so that existing readers work unchanged.
+  * none: uncompressed pickle, fastest to write and read, largest files
+  * gzip: gzip compression at GZIP_LEVEL
+  * lz4: LZ4 frame compression, only when the lz4 package is installed
+  * zstd: Zstandard compression at ZSTD_LEVEL, only when the zstandard
+    package is installed
+
+Files other than zip start with a short header, FILE_MAGIC and the codec
+name, so readRealPickle detects the codec. Zip files, and plain pickles
+written by other tools, are detected from their leading bytes.
+
+python EAAWG_Codecs.py
+
+Benchmark the available codecs on a synthetic 42-year, 6-column
+realization. Give the path to a _DF.pickle file to use a simulated
+realization instead.
+
+"""
+# Copyright and License
+"""
+Copyright 2023 Southwest Research Institute
+
+Module Author: Nick Martin <nick.martin@alumni.stanford.edu>
+
+This file is part of a custom weather generator framework with extreme events,
+hereafter WG Framework.
+
+WG Framework is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+WG Framework is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+# imports
+import os
+import gzip
+import pickle
+import pandas as pd
+
+# optional codecs
+try:
+    import lz4.frame as lz4frame
+except ImportError:
+    lz4frame = None
+# end try
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+# end try
+
+# parameters
+FILE_MAGIC = b"EAAWGR"
+"""Leading bytes of realization files with a codec header"""
+ZIP_MAGIC = b"PK\x03\x04"
+"""Leading bytes of zip archives"""
+GZIP_LEVEL = 1
+"""Compression level for gzip"""
+ZSTD_LEVEL = 3
+"""Compression level for zstd"""
+DEF_CODEC = "zip"
+"""Default realization file codec"""
+CODECS = [ "zip", "none", "gzip", "lz4", "zstd" ]
+"""All realization file codecs"""
+
+
+#--------------------------------------------------------------------------
+# custom classes
+class CodecError(Exception):
+    """Custom exception error for realization file codec issues
+    """
+    def __init__(self, arg):
+        super().__init__( arg )
+
+
+#--------------------------------------------------------------------------
+# functions
+def availableCodecs():
+    """Codecs that can be used in this environment"""
+    availList = [ "zip", "none", "gzip" ]
+    if lz4frame is not None:
+        availList.append( "lz4" )
+    # end if
+    if zstandard is not None:
+        availList.append( "zstd" )
+    # end if
+    return availList
+
+
+def checkCodec( codec ):
+    """Raise CodecError if codec cannot be used here"""
+    if codec not in availableCodecs():
+        ErrorMsg = "Codec %s is not available!!! Available codecs are %s" % \
+                   ( codec, availableCodecs() )
+        raise CodecError( ErrorMsg )
+    # end if
+
+
+def compressBytes( rawBytes, codec ):
+    """Compress bytes with a header codec"""
+    if codec == "gzip":
+        return gzip.compress( rawBytes, compresslevel=GZIP_LEVEL )
+    elif codec == "lz4":
+        return lz4frame.compress( rawBytes )
+    elif codec == "zstd":
+        return zstandard.ZstdCompressor( level=ZSTD_LEVEL ).compress( rawBytes )
+    # end if
+    return rawBytes
+
+
+def decompressBytes( comBytes, codec ):
+    """Decompress bytes with a header codec"""
+    if codec == "gzip":
+        return gzip.decompress( comBytes )
+    elif codec == "lz4":
+        return lz4frame.decompress( comBytes )
+    elif codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress( comBytes )
+    # end if
+    return comBytes
+
+
+def writeRealPickle( H0DF, OutFP, codec=DEF_CODEC ):
+    """Write a realization DataFrame with a codec
+
+    Args:
+        H0DF (pd.DataFrame): realization outputs
+        OutFP (str): file path
+
+    KWargs:
+        codec (str): one of CODECS
+
+    Returns:
+        None.
+
+    """
+    # start
+    if codec == "zip":
+        H0DF.to_pickle( OutFP, compression='zip' )
+        return
+    # end if
+    checkCodec( codec )
+    rawBytes = pickle.dumps( H0DF, protocol=pickle.HIGHEST_PROTOCOL )
+    with open( OutFP, 'wb' ) as OF:
+        OF.write( FILE_MAGIC )
+        OF.write( bytes( [ len( codec ) ] ) )
+        OF.write( codec.encode( "ascii" ) )
+        OF.write( compressBytes( rawBytes, codec ) )
+    # end with
+    # return
+    return
+
+
+def fileCodec( InFP ):
+    """Codec of an existing realization file
+
+    Args:
+        InFP (str): file path
+
+    Returns:
+        str: codec name, or "pickle" for a plain pickle without a header
+
+    """
+    with open( InFP, 'rb' ) as IF:
+        lead = IF.read( len( FILE_MAGIC ) + 1 )
+        if lead.startswith( ZIP_MAGIC ):
+            return "zip"
+        elif lead.startswith( FILE_MAGIC ):
+            return IF.read( lead[-1] ).decode( "ascii" )
+        # end if
+    # end with
+    return "pickle"
+
+
+def readRealPickle( InFP ):
+    """Read a realization DataFrame written with any codec
+
+    Args:
+        InFP (str): file path
+
+    Returns:
+        H0DF (pd.DataFrame): realization outputs
+
+    """
+    # start
+    codec = fileCodec( InFP )
+    if codec == "zip":
+        return pd.read_pickle( InFP, compression='zip' )
+    elif codec == "pickle":
+        return pd.read_pickle( InFP, compression=None )
+    # end if
+    checkCodec( codec )
+    with open( InFP, 'rb' ) as IF:
+        IF.seek( len( FILE_MAGIC ) + 1 + len( codec ) )
+        comBytes = IF.read()
+    # end with
+    # return
+    return pickle.loads( decompressBytes( comBytes, codec ) )
+
+
+def benchmarkCodecs( H0DF, work_dir, repeats=5 ):
+    """Time writing and reading a realization with each available codec
+
+    Args:
+        H0DF (pd.DataFrame): realization outputs
+        work_dir (str): directory for the temporary files
+
+    KWargs:
+        repeats (int): writes and reads per codec, the fastest is kept
+
+    Returns:
+        pd.DataFrame: size in MB, compression ratio, and write and read
+                      throughput in MB/s of uncompressed data, by codec
+
+    """
+    # imports
+    import time
+    # start
+    rawMB = len( pickle.dumps( H0DF, protocol=pickle.HIGHEST_PROTOCOL ) ) / 1.0e6
+    ResDict = dict()
+    for codec in availableCodecs():
+        TmpFP = os.path.join( work_dir, "codec_bench_%s.pickle" % codec )
+        wTimes = list()
+        rTimes = list()
+        for _ in range( repeats ):
+            tStart = time.perf_counter()
+            writeRealPickle( H0DF, TmpFP, codec=codec )
+            wTimes.append( time.perf_counter() - tStart )
+            tStart = time.perf_counter()
+            readRealPickle( TmpFP )
+            rTimes.append( time.perf_counter() - tStart )
+        # end for
+        fileMB = os.path.getsize( TmpFP ) / 1.0e6
+        os.remove( TmpFP )
+        ResDict[codec] = { "size_MB" : fileMB,
+                           "ratio" : rawMB / fileMB,
+                           "write_MBps" : rawMB / min( wTimes ),
+                           "read_MBps" : rawMB / min( rTimes ), }
+    # end for
+    # return
+    return pd.DataFrame.from_dict( ResDict, orient="index" )
+
+
+def benchRealization( start="2024-01-01", end="2065-12-31", seed=11 ):
+    """Synthetic realization DataFrame with the output columns, for the
+    benchmark when no simulated realization is at hand."""
+    # imports
+    import numpy as np
+    # start
+    DT_INDEX = pd.date_range( start=start, end=end, freq='D' )
+    numDays = len( DT_INDEX )
+    rGen = np.random.default_rng( seed )
+    doy = DT_INDEX.dayofyear.to_numpy()
+    season = np.sin( 2.0 * np.pi * ( doy - 100 ) / 366.0 )
+    TMax = 27.0 + 8.0 * season + rGen.normal( 0.0, 3.0, numDays )
+    TMin = TMax - 12.0 + rGen.normal( 0.0, 2.0, numDays )
+    Precip = np.where( rGen.random( numDays ) < 0.25,
+                       rGen.gamma( 0.7, 9.0, numDays ), 0.0 )
+    ETo = np.maximum( 0.0, 4.5 + 2.5 * season +
+                      rGen.normal( 0.0, 0.6, numDays ) )
+    H0DF = pd.DataFrame( index=DT_INDEX,
+                         data={ "Tmax_C" : TMax, "Tmin_C" : TMin,
+                                "Precip_mm" : Precip,
+                                "Tave_C" : 0.5 * ( TMax + TMin ),
+                                "ETo_mm" : ETo, "Def_mm" : Precip - ETo, } )
+    # return
+    return H0DF
+
+
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+    parser = argparse.ArgumentParser(description='Realization codec benchmark')
+    parser.add_argument(
+        'real_file', nargs='?', default=None,
+        help='Realization _DF.pickle to benchmark, default synthetic')
+    parser.add_argument(
+        '--repeats', type=int, default=5,
+        help='Writes and reads per codec')
+    args = parser.parse_args()
+    if args.real_file is None:
+        BenchDF = benchRealization()
+    else:
+        BenchDF = readRealPickle( args.real_file )
+    # end if
+    print("Realization of %d days and %d columns" % BenchDF.shape )
+    with tempfile.TemporaryDirectory() as TmpDir:
+        print( benchmarkCodecs( BenchDF, TmpDir, repeats=args.repeats
+                              ).round( 2 ).to_string() )
+    # end with
+    # end of main
+
+
+#EOF
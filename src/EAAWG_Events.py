@@ -14,7 +14,10 @@
 """
 
 # imports
+import math
 import numpy as np
+import EAAWG_Seeds as WGSEED
+import EAAWG_Writer as WGWR
 from scipy import stats as scstats
 # Copyright and License
 """
@@ -41,14 +44,14 @@ along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
 """
 
 # global parameters
-ACT_EVENT_DICT = None
-"""Dictionary for actual or instantiated event objects. Each event has two
-random samplers, one for magnitude and one for recurrence, and has one 
-ExtremeEvent object."""
-TTRIG_EVENT_TRACK_DICT = None
-"""Dictionary for tracking the events that are or could be triggered."""
-NEXT_EVENT_DICT = None
-"""Dictionary that stores the next event time and magnitude."""
+SCHEDULE_PAD = 8
+"""Extra draws for each event schedule beyond twice the expected number of
+events in the simulation period"""
+TRIG_DTYPE = np.dtype( [ ( "event", np.int32 ), ( "day", np.int64 ),
+                         ( "mag", np.float64 ) ] )
+"""Triggered event record, event index, day index, and magnitude in mm"""
+NO_TRIGGER_DAY = np.iinfo( np.int64 ).max
+"""Next trigger day when there are no custom events"""
 
 
 # class definitions
@@ -108,6 +111,9 @@ class ExtremeEvent(object):
             ErrorMsg = "aveRecurYrs must be >= 2!!!"
             raise CreateEventError( ErrorMsg )
         self.name = name
+        self.aveRecurYrs = float( aveRecurYrs )
+        self.lowMag = lowMag
+        self.highMag = highMag
         self.poisson = scstats.poisson( float(aveRecurYrs) )
         scaler = highMag - lowMag
         self.uniform = scstats.uniform( loc=lowMag, scale=scaler )
@@ -131,6 +137,9 @@ class ExtremeEvent(object):
             Decimal days until the event occurs.
 
         """
+        if isinstance( rstate, np.random.Generator ):
+            return float( rstate.poisson( self.aveRecurYrs ) ) * 365.25
+        # end if
         offsetYrs = self.poisson.rvs( size=1, random_state=rstate )
         eventOffsetDays = float( offsetYrs[0] ) * 365.25
         return eventOffsetDays
@@ -152,9 +161,58 @@ class ExtremeEvent(object):
             Event magnitude in millimeters for the next event.
 
         """
+        if isinstance( rstate, np.random.Generator ):
+            return float( rstate.uniform( self.lowMag, self.highMag ) )
+        # end if
         evMag = self.uniform.rvs( size=1, random_state=rstate )
         eventMag_mm = float( evMag[0] )
         return eventMag_mm
+    
+    def nextEventDaysArray( self, rstate, asize ):
+        """Select the arrival times for the next asize events. Gives the same
+        values as asize calls to nextEventDays.
+
+        Parameters
+        ----------
+        rstate : np.random_state
+            Random state object that is the sampler.
+        asize : int
+            Number of arrival times.
+
+        Returns
+        -------
+        np.ndarray
+            Decimal days from each event to the following one.
+
+        """
+        if isinstance( rstate, np.random.Generator ):
+            offsetYrs = rstate.poisson( self.aveRecurYrs, size=asize )
+        else:
+            offsetYrs = self.poisson.rvs( size=asize, random_state=rstate )
+        # end if
+        return offsetYrs.astype( np.float64 ) * 365.25
+    
+    def nextEventDailyMagArray( self, rstate, asize ):
+        """Sample the magnitudes in mm for the next asize events. Gives the
+        same values as asize calls to nextEventDailyMag.
+
+        Parameters
+        ----------
+        rstate : np.random_state
+            Random state object that is the sampler.
+        asize : int
+            Number of magnitudes.
+
+        Returns
+        -------
+        np.ndarray
+            Event magnitudes in millimeters.
+
+        """
+        if isinstance( rstate, np.random.Generator ):
+            return rstate.uniform( self.lowMag, self.highMag, size=asize )
+        # end if
+        return self.uniform.rvs( size=asize, random_state=rstate )
 
 
 class EventRecurSampler(object):
@@ -165,15 +223,18 @@ class EventRecurSampler(object):
     random numbers.
     """
     
-    def __init__( self, evrecur_sample_seed=None ):
+    def __init__( self, evrecur_sample_seed=None, backend="scipy" ):
         """Default initialization method
         
         KWargs:
             evrecur_sample_seed (int): the seed to use for the sampler
+            backend (str): "scipy" for a legacy np.random.RandomState used
+                           through SciPy distributions or "numpy" for a 
+                           np.random.Generator sampled directly
 
         """
         super().__init__()
-        self.ranstate = np.random.RandomState(seed=evrecur_sample_seed)
+        self.ranstate = WGSEED.makeRandomState( evrecur_sample_seed, backend )
     
     def getSingleVal( self, ):
         """Produce a single value from the random sampler from a uniform
@@ -195,15 +256,18 @@ class EventMagSampler(object):
     random numbers.
     """
     
-    def __init__( self, evmag_sample_seed=None ):
+    def __init__( self, evmag_sample_seed=None, backend="scipy" ):
         """Default initialization method
         
         KWargs:
             evmag_sample_seed (int): the seed to use for the sampler
+            backend (str): "scipy" for a legacy np.random.RandomState used
+                           through SciPy distributions or "numpy" for a 
+                           np.random.Generator sampled directly
 
         """
         super().__init__()
-        self.ranstate = np.random.RandomState(seed=evmag_sample_seed)
+        self.ranstate = WGSEED.makeRandomState( evmag_sample_seed, backend )
     
     def getSingleVal( self, ):
         """Produce a single value from the random sampler from a uniform
@@ -217,116 +281,192 @@ class EventMagSampler(object):
         return self.ranstate.uniform(low=0.0, high=1.0, size=N)
 
 
-# custom functions for dealing with event objects
-def setEvents( recurSeed, magSeed ):
-    """Initial event setup
-
-    Parameters
-    ----------
-    recurSeed : int
-        Event recurrence interval sampling seed.
-    magSeed : int
-        Event magnitude sampling seed.
+class EventTimeline(object):
+    """Arrival and magnitude schedules for all of the custom events in a
+    realization.
 
-    Returns
-    -------
-    None.
+    The interarrival offsets and magnitudes for each event are drawn for
+    the whole simulation period when the timeline is started, and extended
+    if a realization needs more. The arrival day of an event is only known
+    when the event before it triggers, because events only trigger on
+    eligible wet days. The timeline keeps nextDay, the first day index that
+    triggers any event, so the daily check is one integer comparison.
+    Triggered events are recorded in a preallocated TRIG_DTYPE array.
 
+    Values are the same as drawing each arrival time and magnitude one at a
+    time with ExtremeEvent.nextEventDays and nextEventDailyMag.
     """
-    # imports
-    from EAAWG_Inputs import EVENT_DICT, EVENT_KEYS
-    # global
-    global ACT_EVENT_DICT
-    # parameters
-    # locals
-    EvTrackDict = dict()
-    evCnt = 1
-    # start
-    for evName in EVENT_KEYS:
-        evVals = EVENT_DICT[evName]
-        curEvent = ExtremeEvent(evVals[0], evVals[1][0], evVals[1][1], 
-                                name=evName)
-        curRecurSampler = EventRecurSampler(evrecur_sample_seed=(recurSeed+evCnt))
-        curMagSampler = EventMagSampler(evmag_sample_seed=(magSeed+evCnt))
-        EvTrackDict[evName] = [ curEvent, curRecurSampler, curMagSampler ]
-        evCnt += 1
-    # end of custom event for
-    ACT_EVENT_DICT = EvTrackDict
-    # return
-    return
 
+    def __init__( self, eventKeys, events ):
+        """Default initialization method
 
-def setTrackers():
-    """Setup and populate the initial events and tracking information
+        Parameters
+        ----------
+        eventKeys : list
+            Event names.
+        events : list
+            ExtremeEvent for each event name.
 
-    Returns
-    -------
-    None.
+        """
+        super().__init__()
+        self.eventKeys = list( eventKeys )
+        self.events = events
+        self.numEvents = len( self.eventKeys )
+        self.recurStates = None
+        self.magStates = None
+        self.blockSizes = [ SCHEDULE_PAD ] * self.numEvents
+        self.offsets = [ list() for _ in range( self.numEvents ) ]
+        """Interarrival offsets in days for each event"""
+        self.mags = [ list() for _ in range( self.numEvents ) ]
+        """Magnitudes in mm for each event"""
+        self.cursors = [ 0 ] * self.numEvents
+        self.trigTimes = [ 0.0 ] * self.numEvents
+        """Pending trigger time, in days, for each event"""
+        self.trigMags = [ 0.0 ] * self.numEvents
+        """Pending magnitude, in mm, for each event"""
+        self.nextDay = NO_TRIGGER_DAY
+        """First day index that triggers an event"""
+        self.triggered = np.zeros( 0, dtype=TRIG_DTYPE )
+        self.numTriggered = 0
+
+    def start( self, recurStates, magStates, totDays ):
+        """Draw the schedules and set the first pending events
 
-    """
-    # imports
-    from EAAWG_Inputs import EVENT_KEYS
-    # globals
-    global ACT_EVENT_DICT, NEXT_EVENT_DICT, TTRIG_EVENT_TRACK_DICT
-    # parameters
-    # locals
-    toBeTrigDict = dict()
-    trackingDict = dict()
-    # start
-    for evName in EVENT_KEYS:
-        evRecSamp = ACT_EVENT_DICT[evName][1]
-        evMagSamp = ACT_EVENT_DICT[evName][2]
-        curExEvent = ACT_EVENT_DICT[evName][0]
-        curTrigTime = curExEvent.nextEventDays(evRecSamp.ranstate)
-        curTrigMag = curExEvent.nextEventDailyMag(evMagSamp.ranstate)
-        trackingDict[evName] = list()
-        toBeTrigDict[evName] = [ curTrigTime, curTrigMag ]
-    # end event for
-    NEXT_EVENT_DICT = toBeTrigDict
-    TTRIG_EVENT_TRACK_DICT = trackingDict
-    # return
-    return
+        Parameters
+        ----------
+        recurStates : list
+            Recurrence random state for each event.
+        magStates : list
+            Magnitude random state for each event.
+        totDays : int
+            Number of days in the simulation period.
 
+        """
+        self.recurStates = recurStates
+        self.magStates = magStates
+        for eE in range( self.numEvents ):
+            expCount = totDays / ( 365.25 * self.events[eE].aveRecurYrs )
+            self.blockSizes[eE] = int( math.ceil( 2.0 * expCount ) ) + \
+                                  SCHEDULE_PAD
+            self.offsets[eE] = list()
+            self.mags[eE] = list()
+            self.extendSchedule( eE )
+            self.trigTimes[eE] = self.offsets[eE][0]
+            self.trigMags[eE] = self.mags[eE][0]
+            self.cursors[eE] = 1
+        # end for
+        self.triggered = np.zeros( sum( self.blockSizes ), dtype=TRIG_DTYPE )
+        self.numTriggered = 0
+        self.setNextDay()
+
+    def extendSchedule( self, eE ):
+        """Draw the next block of offsets and magnitudes for an event"""
+        curExEvent = self.events[eE]
+        asize = self.blockSizes[eE]
+        self.offsets[eE].extend( curExEvent.nextEventDaysArray(
+                                    self.recurStates[eE], asize ).tolist() )
+        self.mags[eE].extend( curExEvent.nextEventDailyMagArray(
+                                    self.magStates[eE], asize ).tolist() )
+
+    def setNextDay( self ):
+        """Day index of the next trigger. An event triggers on the first
+        eligible day strictly after its trigger time."""
+        if self.numEvents < 1:
+            self.nextDay = NO_TRIGGER_DAY
+        else:
+            self.nextDay = int( math.floor( min( self.trigTimes ) ) ) + 1
+        # end if
+
+    def trigger( self, day ):
+        """Trigger all of the events that are pending before an eligible
+        day, record them, and schedule the next of each.
 
-def updateTriggeredEvent( evCnt, curTime, curElapsDays ):
-    """Update an event that has been triggered
+        Parameters
+        ----------
+        day : int
+            Day index, eligible for events and at least nextDay.
+
+        Returns
+        -------
+        float
+            Summed magnitude, in mm, of the triggered events.
+
+        """
+        totMag = 0.0
+        for eE in range( self.numEvents ):
+            if self.trigTimes[eE] < day:
+                totMag += self.trigMags[eE]
+                if self.numTriggered >= len( self.triggered ):
+                    self.triggered = np.concatenate( [ self.triggered,
+                                        np.zeros( len( self.triggered ) + 1,
+                                                  dtype=TRIG_DTYPE ) ] )
+                # end if
+                self.triggered[self.numTriggered] = ( eE, day,
+                                                      self.trigMags[eE] )
+                self.numTriggered += 1
+                cIndex = self.cursors[eE]
+                if cIndex >= len( self.offsets[eE] ):
+                    self.extendSchedule( eE )
+                # end if
+                self.trigTimes[eE] = float( day ) + self.offsets[eE][cIndex]
+                self.trigMags[eE] = self.mags[eE][cIndex]
+                self.cursors[eE] = cIndex + 1
+            # end if
+        # end for
+        self.setNextDay()
+        return totMag
+
+    def trigDict( self ):
+        """Triggered events for outputBigEvents
+
+        Returns
+        -------
+        dict
+            [day index, magnitude] lists by event name.
+
+        """
+        trigArr = self.triggered[:self.numTriggered]
+        return { x : [ [ int( y["day"] ), float( y["mag"] ) ] for y in
+                       trigArr[trigArr["event"] == eE] ]
+                 for eE, x in enumerate( self.eventKeys ) }
+
+    def nextDict( self ):
+        """Pending events for outputBigEvents
+
+        Returns
+        -------
+        dict
+            [trigger time, magnitude] by event name.
+
+        """
+        return { x : [ self.trigTimes[eE], self.trigMags[eE] ]
+                 for eE, x in enumerate( self.eventKeys ) }
+
+
+# custom functions for dealing with event objects
+def makeEvent( evName ):
+    """Create the ExtremeEvent for a custom event from the input module
 
     Parameters
     ----------
-    evCnt : int
-        Index for event name in event dictionaries.
-    curTime : pd.Timestamp
-        Timestep for implementation of triggered event
-    curElapsDays : int
-        Current number of elapsed days into the simulation
+    evName : str
+        Event name, one of EVENT_KEYS.
 
     Returns
     -------
-    None
+    ExtremeEvent
+        The event distributions, without samplers.
 
     """
     # imports
-    from EAAWG_Inputs import EVENT_KEYS
-    # globals
-    global ACT_EVENT_DICT, NEXT_EVENT_DICT, TTRIG_EVENT_TRACK_DICT
-    # parameters
-    # locals
+    from EAAWG_Inputs import EVENT_DICT
     # start
-    evRecSamp = ACT_EVENT_DICT[EVENT_KEYS[evCnt]][1]
-    evMagSamp = ACT_EVENT_DICT[EVENT_KEYS[evCnt]][2]
-    curExEvent = ACT_EVENT_DICT[EVENT_KEYS[evCnt]][0]
-    curTrigTime = curExEvent.nextEventDays(evRecSamp.ranstate)
-    curTrigMag = curExEvent.nextEventDailyMag(evMagSamp.ranstate)
-    TTRIG_EVENT_TRACK_DICT[EVENT_KEYS[evCnt]].append( [curTime, 
-                                NEXT_EVENT_DICT[EVENT_KEYS[evCnt]][1] ] )
-    nextTrigTime = float( curElapsDays ) + curTrigTime
-    NEXT_EVENT_DICT[EVENT_KEYS[evCnt]][0] = nextTrigTime
-    NEXT_EVENT_DICT[EVENT_KEYS[evCnt]][1] = curTrigMag
+    evVals = EVENT_DICT[evName]
     # return
-    return
+    return ExtremeEvent( evVals[0], evVals[1][0], evVals[1][1], name=evName )
 
 
-def outputEventTracking( RealNum, DT_INDEX ):
+def outputEventTracking( RealNum, DT_INDEX, trig_dict, next_dict ):
     """Output event information for this realization
 
     Parameters
@@ -335,6 +475,12 @@ def outputEventTracking( RealNum, DT_INDEX ):
         Current realization index.
     DT_INDEX : pd.DateTimeIndex
         Index for all outputs
+    trig_dict : dict
+        Triggered events, [day index, magnitude] lists by event name, from
+        EventTimeline.trigDict.
+    next_dict : dict
+        Next [trigger time, magnitude] by event name, from
+        EventTimeline.nextDict.
 
     Returns
     -------
@@ -345,8 +491,6 @@ def outputEventTracking( RealNum, DT_INDEX ):
     from os import path
     import pandas as pd
     from EAAWG_Inputs import EVENT_KEYS, OUT_LABEL, OUT_DIR, OUT_SUB_DIR
-    # globals
-    global NEXT_EVENT_DICT, TTRIG_EVENT_TRACK_DICT
     # parameters
     # locals
     # start
@@ -361,14 +505,15 @@ def outputEventTracking( RealNum, DT_INDEX ):
                   (StartTS.strftime("%Y-%m-%d"), EndTS.strftime("%Y-%m-%d")))
         for evName in EVENT_KEYS:
             OF.write("    %s events \n" % evName )
-            trigList = TTRIG_EVENT_TRACK_DICT[evName]
+            trigList = trig_dict[evName]
             if len(trigList) > 0:
                 for levList in trigList:
-                    OF.write("        %s  %5.1f mm \n" % 
-                             ( levList[0].strftime("%Y-%m-%d"), levList[1] ) )
+                    OF.write("        %s  %5.1f mm \n" %
+                             ( DT_INDEX[levList[0]].strftime("%Y-%m-%d"),
+                               levList[1] ) )
                 # end for event
             else:
-                nextEventList = NEXT_EVENT_DICT[evName]
+                nextEventList = next_dict[evName]
                 futureTS = StartTS + pd.Timedelta(days=nextEventList[0])
                 OF.write("        No events triggered, first event %s  %5.1f mm \n" 
                          % ( futureTS.strftime("%Y-%m-%d"), nextEventList[1] ) )
@@ -379,7 +524,7 @@ def outputEventTracking( RealNum, DT_INDEX ):
     # return
     return
 
-def outputBigEvents( RealNum, DT_INDEX ):
+def outputBigEvents( RealNum, DT_INDEX, trig_dict, next_dict ):
     """Output event information for this realization
 
     Parameters
@@ -388,6 +533,12 @@ def outputBigEvents( RealNum, DT_INDEX ):
         Current realization index.
     DT_INDEX : pd.DateTimeIndex
         Index for all outputs
+    trig_dict : dict
+        Triggered events, [day index, magnitude] lists by event name, from
+        EventTimeline.trigDict.
+    next_dict : dict
+        Next [trigger time, magnitude] by event name, from
+        EventTimeline.nextDict.
 
     Returns
     -------
@@ -398,12 +549,9 @@ def outputBigEvents( RealNum, DT_INDEX ):
     from os import path
     import pandas as pd
     from EAAWG_Inputs import EVENT_KEYS, OUT_LABEL, OUT_DIR, OUT_SUB_DIR
-    # globals
-    global NEXT_EVENT_DICT, TTRIG_EVENT_TRACK_DICT
     # parameters
     Key50 = "50-year"
     Key100 = "100-year"
-    # locals
     # start
     EndTS = DT_INDEX[len(DT_INDEX)-1]
     StartTS = DT_INDEX[0]
@@ -411,68 +559,44 @@ def outputBigEvents( RealNum, DT_INDEX ):
     # examine our events to see if need to output
     ShouldOutput = False
     if Key50 in EVENT_KEYS:
-        if len( TTRIG_EVENT_TRACK_DICT[Key50] ) > 0:
+        if len( trig_dict[Key50] ) > 0:
             ShouldOutput = True
         # end inner if
     # end outer if
     if Key100 in EVENT_KEYS:
-        if len( TTRIG_EVENT_TRACK_DICT[Key100] ) > 0:
+        if len( trig_dict[Key100] ) > 0:
             ShouldOutput = True
         # end inner if
     # end outer if
     if ShouldOutput:
         OFileName = "%s_R%d_EventsSummary.txt" % (OUT_LABEL, RealNum)
         OutFP = path.normpath( path.join( OUT_DIR, OUT_SUB_DIR, OFileName ) )
-        with open( OutFP, 'w' ) as OF:
-            OF.write("Event summary for realization %d \n" % RealNum )
-            OF.write("    Simulation from %s through %s \n\n" % 
-                      (StartTS.strftime("%Y-%m-%d"), EndTS.strftime("%Y-%m-%d")))
-            for evName in EVENT_KEYS:
-                OF.write("    %s events \n" % evName )
-                trigList = TTRIG_EVENT_TRACK_DICT[evName]
-                if len(trigList) > 0:
-                    for levList in trigList:
-                        OF.write("        %s  %5.1f mm \n" % 
-                                 ( levList[0].strftime("%Y-%m-%d"), levList[1] ) )
-                    # end for event
-                else:
-                    nextEventList = NEXT_EVENT_DICT[evName]
-                    futureTS = StartTS + pd.Timedelta(days=nextEventList[0])
-                    OF.write("        No events triggered, first event %s  %5.1f mm \n" 
-                             % ( futureTS.strftime("%Y-%m-%d"), nextEventList[1] ) )
-                # end if event triggered
-                OF.write("\n")
-            # end for custom event
-        # end with and close file
+        OutLines = list()
+        OutLines.append("Event summary for realization %d \n" % RealNum )
+        OutLines.append("    Simulation from %s through %s \n\n" % 
+                  (StartTS.strftime("%Y-%m-%d"), EndTS.strftime("%Y-%m-%d")))
+        for evName in EVENT_KEYS:
+            OutLines.append("    %s events \n" % evName )
+            trigList = trig_dict[evName]
+            if len(trigList) > 0:
+                for levList in trigList:
+                    OutLines.append("        %s  %5.1f mm \n" %
+                             ( DT_INDEX[levList[0]].strftime("%Y-%m-%d"),
+                               levList[1] ) )
+                # end for event
+            else:
+                nextEventList = next_dict[evName]
+                futureTS = StartTS + pd.Timedelta(days=nextEventList[0])
+                OutLines.append("        No events triggered, first event %s  %5.1f mm \n" 
+                         % ( futureTS.strftime("%Y-%m-%d"), nextEventList[1] ) )
+            # end if event triggered
+            OutLines.append("\n")
+        # end for custom event
+        # write in the background, see EAAWG_Writer
+        WGWR.submitWrite( WGWR.writeText, OutFP, "".join( OutLines ) )
     # end if output
     # return
     return
 
 
-def cleanAllEnd():
-    """Convenience method to clean/delete all samplers at end
-
-    """
-    global ACT_EVENT_DICT, NEXT_EVENT_DICT, TTRIG_EVENT_TRACK_DICT
-    # now set to None
-    ACT_EVENT_DICT = None
-    NEXT_EVENT_DICT = None
-    TTRIG_EVENT_TRACK_DICT = None
-    # end
-    return
-
-
-def setAllBegin():
-    """Convenience method to seta all at beginning
-
-    """
-    global ACT_EVENT_DICT, NEXT_EVENT_DICT, TTRIG_EVENT_TRACK_DICT
-    # now set to None
-    ACT_EVENT_DICT = dict()
-    NEXT_EVENT_DICT = dict()
-    TTRIG_EVENT_TRACK_DICT = dict()
-    # return
-    return
-
-
-#EOF
\ No newline at end of file
+#EOF
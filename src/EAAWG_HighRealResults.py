@@ -38,6 +38,12 @@ along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
 import pandas as pd
 import numpy as np
 import EAAWG_Inputs as WGI
+import EAAWG_Calendar as WGCAL
+import EAAWG_RealStore as WGRS
+import EAAWG_Writer as WGWR
+import EAAWG_Profile as WGPRF
+import EAAWG_Codecs as WGCOD
+import EAAWG_Schema as WGSCM
 
 
 #------------------------------------------------------------------------
@@ -47,95 +53,45 @@ PRE_IND = 2
 TOT_VALS = 3
 
 # Program, global data structures
-H0_REAL = None
-"""Single realization output for H0 case"""
+SO_MMD_CACHE = dict()
+"""Extraterrestrial radiation by day of year, keyed by latitude"""
 
 #--------------------------------------------------------------------------
 # python functions
-def createSimStructures(TotDays):
-    """Convenience method to create and set the simulation structures
-    """
-    # imports
-    # globals
-    global H0_REAL, TOT_VALS
-    # start of function
-    H0_REAL = np.zeros( (TotDays, TOT_VALS ), dtype=np.float32 )
-    # end
-
-
-def assignDryDep( tIndex ):
-    """Assign dry precipitation depth (i.e. 0) to the correct time interval
-    
-    Args:
-        tIndex (int): current time interval
-    
-    """
-    # imports
-    # start
-    global H0_REAL, PRE_IND
-    # start function
-    H0_REAL[tIndex, PRE_IND] = 0.0
-    # end of function
-
-def assignWetDep( tIndex, pVal):
-    """Assign precipitation depth (i.e. 0) to the H0 data structure.
-    
-    Args:
-        tIndex (int): current time interval
-        pVal (float): current precipitation depth for the day
-    
-    """
-    # globals
-    global H0_REAL, PRE_IND
-    # start
-    H0_REAL[tIndex, PRE_IND] = pVal
-    # end of function
-
-def assignTemp( tIndex, MaxT, MinT ):
-    """Convenience function to assign simulated temperature values.
-    
-    Args:
-        tIndex (int): the time index
-        MaxT (float): max temp
-        MinT (float): min temp
-    
-    """
-    # globals
-    global H0_REAL, TMAX_IND, TMIN_IND
-    # start
-    H0_REAL[tIndex, TMAX_IND] = MaxT
-    H0_REAL[tIndex, TMIN_IND] = MinT
-    # end
-
-def outputRealResults(RealNum, DT_INDEX):
+def outputRealResults(RealNum, DT_INDEX, h0_real, codec=WGCOD.DEF_CODEC):
     """Output the results for the current realization. Use Pandas DataFrames
     and pickles.
     
     Args:
         RealNum (int): current realization number.
         DT_INDEX (pd.DateTimeIndex): index for all outputs
+        h0_real (np.ndarray): simulated values from a 
+                          EAAWG_Realization.Realization
+        codec (str): realization file codec, see EAAWG_Codecs
     """
     # imports
     import pandas as pd
     from os import path
     # globals
-    global H0_REAL, PRE_IND, TMAX_IND, TMIN_IND, TOT_VALS
+    global PRE_IND, TMAX_IND, TMIN_IND, TOT_VALS
     # start
     # file names
     H0FileName = "%s_R%d_DF.pickle" % (WGI.OUT_LABEL, RealNum)
     H0OutFP = path.normpath( path.join( WGI.OUT_DIR, WGI.OUT_SUB_DIR, 
                                         H0FileName ) )
     # make our DataFrames
-    H0DDict = { "Tmax_C" : H0_REAL[:,TMAX_IND],
-                "Tmin_C" : H0_REAL[:,TMIN_IND],
-                "Precip_mm" : H0_REAL[:,PRE_IND], }
+    H0DDict = { "Tmax_C" : h0_real[:,TMAX_IND],
+                "Tmin_C" : h0_real[:,TMIN_IND],
+                "Precip_mm" : h0_real[:,PRE_IND], }
     # end of for
     H0DF = pd.DataFrame( index=DT_INDEX, data=H0DDict )
-    H0DF.to_pickle( H0OutFP, compression='zip' )
+    WGCOD.writeRealPickle( H0DF, H0OutFP, codec=codec )
     # end
     return
 
-def outputWSResults(RealNum, DT_INDEX, TotDays):
+def outputWSResults(RealNum, DT_INDEX, TotDays, h0_real, out_format="pickle",
+                    sim_cal=None, codec=WGCOD.DEF_CODEC,
+                    schema=WGSCM.DEF_SCHEMA):
     """Output the watershed results for the current realizationn. Use Pandas DataFrames
     and pickles. Uses area average of precipitation grid cells to calc the WS precip.
     
@@ -143,11 +99,26 @@ def outputWSResults(RealNum, DT_INDEX, TotDays):
         RealNum (int): current realization number.
         DT_INDEX (pd.DateTimeIndex): index for all outputs
         TotDays (int): total number of days in realization
+        h0_real (np.ndarray): simulated values from a 
+                          EAAWG_Realization.Realization
+        out_format (str): "pickle" for one zip compressed pickle per 
+                          realization, "store" to write into the basin
+                          realization store, see EAAWG_RealStore, or "none"
+                          to skip writing
+        sim_cal (EAAWG_Calendar.SimCalendar): simulation calendar for
+                          DT_INDEX, optional
+        codec (str): realization file codec for "pickle", see 
+                          EAAWG_Codecs
+        schema (str): realization file schema for "pickle", see
+                          EAAWG_Schema
+
+    Returns:
+        H0DF (pd.DataFrame): realization outputs
     """
     # imports
     from os import path
     # globals
-    global H0_REAL, H1_REAL, PRE_START_IND, TMAX_IND, TMIN_IND
+    global H1_REAL, PRE_START_IND, TMAX_IND, TMIN_IND
     # start
     # file names
     #H0FileName = "WS_%s_R%d_DF.pickle" % (WGI.OUT_LABEL, RealNum)
@@ -155,58 +126,97 @@ def outputWSResults(RealNum, DT_INDEX, TotDays):
     H0OutFP = path.normpath( path.join( WGI.OUT_DIR, WGI.OUT_SUB_DIR, 
                                         H0FileName ) )
     # make our DataFrame
-    H0DDict = { "Tmax_C" : H0_REAL[:,TMAX_IND],
-                "Tmin_C" : H0_REAL[:,TMIN_IND],
-                "Precip_mm" : H0_REAL[:,PRE_IND], }
-    TAve = 0.5 * ( H0_REAL[:,TMAX_IND] + H0_REAL[:,TMIN_IND] )
+    H0DDict = { "Tmax_C" : h0_real[:,TMAX_IND],
+                "Tmin_C" : h0_real[:,TMIN_IND],
+                "Precip_mm" : h0_real[:,PRE_IND], }
+    TAve = 0.5 * ( h0_real[:,TMAX_IND] + h0_real[:,TMIN_IND] )
     H0DDict["Tave_C"] = TAve
     H0DF = pd.DataFrame( index=DT_INDEX, data=H0DDict )
-    H0DF["ETo_mm"] = calcPET_HS( DT_INDEX, H0DF )
+    with WGPRF.phase( "pet" ):
+        H0DF["ETo_mm"] = calcPET_HS( DT_INDEX, H0DF, sim_cal=sim_cal )
+    # end with
     H0DF["Def_mm"] = H0DF["Precip_mm"] - H0DF["ETo_mm"]
-    # write out all of our waterbalance related DataFrames
-    H0DF.to_pickle( H0OutFP, compression='zip' )
+    # write out all of our waterbalance related DataFrames, in the
+    #  background, see EAAWG_Writer
+    if out_format == "store":
+        WGWR.submitWrite( WGRS.getWriteStore().writeRealization, RealNum,
+                          H0DF )
+    elif out_format != "none":
+        WGWR.submitWrite( WGSCM.writeRealization, H0DF, H0OutFP,
+                          schema=schema, codec=codec )
+    # end if
     # end
-    return
+    return H0DF
+
+def calcSo_HS( LatDeg ):
+    """Calculate the extraterrestrial radiation, in mm/day, for each day of 
+    the year for Hargreaves-Samani. Results are cached by latitude.
+
+    Args:
+        LatDeg (float): latitude in degrees
+    
+    Returns:
+        S_o_mmd (np.array): (366,) extraterrestrial radiation for day of 
+                            the year 1 to 366
+    """
+    # imports
+    import math
+    # globals
+    global SO_MMD_CACHE
+    # start of function
+    if LatDeg in SO_MMD_CACHE:
+        return SO_MMD_CACHE[LatDeg]
+    # end if
+    DayOYr = np.arange( 1, 367, 1 )
+    SDec_rad = 0.4093 * np.sin( ( ( ( 2.0 * math.pi ) / 365.0 ) * DayOYr ) - 1.405 )
+    SunS_rad = np.arccos( -1.0 * math.tan(math.radians(LatDeg)) * np.tan(SDec_rad) )
+    RelDEtoS = 1.0 + 0.033 * np.cos( ( ( 2.0 * math.pi ) / 365.0 ) * DayOYr )
+    #MaxDayHrs = (24.0/math.pi) * SunS_rad
+    S_o_mmd = 15.392 * RelDEtoS * ( ( SunS_rad * math.sin( math.radians(LatDeg) ) * 
+                                      np.sin( SDec_rad ) ) + 
+                                   ( math.cos( math.radians(LatDeg) ) * 
+                                     np.cos( SDec_rad ) * np.sin( SunS_rad ) ) ) 
+    SO_MMD_CACHE[LatDeg] = S_o_mmd
+    # return
+    return S_o_mmd
 
-def calcPET_HS( DT_INDEX, H0DF ):
+def calcPET_HS( DT_INDEX, H0DF, sim_cal=None ):
     """Calculate PET in mm using Hargreaves-Samani
 
+    Adds the "MonDelta_T" column, the monthly average Tmax minus the monthly
+    average Tmin, to H0DF.
+
     Args:
         DT_INDEX (pd.DateTimeIndex): index for all outputs
         H0DF (pd.DataFrame): dataframe with all the values
+        sim_cal (EAAWG_Calendar.SimCalendar): simulation calendar for
+                    DT_INDEX, gives the month groups and day of the year.
+                    None to get the calendar for DT_INDEX from
+                    EAAWG_Calendar.getCalendar.
     
     Returns:
         ETo_mmd (np.array): PET depths per day in mm
     """
     # imports
-    import math
     from EAAWG_Inputs import LAT_DEG
     # start of function
     # get the TAve array
     TAve = H0DF["Tave_C"].to_numpy(dtype=np.float32)
-    MaxTDaily = H0DF[["Tmax_C"]].copy()
-    MinTDaily = H0DF[["Tmin_C"]].copy()
-    MonMaxTDaily = MaxTDaily.resample('MS').mean()
-    MonMinTDaily = MinTDaily.resample('MS').mean()
-    H0DF["MonDelta_T"] = 0.0
-    for indx, row in H0DF.iterrows():
-        curMonTS = pd.Timestamp( indx.year, indx.month, 1, 0, )
-        H0DF.at[indx,"MonDelta_T"] = ( MonMaxTDaily.at[curMonTS,"Tmax_C"] - 
-                                       MonMinTDaily.at[curMonTS,"Tmin_C"] )
-    # end for
+    # monthly averages by integer month index and then back to days
+    if sim_cal is None:
+        sim_cal = WGCAL.getCalendar( DT_INDEX[0], DT_INDEX[-1] )
+    # end if
+    MonCodes = sim_cal.monCode
+    DayOYr = sim_cal.doy
+    MonMaxT = H0DF["Tmax_C"].groupby( MonCodes ).mean().to_numpy()
+    MonMinT = H0DF["Tmin_C"].groupby( MonCodes ).mean().to_numpy()
+    MonDelta_T = MonMaxT - MonMinT
+    H0DF["MonDelta_T"] = MonDelta_T[MonCodes].astype( np.float64 )
     Delta_T = H0DF["MonDelta_T"].to_numpy(dtype=np.float32)
     Delta_T = np.where( Delta_T < 1.0, 1.0, Delta_T )
     useDelta_T = np.power( Delta_T, 0.5 )
     # solar rad calcs
-    DayOYr = DT_INDEX.dayofyear.to_numpy()
-    SDec_rad = 0.4093 * np.sin( ( ( ( 2.0 * math.pi ) / 365.0 ) * DayOYr ) - 1.405 )
-    SunS_rad = np.arccos( -1.0 * math.tan(math.radians(LAT_DEG)) * np.tan(SDec_rad) )
-    RelDEtoS = 1.0 + 0.033 * np.cos( ( ( 2.0 * math.pi ) / 365.0 ) * DayOYr )
-    #MaxDayHrs = (24.0/math.pi) * SunS_rad
-    S_o_mmd = 15.392 * RelDEtoS * ( ( SunS_rad * math.sin( math.radians(LAT_DEG) ) * 
-                                      np.sin( SDec_rad ) ) + 
-                                   ( math.cos( math.radians(LAT_DEG) ) * 
-                                     np.cos( SDec_rad ) * np.sin( SunS_rad ) ) ) 
+    S_o_mmd = calcSo_HS( LAT_DEG )[DayOYr - 1]
     # now for the PET calc
     ETo_mmd = 0.0023 * S_o_mmd * useDelta_T * ( TAve + 17.8 )
     # return
@@ -232,10 +242,4 @@ def adjustETo( Ks, ETo, Precip, RRDay=1.0 ):
     # return
     return PET
 
-def cleanAllEnd():
-    """Convenience method to clean up at the end"""
-    global H0_REAL
-    # start
-    H0_REAL = None
-
 # EOF
\ No newline at end of file
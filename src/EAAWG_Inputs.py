@@ -9,6 +9,9 @@
 Provides the inputs module where all input values and shared parameters can
 be entered. This functionality can be replaced with a GUI in the future. Also
 holds the shared  data structures.
+
+The basin input tables are read from their pickles on first use and cached
+for the life of the process; see BASIN_INPUT_FILES and getOWArrays.
  
 """
 # Copyright and License
@@ -36,6 +39,7 @@ along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
 """
 
 import pandas as pd
+import numpy as np
 import pickle
 import os
  
@@ -44,6 +48,8 @@ import os
 CUR_DIR = os.getcwd()
 OUT_DIR = os.path.normpath( os.path.join( CUR_DIR, "Results" ) )
 """Location for model outputs"""
+INPUT_DIR = os.path.normpath( os.path.join( CUR_DIR, "Inputs" ) )
+"""Location of the basin input pickles"""
 OUT_LABEL = r'Frio'
 """Label to use for outputting files to OUT_DIR"""
 OUT_SUB_DIR = "Simulated"
@@ -76,56 +82,52 @@ DRY_STATE = "dry"
 #------------------------------------------------------------------------
 # Other weather parameter model files
 bas = "Frio"
-InFiler = os.path.normpath( os.path.join( CUR_DIR, "Inputs",
-                        "OWeath_Smooth_WetAve_1981-2010_DictDF.pkl" ) )
-with open( InFiler, 'rb' ) as IF:
-    InDictWA = pickle.load( IF )
-# end with
-OW_WET_AVE = InDictWA[bas]
-"""Average wet day quantities by day of the year. Contains Tmax, Tmin, and Tave"""
-InFiler = os.path.normpath( os.path.join( CUR_DIR, "Inputs",
-                        "OWeath_Smooth_DryAve_1981-2010_DictDF.pkl" ) )
-with open( InFiler, 'rb' ) as IF:
-    InDictDA = pickle.load( IF )
-# end with
-OW_DRY_AVE = InDictDA[bas]
-"""Average dry day quantities by day of the year. Contains Tmax, Tmin, and Tave"""
-InFiler = os.path.normpath( os.path.join( CUR_DIR, "Inputs",
-                        "OWeath_Smooth_WetStd_1981-2010_DictDF.pkl" ) )
-with open( InFiler, 'rb' ) as IF:
-    InDictWS = pickle.load( IF )
-# end with
-OW_WET_STD = InDictWS[bas]
-"""Average wet day standard deviations for Tmax, Tmin, and Tave"""
-InFiler = os.path.normpath( os.path.join( CUR_DIR, "Inputs",
-                        "OWeath_Smooth_DryStd_1981-2010_DictDF.pkl" ) )
-with open( InFiler, 'rb' ) as IF:
-    InDictDS = pickle.load( IF )
-# end with
-OW_DRY_STD = InDictDS[bas]
-"""Average dry day standard deviations for Tmax, Tmin, and Tave"""
- 
+BASIN_INPUT_FILES = { "OW_WET_AVE" : "OWeath_Smooth_WetAve_1981-2010_DictDF.pkl",
+                      "OW_DRY_AVE" : "OWeath_Smooth_DryAve_1981-2010_DictDF.pkl",
+                      "OW_WET_STD" : "OWeath_Smooth_WetStd_1981-2010_DictDF.pkl",
+                      "OW_DRY_STD" : "OWeath_Smooth_DryStd_1981-2010_DictDF.pkl",
+                      "OW_M0_IN" : "OWeath_Rho0_1991-2020_DFDict.pkl",
+                      "OW_M1_IN" : "OWeath_Rho1_1991-2020_DFDict.pkl", }
+"""Input pickle, in INPUT_DIR, for each of the basin input
+tables. Each pickle holds a dictionary with a table for every basin. The
+tables are loaded on first use and only the entry for bas is kept.
+
+  * OW_WET_AVE: average wet day Tmax, Tmin, and Tave by day of the year
+  * OW_DRY_AVE: average dry day Tmax, Tmin, and Tave by day of the year
+  * OW_WET_STD: wet day standard deviations for Tmax, Tmin, and Tave
+  * OW_DRY_STD: dry day standard deviations for Tmax, Tmin, and Tave
+  * OW_M0_IN: M0 matrix for calculating daily error or residual term
+  * OW_M1_IN: M1 matrix for calculating daily error or residual term
+"""
+OW_ARRAY_SPECS = { "WET_TMAX_AVE" : [ "OW_WET_AVE", "Tmax_C" ],
+                   "WET_TMAX_STD" : [ "OW_WET_STD", "Tmax_C" ],
+                   "WET_TMIN_AVE" : [ "OW_WET_AVE", "Tmin_C" ],
+                   "WET_TMIN_STD" : [ "OW_WET_STD", "Tmin_C" ],
+                   "DRY_TMAX_AVE" : [ "OW_DRY_AVE", "Tmax_C" ],
+                   "DRY_TMAX_STD" : [ "OW_DRY_STD", "Tmax_C" ],
+                   "DRY_TMIN_AVE" : [ "OW_DRY_AVE", "Tmin_C" ],
+                   "DRY_TMIN_STD" : [ "OW_DRY_STD", "Tmin_C" ], }
+"""Fourier smoothed day of the year arrays, as the source table and column,
+used by the other weather calculations"""
+INPUT_CACHE_FILE = os.path.normpath( os.path.join( INPUT_DIR,
+                                     "%s_OWeath_Arrays.npz" % bas ) )
+"""Compact binary file with the day of the year arrays for bas. Used in
+place of the pickles when it is newer than all of them."""
+WRITE_INPUT_CACHE = False
+"""Write INPUT_CACHE_FILE when the arrays are built from the pickles"""
+BASIN_CACHE = dict()
+"""Process wide cache of the basin input tables. Filled on first use; pool
+workers started with fork inherit whatever the main process has loaded."""
+OW_ARRAYS = dict()
+"""Process wide cache of the contiguous float64 day of the year arrays"""
+
 # other weather parameters correlation matrices
 A_DATA_LIST = [ [ 0.56219295, 0.2050754 ],
                 [ -0.03543818, 0.68296039 ], ]
 """A matrix for Tmax and Tmin"""
-InFiler = os.path.normpath( os.path.join( CUR_DIR, "Inputs",
-                        "OWeath_Rho0_1991-2020_DFDict.pkl" ) )
-with open( InFiler, 'rb' ) as IF:
-    InDictM0 = pickle.load( IF )
-# end with
-OW_M0_IN = InDictM0[bas]
-"""M0 matrix for calculating daily error or residual term"""
 B_DATA_LIST = [ [ 0.74093011, 0.0 ],
                 [ 0.17681369, 0.72149121 ], ]
 """ B matrix for Tmax and Tmin"""
-InFiler = os.path.normpath( os.path.join( CUR_DIR, "Inputs",
-                        "OWeath_Rho1_1991-2020_DFDict.pkl" ) )
-with open( InFiler, 'rb' ) as IF:
-    InDictM1 = pickle.load( IF )
-# end with
-OW_M1_IN = InDictM1[bas]
-"""M1 matrix for calculating daily error or residual term"""
  
 #------------------------------------------------------------------------
 # distribution specifications
@@ -215,6 +217,134 @@ EVENT_DICT = { "2-year" : [ int(2), [96.0, 153.7479198867500],],
                "50-year" : [ int(50), [285.0, 415.4495994011296],],
                "100-year" : [ int(100), [343.0, 498.1388101352216],], }
 EVENT_KEYS = list( EVENT_DICT.keys() )
- 
- 
+
+
+#------------------------------------------------------------------------
+# functions
+def loadBasinTable( name ):
+    """Get one of the basin input tables, loading it from its pickle on
+    first use.
+
+    Args:
+        name (str): key in BASIN_INPUT_FILES
+
+    Returns:
+        pd.DataFrame: input table for bas
+
+    """
+    # globals
+    global BASIN_CACHE
+    # start
+    if name not in BASIN_CACHE:
+        InFiler = os.path.normpath( os.path.join( INPUT_DIR,
+                                                  BASIN_INPUT_FILES[name] ) )
+        with open( InFiler, 'rb' ) as IF:
+            InDict = pickle.load( IF )
+        # end with
+        BASIN_CACHE[name] = InDict[bas]
+        del InDict
+    # end if
+    # return
+    return BASIN_CACHE[name]
+
+
+def inputCacheCurrent( ):
+    """Check if INPUT_CACHE_FILE exists and is at least as new as all of
+    the input pickles that are present.
+
+    Returns:
+        bool: True if the cache file can be used
+
+    """
+    # start
+    if not os.path.isfile( INPUT_CACHE_FILE ):
+        return False
+    # end if
+    cacheTime = os.path.getmtime( INPUT_CACHE_FILE )
+    for fName in BASIN_INPUT_FILES.values():
+        InFiler = os.path.normpath( os.path.join( INPUT_DIR, fName ) )
+        if os.path.isfile( InFiler ) and ( os.path.getmtime( InFiler ) > cacheTime ):
+            return False
+        # end if
+    # end for
+    # return
+    return True
+
+
+def writeInputCache( ):
+    """Write the day of the year arrays to INPUT_CACHE_FILE. Written to a
+    temporary file first so that concurrent runs never see a partial file.
+
+    Returns:
+        None.
+
+    """
+    # start
+    tmpFiler = "%s.%d.tmp" % ( INPUT_CACHE_FILE, os.getpid() )
+    with open( tmpFiler, 'wb' ) as OF:
+        np.savez( OF, **getOWArrays() )
+    # end with
+    os.replace( tmpFiler, INPUT_CACHE_FILE )
+    # return
+    return
+
+
+def getOWArrays( ):
+    """Get the Fourier smoothed day of the year arrays as contiguous
+    float64 arrays. Built once per process, from INPUT_CACHE_FILE when it
+    is current and otherwise from the basin input tables.
+
+    Returns:
+        dict: OW_ARRAY_SPECS keys with (366,) np.ndarray values
+
+    """
+    # globals
+    global OW_ARRAYS
+    # start
+    if len( OW_ARRAYS ) > 0:
+        return OW_ARRAYS
+    # end if
+    if inputCacheCurrent():
+        with np.load( INPUT_CACHE_FILE ) as InZ:
+            for aKey in OW_ARRAY_SPECS.keys():
+                OW_ARRAYS[aKey] = np.ascontiguousarray( InZ[aKey],
+                                                        dtype=np.float64 )
+            # end for
+        # end with
+    else:
+        for aKey, aSpec in OW_ARRAY_SPECS.items():
+            OW_ARRAYS[aKey] = np.ascontiguousarray(
+                                loadBasinTable( aSpec[0] )[aSpec[1]],
+                                dtype=np.float64 )
+        # end for
+        if WRITE_INPUT_CACHE:
+            writeInputCache()
+        # end if
+    # end if
+    # return
+    return OW_ARRAYS
+
+
+def loadBasinInputs( ):
+    """Fill the process wide caches. Call in the main process before
+    creating the worker pool so that forked workers inherit the inputs.
+
+    Returns:
+        None.
+
+    """
+    # start
+    getOWArrays()
+    # return
+    return
+
+
+def __getattr__( name ):
+    """Lazy module attributes for the basin input tables"""
+    if name in BASIN_INPUT_FILES:
+        return loadBasinTable( name )
+    # end if
+    raise AttributeError( "module %s has no attribute %s" % ( __name__, name ) )
+
+
 #EOF
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: EAAWG_LMoments
+   :platform: Windows, Linux
+   :synopsis: Sample L-moments and generalized logistic distribution fitting
+
+.. moduleauthor:: Nick Martin <nick.martin@alumni.stanford.edu>
+
+Sample probability weighted moments, L-moments, and generalized logistic
+distribution parameters following Appendix A.7 of "Regional Frequency
+Analysis", Hosking and Wallis (1997).
+
+All of the calculations are vectorized and can be done for a batch of
+samples at once. A batch is a 2D array with one sample per row or a list
+of 1D arrays that can have different lengths. The probability weighted
+moments are calculated as dot products of the sorted samples with the
+plotting position weights.
+
+"""
+# Copyright and License
+"""
+Copyright 2023 Southwest Research Institute
+
+Module Author: Nick Martin <nick.martin@alumni.stanford.edu>
+
+This file is part of a custom weather generator framework with extreme events,
+hereafter WG Framework.
+
+WG Framework is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+WG Framework is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+# imports
+import numpy as np
+
+
+#--------------------------------------------------------------------------
+# functions
+def stackSamples( samples ):
+    """Sort a batch of samples into a 2D array, one sample per row.
+
+    Rows are sorted in increasing order. Shorter samples are padded at the
+    end with NaN.
+
+    Args:
+        samples (list or np.ndarray): 1D array, 2D array with one sample
+                                      per row, or list of 1D arrays
+
+    Returns:
+        tuple: (srtArr, nArr) (samples, max length) float64 sorted values
+               and (samples,) number of values in each sample
+
+    """
+    # start
+    if isinstance( samples, np.ndarray ) and ( samples.ndim <= 2 ):
+        srtArr = np.sort( np.atleast_2d( samples ).astype( np.float64 ), axis=1 )
+        nArr = np.full( srtArr.shape[0], srtArr.shape[1], dtype=np.int64 )
+        return srtArr, nArr
+    # end if
+    nArr = np.array( [ len( x ) for x in samples ], dtype=np.int64 )
+    srtArr = np.full( ( len( samples ), int( nArr.max() ) ), np.nan,
+                      dtype=np.float64 )
+    for iI, sample in enumerate( samples ):
+        srtArr[iI, :nArr[iI]] = np.sort( np.asarray( sample, dtype=np.float64 ) )
+    # end for
+    # return
+    return srtArr, nArr
+
+
+def calcPWMs( srtArr, nArr ):
+    """Sample probability weighted moments b0, b1, and b2.
+
+    Args:
+        srtArr (np.ndarray): (samples, max length) sorted values from
+                             stackSamples
+        nArr (np.ndarray): (samples,) number of values in each sample
+
+    Returns:
+        tuple: (b0, b1, b2) np.ndarray with one value per sample
+
+    """
+    # start
+    numCol = srtArr.shape[1]
+    # plotting position ranks, 1 to n, for each sample
+    jJ = np.arange( 1, numCol + 1, dtype=np.float64 ).reshape( 1, numCol )
+    nN = nArr.astype( np.float64 ).reshape( len( nArr ), 1 )
+    inSamp = jJ <= nN
+    # zero out the padding so that it does not contribute
+    useArr = np.where( inSamp, srtArr, 0.0 )
+    # the b1 sum starts at rank 2 and the b2 sum at rank 3 so the lower
+    #  ranks get a zero weight rather than 0/0 for short samples
+    with np.errstate( divide='ignore', invalid='ignore' ):
+        w1 = np.where( inSamp & ( jJ > 1.0 ), ( jJ - 1.0 ) / ( nN - 1.0 ), 0.0 )
+        w2 = np.where( inSamp & ( jJ > 2.0 ), ( ( jJ - 1.0 ) * ( jJ - 2.0 ) ) /
+                                              ( ( nN - 1.0 ) * ( nN - 2.0 ) ),
+                       0.0 )
+    # end with
+    nFlat = nN.ravel()
+    b0 = useArr.sum( axis=1 ) / nFlat
+    b1 = np.einsum( 'ij,ij->i', w1, useArr ) / nFlat
+    b2 = np.einsum( 'ij,ij->i', w2, useArr ) / nFlat
+    # return
+    return b0, b1, b2
+
+
+def calcLMoments( samples ):
+    """Sample L-moments l1, l2, and t3 for a sample or a batch of samples.
+
+    Args:
+        samples (list or np.ndarray): 1D array, 2D array with one sample
+                                      per row, or list of 1D arrays
+
+    Returns:
+        tuple: (l1, l2, t3) np.ndarray with one value per sample
+
+    """
+    # start
+    srtArr, nArr = stackSamples( samples )
+    b0, b1, b2 = calcPWMs( srtArr, nArr )
+    l1 = b0
+    l2 = ( 2.0 * b1 ) - b0
+    l3 = ( 6.0 * b2 ) - ( 6.0 * b1 ) + b0
+    with np.errstate( divide='ignore', invalid='ignore' ):
+        t3 = l3 / l2
+    # end with
+    # return
+    return l1, l2, t3
+
+
+def fitGLO( samples ):
+    """Fit the generalized logistic distribution to a sample or a batch of
+    samples with L-moments.
+
+    Args:
+        samples (list or np.ndarray): 1D array, 2D array with one sample
+                                      per row, or list of 1D arrays
+
+    Returns:
+        tuple: (shape, scale, location) np.ndarray with one value per sample
+
+    """
+    # start
+    l1, l2, t3 = calcLMoments( samples )
+    shape = -1.0 * t3
+    with np.errstate( divide='ignore', invalid='ignore' ):
+        scale = ( l2 * np.sin( shape * np.pi ) ) / ( shape * np.pi )
+        location = l1 - ( scale * ( ( 1.0 / shape ) -
+                                    ( np.pi / np.sin( shape * np.pi ) ) ) )
+    # end with
+    # return
+    return shape, scale, location
+
+
+def cdfGLO( shape, scale, location, npArray ):
+    """Cumulative probabilities from the generalized logistic distribution.
+
+    Parameters broadcast against npArray so that a batch of fits can be
+    evaluated at once.
+
+    Args:
+        shape (float or np.ndarray): shape, k
+        scale (float or np.ndarray): scale, alpha
+        location (float or np.ndarray): location, Eta
+        npArray (np.ndarray): values to evaluate
+
+    Returns:
+        retArray (np.ndarray): cumulative probabilities
+
+    """
+    # start
+    shape = np.asarray( shape, dtype=np.float64 )
+    with np.errstate( divide='ignore', invalid='ignore' ):
+        # k = 0 is the special case of a logistic distribution with 2 params
+        yLogistic = ( npArray - location ) / scale
+        takeLogArray = 1.0 - ( shape * ( npArray - location ) / scale )
+        useLogArray = np.where( takeLogArray <= 0.0, 1e-7, takeLogArray )
+        yGeneral = ( -1.0 * ( 1.0 / shape ) ) * np.log( useLogArray )
+    # end with
+    y = np.where( shape == 0.0, yLogistic, yGeneral )
+    retArray = 1.0 / ( 1.0 + np.exp( -1.0 * y ) )
+    # return
+    return retArray
+
+
+#EOF
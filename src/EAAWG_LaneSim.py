@@ -0,0 +1,397 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: EAAWG_LaneSim
+   :platform: Windows, Linux
+   :synopsis: Simulation of a group of realizations together, one per lane
+
+.. moduleauthor:: Nick Martin <nick.martin@alumni.stanford.edu>
+
+Alternative to EAAWG_ArraySim for runs with many realizations. A group of
+NumLanes realizations is advanced one day at a time with NumPy vectors
+that have one element, or lane, per realization. The wet or dry state, the
+remaining spell length, the temperature Chi pair, and the next event
+trigger time each update in one vector operation per day for the whole
+group, so the Python overhead of the day loop is shared by the lanes.
+
+All of the lanes draw from one np.random.Generator for the group, from
+EAAWG_Seeds.laneGroupGenerator. The monthly distribution parameters are
+held in (12,) arrays built from DRY_SPELL_PARAMS, WET_SPELL_PARAMS, and
+PRE_DEPTH_PARAMS and gathered by the month index. The simulation is done
+in calendar month blocks so each draw is a single call with the
+parameters for the block month; new spell lengths are then gathered for
+the lanes that change state by their new state.
+
+The distributions, parameters, and H0_REAL columns are the same as for
+the other engines but the random streams are not. A realization depends
+on its group, which is the first realization number and the number of
+lanes, and its lane in the group. Groups are counted from the first
+realization of the run, see laneGroups, and always simulated in full, so
+the results do not depend on the number of processes, on sharding, or on
+resuming.
+
+"""
+# Copyright and License
+"""
+Copyright 2023 Southwest Research Institute
+
+Module Author: Nick Martin <nick.martin@alumni.stanford.edu>
+
+This file is part of a custom weather generator framework with extreme events,
+hereafter WG Framework.
+
+WG Framework is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+WG Framework is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+# imports
+import math
+import numpy as np
+import EAAWG_Profile as WGPRF
+
+# parameters
+DEF_LANES = 128
+"""Default number of realizations simulated together. The day loop
+overhead is shared by the lanes; the H0 outputs for a group take about
+184 kB per lane."""
+POOL_FRACTION = 4
+"""Spell length pools for a month block hold one draw for every
+POOL_FRACTION lane days, plus one per lane, and are extended if used up"""
+
+
+class LaneTimeline(object):
+    """Triggered and pending custom events for one lane in the form of
+    EAAWG_Events.EventTimeline for outputBigEvents.
+    """
+
+    def __init__( self, eventKeys, trigLists, trigTimes, trigMags ):
+        """Default initialization method
+
+        Args:
+            eventKeys (list): event names
+            trigLists (list): [day index, magnitude] lists for each event
+            trigTimes (np.ndarray): (numEvents,) pending trigger times
+            trigMags (np.ndarray): (numEvents,) pending magnitudes
+
+        """
+        super().__init__()
+        self.eventKeys = list( eventKeys )
+        self.trigLists = trigLists
+        self.trigTimes = [ float( x ) for x in trigTimes ]
+        self.trigMags = [ float( x ) for x in trigMags ]
+
+    def trigDict( self ):
+        """Triggered events, [day index, magnitude] lists by event name"""
+        return dict( zip( self.eventKeys, self.trigLists ) )
+
+    def nextDict( self ):
+        """Pending events, [trigger time, magnitude] by event name"""
+        return { x : [ self.trigTimes[eE], self.trigMags[eE] ]
+                 for eE, x in enumerate( self.eventKeys ) }
+
+
+class LaneRealization(object):
+    """The outputs of one lane, with the H0_REAL and timeline attributes
+    that EAAWGmp.outputRealization uses from a Realization.
+    """
+
+    def __init__( self, H0_REAL, timeline ):
+        """Default initialization method
+
+        Args:
+            H0_REAL (np.ndarray): (TotDays, TOT_VALS) float32 outputs
+            timeline (LaneTimeline): events for the lane
+
+        """
+        super().__init__()
+        self.H0_REAL = H0_REAL
+        self.timeline = timeline
+
+
+#--------------------------------------------------------------------------
+# functions
+def laneGroups( RealNums, NumLanes, start_real=1 ):
+    """Split realization numbers into the lane groups that simulate them.
+    Group g has the realizations start_real + g * NumLanes onward, so the
+    groups do not depend on which realizations are requested.
+
+    Args:
+        RealNums (list): sorted realization numbers to simulate
+        NumLanes (int): number of lanes in a group
+
+    KWargs:
+        start_real (int): first realization number of the run
+
+    Returns:
+        list: tuple of the requested realization numbers in each group
+
+    """
+    # start
+    GroupDict = dict()
+    for RealNum in RealNums:
+        gIndex = ( int( RealNum ) - start_real ) // NumLanes
+        GroupDict.setdefault( gIndex, list() ).append( int( RealNum ) )
+    # end for
+    # return
+    return [ tuple( GroupDict[x] ) for x in sorted( GroupDict.keys() ) ]
+
+
+def groupStart( RealNum, NumLanes, start_real=1 ):
+    """First realization number of the lane group for RealNum"""
+    return start_real + ( ( ( int( RealNum ) - start_real ) // NumLanes ) *
+                          NumLanes )
+
+
+def monthParams():
+    """(12,) parameter arrays, month index 0 - 11, from the input module
+
+    Returns:
+        dict: np.ndarray by parameter name
+
+    """
+    # imports
+    import EAAWG_Inputs as WGI
+    # start
+    monthKeys = list( range( 1, 13, 1 ) )
+    def monArr( pDict, col ):
+        return np.array( [ float( pDict[x][col] ) for x in monthKeys ],
+                         dtype=np.float64 )
+    ParamDict = { "dry_n" : monArr( WGI.DRY_SPELL_PARAMS, 0 ),
+                  "dry_p" : monArr( WGI.DRY_SPELL_PARAMS, 1 ),
+                  "dry_loc" : monArr( WGI.DRY_SPELL_PARAMS, 2 ).astype( np.int64 ),
+                  "wet_n" : monArr( WGI.WET_SPELL_PARAMS, 0 ),
+                  "wet_p" : monArr( WGI.WET_SPELL_PARAMS, 1 ),
+                  "wet_loc" : monArr( WGI.WET_SPELL_PARAMS, 2 ).astype( np.int64 ),
+                  "pd_a" : monArr( WGI.PRE_DEPTH_PARAMS, 0 ),
+                  "pd_c" : monArr( WGI.PRE_DEPTH_PARAMS, 1 ),
+                  "pd_loc" : monArr( WGI.PRE_DEPTH_PARAMS, 2 ),
+                  "pd_scale" : monArr( WGI.PRE_DEPTH_PARAMS, 3 ),
+                  "pd_max" : np.array( [ float( WGI.MON_MAX_PP[x] ) for x in
+                                         monthKeys ], dtype=np.float64 ), }
+    # return
+    return ParamDict
+
+
+def drawSpellPools( rng, Params, mI, asize ):
+    """Dry and wet spell lengths for a month block
+
+    Args:
+        rng (np.random.Generator): group generator
+        Params (dict): from monthParams
+        mI (int): month index, 0 - 11
+        asize (int): number of each to draw
+
+    Returns:
+        tuple: (dryPool, wetPool) np.ndarray of spell lengths
+
+    """
+    dryPool = rng.negative_binomial( Params["dry_n"][mI], Params["dry_p"][mI],
+                                     size=asize ) + Params["dry_loc"][mI]
+    wetPool = rng.negative_binomial( Params["wet_n"][mI], Params["wet_p"][mI],
+                                     size=asize ) + Params["wet_loc"][mI]
+    # return
+    return dryPool, wetPool
+
+
+def simulateLanes( SimCal, rng, NumLanes ):
+    """Simulate a group of realizations together.
+
+    Each day the state of the lanes whose spell ran out flips and these
+    lanes take a new spell length for their new state. A zero length spell
+    lasts one day, as in the other engines. Events trigger on wet days
+    that are not the first day of a spell, once their trigger time has
+    passed. After each month block, temperatures come from the Chi values
+    and the climatology and depths are drawn for the wet lane days.
+
+    Args:
+        SimCal (EAAWG_Calendar.SimCalendar): simulation calendar
+        rng (np.random.Generator): group generator
+        NumLanes (int): number of realizations in the group
+
+    Returns:
+        list: LaneRealization for each lane
+
+    """
+    # imports
+    import EAAWG_Inputs as WGI
+    import EAAWG_Events as EXEV
+    import EAAWG_OtherWeather as WGOW
+    import EAAWG_PrecipDepth as WGPD
+    import EAAWG_HighRealResults as WGHRR
+    # start
+    TotDays = SimCal.numDays
+    Params = monthParams()
+    AMatT = np.ascontiguousarray( WGOW.A_DATA.T, dtype=np.float64 )
+    # both Chi values see the same error variate each day
+    BSum = np.asarray( WGOW.B_DATA, dtype=np.float64 ).sum( axis=0 )
+    sThresh = float( WGOW.SIGMA_THRESH )
+    climArr = WGOW.stackClimArrays()
+    minDelta = float( WGOW.MIN_DAILY_DELTA )
+    Events = [ EXEV.makeEvent( x ) for x in WGI.EVENT_KEYS ]
+    NumEvents = len( Events )
+    H0_GROUP = np.zeros( ( NumLanes, TotDays, WGHRR.TOT_VALS ),
+                         dtype=np.float32 )
+    with WGPRF.phase( "sampling" ):
+        # event schedules, offsets and magnitudes by lane, event, and draw
+        evRecur = np.array( [ [ x.aveRecurYrs ] for x in Events ],
+                            dtype=np.float64 )
+        evLow = np.array( [ [ x.lowMag ] for x in Events ], dtype=np.float64 )
+        evHigh = np.array( [ [ x.highMag ] for x in Events ], dtype=np.float64 )
+        schedSize = int( math.ceil( 2.0 * TotDays /
+                                    ( 365.25 * evRecur.min() ) ) ) + \
+                    EXEV.SCHEDULE_PAD
+        def drawSchedules( asize ):
+            return ( rng.poisson( evRecur, size=( NumLanes, NumEvents, asize ) )
+                     * 365.25,
+                     rng.uniform( evLow, evHigh,
+                                  size=( NumLanes, NumEvents, asize ) ) )
+        evOffsets, evMags = drawSchedules( schedSize )
+        # the state before the first day is the opposite of the start state
+        #  so that every lane starts a spell on the first day
+        isWet = ~( rng.random( NumLanes ) > 0.5 )
+    # end with
+    remDays = np.zeros( NumLanes, dtype=np.int64 )
+    chiArr = np.ones( ( 2, NumLanes ), dtype=np.float64 )
+    evCursors = np.ones( ( NumLanes, NumEvents ), dtype=np.intp )
+    trigTimes = evOffsets[:, :, 0].copy()
+    trigMags = evMags[:, :, 0].copy()
+    laneNext = trigTimes.min( axis=1 )
+    minNext = laneNext.min()
+    trigRecs = list()
+    blockStarts = np.r_[ SimCal.monStarts, TotDays ]
+    for bB in range( len( blockStarts ) - 1 ):
+        d0 = int( blockStarts[bB] )
+        d1 = int( blockStarts[bB + 1] )
+        numBDays = d1 - d0
+        mI = int( SimCal.month[d0] ) - 1
+        with WGPRF.phase( "sampling" ):
+            poolSize = ( ( numBDays * NumLanes ) // POOL_FRACTION ) + NumLanes
+            dryPool, wetPool = drawSpellPools( rng, Params, mI, poolSize )
+            epsB = rng.standard_normal( ( numBDays, 1, NumLanes ) ) * \
+                   BSum[:, None]
+        # end with
+        poolPos = 0
+        wetBlock = np.empty( ( numBDays, NumLanes ), dtype=bool )
+        chiBlock = np.empty( ( numBDays, 2, NumLanes ), dtype=np.float64 )
+        evBlock = None
+        with WGPRF.phase( "states" ):
+            for kK in range( numBDays ):
+                jJ = d0 + kK
+                # states and spell lengths
+                newSpell = remDays <= 0
+                np.logical_xor( isWet, newSpell, out=isWet )
+                swIndex = np.flatnonzero( newSpell )
+                numSw = len( swIndex )
+                if numSw > 0:
+                    if ( poolPos + numSw ) > len( dryPool ):
+                        dryAdd, wetAdd = drawSpellPools( rng, Params, mI,
+                                                         poolSize )
+                        dryPool = np.concatenate( [ dryPool[poolPos:], dryAdd ] )
+                        wetPool = np.concatenate( [ wetPool[poolPos:], wetAdd ] )
+                        poolPos = 0
+                    # end if
+                    remDays[swIndex] = np.where( isWet[swIndex],
+                                            wetPool[poolPos:poolPos+numSw],
+                                            dryPool[poolPos:poolPos+numSw] )
+                    poolPos += numSw
+                # end if
+                remDays -= 1
+                wetBlock[kK] = isWet
+                # Chi recursion, limited to the sigma threshold
+                chiNew = chiBlock[kK]
+                np.matmul( AMatT, chiArr, out=chiNew )
+                chiNew += epsB[kK]
+                np.minimum( chiNew, sThresh, out=chiNew )
+                np.maximum( chiNew, -sThresh, out=chiNew )
+                chiArr = chiNew
+                # events
+                if jJ <= minNext:
+                    continue
+                # end if
+                hitLanes = np.flatnonzero( isWet & ( ~newSpell ) &
+                                           ( laneNext < jJ ) )
+                if len( hitLanes ) < 1:
+                    continue
+                # end if
+                pending = trigTimes[hitLanes] < jJ
+                if evBlock is None:
+                    evBlock = np.full( ( numBDays, NumLanes ), np.nan )
+                # end if
+                evBlock[kK, hitLanes] = ( trigMags[hitLanes] *
+                                          pending ).sum( axis=1 )
+                hL, hE = np.nonzero( pending )
+                lanes = hitLanes[hL]
+                trigRecs.append( ( lanes, hE, np.full( len( hE ), jJ ),
+                                   trigMags[lanes, hE] ) )
+                cIndex = evCursors[lanes, hE]
+                if cIndex.max() >= evOffsets.shape[2]:
+                    offAdd, magAdd = drawSchedules( schedSize )
+                    evOffsets = np.concatenate( [ evOffsets, offAdd ], axis=2 )
+                    evMags = np.concatenate( [ evMags, magAdd ], axis=2 )
+                # end if
+                trigTimes[lanes, hE] = jJ + evOffsets[lanes, hE, cIndex]
+                trigMags[lanes, hE] = evMags[lanes, hE, cIndex]
+                evCursors[lanes, hE] = cIndex + 1
+                laneNext[hitLanes] = trigTimes[hitLanes].min( axis=1 )
+                minNext = laneNext.min()
+            # end for
+        # end with
+        with WGPRF.phase( "temperature" ):
+            MaxT, MinT = WGOW.tempsFromChis( chiBlock[:, 0, :],
+                                             chiBlock[:, 1, :], wetBlock,
+                                             SimCal.doy[d0:d1, None] - 1,
+                                             climArr, minDelta )
+        # end with
+        with WGPRF.phase( "sampling" ):
+            precipArr = np.zeros( ( numBDays, NumLanes ), dtype=np.float64 )
+            depthArr = rng.standard_gamma( Params["pd_a"][mI],
+                                           size=np.count_nonzero( wetBlock ) )
+            depthArr = ( ( depthArr ** ( 1.0 / Params["pd_c"][mI] ) ) *
+                         Params["pd_scale"][mI] ) + Params["pd_loc"][mI]
+            np.minimum( depthArr, Params["pd_max"][mI], out=depthArr )
+            np.maximum( depthArr, WGPD.WD_THRESH, out=depthArr )
+            precipArr[wetBlock] = depthArr
+        # end with
+        if evBlock is not None:
+            precipArr = np.where( np.isnan( evBlock ), precipArr, evBlock )
+        # end if
+        H0_GROUP[:, d0:d1, WGHRR.TMAX_IND] = MaxT.T
+        H0_GROUP[:, d0:d1, WGHRR.TMIN_IND] = MinT.T
+        H0_GROUP[:, d0:d1, WGHRR.PRE_IND] = precipArr.T
+    # end for
+    # triggered events by lane, in day order
+    if len( trigRecs ) > 0:
+        recLanes, recEvents, recDays, recMags = [ np.concatenate( x ) for x in
+                                                  zip( *trigRecs ) ]
+    else:
+        recLanes = recEvents = recDays = np.zeros( 0, dtype=np.intp )
+        recMags = np.zeros( 0, dtype=np.float64 )
+    # end if
+    LaneReals = list()
+    for lL in range( NumLanes ):
+        lMask = recLanes == lL
+        lEvents = recEvents[lMask]
+        lDays = recDays[lMask]
+        lMags = recMags[lMask]
+        trigLists = [ [ [ int( x ), float( y ) ] for x, y in
+                        zip( lDays[lEvents == eE], lMags[lEvents == eE] ) ]
+                      for eE in range( NumEvents ) ]
+        LaneReals.append( LaneRealization( H0_GROUP[lL],
+                                LaneTimeline( WGI.EVENT_KEYS, trigLists,
+                                              trigTimes[lL], trigMags[lL] ) ) )
+    # end for
+    # return
+    return LaneReals
+
+
+#EOF
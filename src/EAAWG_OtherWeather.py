@@ -8,7 +8,7 @@
 .. moduleauthor:: Nick Martin <nick.martin@alumni.stanford.edu>
 
 Handles the calculation of daily values using helper functions from other 
-modules. Also sends the daily values elsewhere for archive.
+modules. calcTempSeries returns the daily values for a whole realization.
 
 """
 # Copyright and License
@@ -36,9 +36,17 @@ along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
 """
 
 # imports
+import math
 import numpy as np
 import EAAWG_Inputs as WGI
 
+# optional compiled kernel
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+# end try
+
 # numpy set err
 #np.seterr(all='raise')
 
@@ -52,6 +60,8 @@ SIGMA_THRESH = 4.0
 """Sigma multiplier threshold for standard deviations"""
 MIN_DAILY_DELTA = 4.0
 """The minimum allowable daily difference between maximum and minimum temps"""
+USE_COMPILED = True
+"""Use the Numba compiled temperature kernel when Numba is installed"""
 
 # module level variables
 A_DATA = np.ones( (NUM_OTHER, NUM_OTHER), dtype=np.float64 )
@@ -78,16 +88,8 @@ DRY_TMIN_AVE = np.ones( NUM_DAYS_YR, dtype=np.float64 )
 """Average daily dry state Tmin, Fourier smoothed"""
 DRY_TMIN_STD = np.ones( NUM_DAYS_YR, dtype=np.float64 )
 """Daily dry state standard deviation of Tmin, Fourier smoothed."""
-EPS_STD_NORMAL = list()
-"""The list of standard normal error variates"""
-EPS_NORM_SAMP = list()
-"""The list of samplers for the standard normal error variates."""
-EPSI_2 = np.ones( (1, NUM_OTHER), dtype=np.float64 )
-"""Tracker for actual epsilon values"""
-CHI_M0 = np.ones( (1, NUM_OTHER), dtype=np.float64 )
-"""Current day Chi matrix"""
-CHI_L1M0 = np.ones( (1, NUM_OTHER), dtype=np.float64 )
-"""Previous day Chi matrix"""
+TEMP_KERNEL_JIT = None
+"""Compiled version of tempKernel, compiled on first use"""
 
 #--------------------------------------------------------------------------
 # functions
@@ -121,170 +123,241 @@ def constructArrays():
     global WET_TMAX_AVE, WET_TMAX_STD, WET_TMIN_AVE, WET_TMIN_STD
     global DRY_TMAX_AVE, DRY_TMAX_STD, DRY_TMIN_AVE, DRY_TMIN_STD 
     global A_DATA, B_DATA
-    # Now read in our values/files and construct
-    WAveDF = WGI.OW_WET_AVE
-    WET_TMAX_AVE[:] = np.array( WAveDF['Tmax_C'], dtype=np.float64 )
-    WET_TMAX_AVE[:] = WET_TMAX_AVE[:] + WGI.AVE_WET_TMAX_ADD
-    WET_TMIN_AVE[:] = np.array( WAveDF['Tmin_C'], dtype=np.float64 )
-    WET_TMIN_AVE[:] = WET_TMIN_AVE[:] + WGI.AVE_WET_TMIN_ADD
-    WStdDF = WGI.OW_WET_STD
-    WET_TMAX_STD[:] = np.array( WStdDF['Tmax_C'], dtype=np.float64 )
-    WET_TMIN_STD[:] = np.array( WStdDF['Tmin_C'], dtype=np.float64 )
-    DAveDF = WGI.OW_DRY_AVE
-    DRY_TMAX_AVE[:] = np.array( DAveDF['Tmax_C'], dtype=np.float64 )
-    DRY_TMAX_AVE[:] = DRY_TMAX_AVE[:] + WGI.AVE_DRY_TMAX_ADD
-    DRY_TMIN_AVE[:] = np.array( DAveDF['Tmin_C'], dtype=np.float64 )
-    DRY_TMIN_AVE[:] = DRY_TMIN_AVE[:] + WGI.AVE_DRY_TMIN_ADD
-    DStdDF = WGI.OW_DRY_STD
-    DRY_TMAX_STD[:] = np.array( DStdDF['Tmax_C'], dtype=np.float64 )
-    DRY_TMIN_STD[:] = np.array( DStdDF['Tmin_C'], dtype=np.float64 )
+    # Now get our cached input arrays and construct
+    OWArrays = WGI.getOWArrays()
+    WET_TMAX_AVE[:] = OWArrays["WET_TMAX_AVE"] + WGI.AVE_WET_TMAX_ADD
+    WET_TMIN_AVE[:] = OWArrays["WET_TMIN_AVE"] + WGI.AVE_WET_TMIN_ADD
+    WET_TMAX_STD[:] = OWArrays["WET_TMAX_STD"]
+    WET_TMIN_STD[:] = OWArrays["WET_TMIN_STD"]
+    DRY_TMAX_AVE[:] = OWArrays["DRY_TMAX_AVE"] + WGI.AVE_DRY_TMAX_ADD
+    DRY_TMIN_AVE[:] = OWArrays["DRY_TMIN_AVE"] + WGI.AVE_DRY_TMIN_ADD
+    DRY_TMAX_STD[:] = OWArrays["DRY_TMAX_STD"]
+    DRY_TMIN_STD[:] = OWArrays["DRY_TMIN_STD"]
     # next do the A and B data
     A_DATA[:, :] = np.array( WGI.A_DATA_LIST, dtype=np.float64 )
     B_DATA[:, :] = np.array( WGI.B_DATA_LIST, dtype=np.float64 )
     # end of function
     return
 
-def setupDistsSamples(seed_std_norm=None):
-    """Setup the distributions and samplers for the white noise term.
+def stackClimArrays():
+    """Stack the Fourier smoothed climatology arrays into a single array
+    for the temperature kernels.
 
-    KWargs:
-        seed_std_norm (int): standard normal sampler seed
+    Returns:
+        climArr (np.ndarray): (8, NUM_DAYS_YR) rows are wet Tmax ave, wet 
+                              Tmax std, wet Tmin ave, wet Tmin std, and then 
+                              the same four for the dry state
 
     """
-    # imports
-    import EAAWG_StdNormal as WGSN
     # globals
-    global EPS_STD_NORMAL, EPS_NORM_SAMP
+    global WET_TMAX_AVE, WET_TMAX_STD, WET_TMIN_AVE, WET_TMIN_STD
+    global DRY_TMAX_AVE, DRY_TMAX_STD, DRY_TMIN_AVE, DRY_TMIN_STD
     # start of function
-    EPS_STD_NORMAL.append( WGSN.StdNormal() )
-    EPS_NORM_SAMP.append( WGSN.ErrorTSampler(seed=seed_std_norm) )
-    EPS_STD_NORMAL.append( WGSN.StdNormal() )
-    EPS_NORM_SAMP.append( WGSN.ErrorTSampler(seed=seed_std_norm) )
-    # end of for
+    climArr = np.ascontiguousarray( np.vstack( [ WET_TMAX_AVE, WET_TMAX_STD,
+                                                 WET_TMIN_AVE, WET_TMIN_STD,
+                                                 DRY_TMAX_AVE, DRY_TMAX_STD,
+                                                 DRY_TMIN_AVE, DRY_TMIN_STD ] ),
+                                    dtype=np.float64 )
     # end of function
-    return
+    return climArr
 
-def updateTracker():
-    """Update the epsilon value tracker array"""
-    # globals
-    global EPSI_2, EPS_STD_NORMAL, EPS_NORM_SAMP
+def tempKernel( epsArr, wetArr, dIndex, AMat, BMat, climArr, sThresh, 
+                minDelta ):
+    """Full time series temperature kernel written as explicit loops so
+    that it can be compiled with Numba.
+
+    For each day, the Chi values are projected from the previous day with
+    the A and B matrices and limited to the sigma threshold, and then Tmax
+    and Tmin are calculated from the smoothed climatology for the state.
+
+    Args:
+        epsArr (np.ndarray): (TotDays, 2) standard normal variates
+        wetArr (np.ndarray): (TotDays,) boolean, True on wet days
+        dIndex (np.ndarray): (TotDays,) integer day of the year index, 0 - 365
+        AMat (np.ndarray): (2, 2) A matrix
+        BMat (np.ndarray): (2, 2) B matrix
+        climArr (np.ndarray): (8, NUM_DAYS_YR) from stackClimArrays
+        sThresh (float): sigma threshold
+        minDelta (float): minimum daily difference between Tmax and Tmin
+
+    Returns:
+        outArr (np.ndarray): (TotDays, 2) daily Tmax and Tmin
+
+    """
+    totDays = epsArr.shape[0]
+    outArr = np.empty( ( totDays, 2 ), dtype=np.float64 )
+    c0 = 1.0
+    c1 = 1.0
+    for jJ in range( totDays ):
+        e0 = epsArr[jJ, 0]
+        e1 = epsArr[jJ, 1]
+        if not math.isfinite( e0 ):
+            e0 = 0.25
+        if not math.isfinite( e1 ):
+            e1 = 0.25
+        n0 = ( ( c0 * AMat[0, 0] ) + ( c1 * AMat[1, 0] ) ) + \
+             ( ( e0 * BMat[0, 0] ) + ( e1 * BMat[1, 0] ) )
+        n1 = ( ( c0 * AMat[0, 1] ) + ( c1 * AMat[1, 1] ) ) + \
+             ( ( e0 * BMat[0, 1] ) + ( e1 * BMat[1, 1] ) )
+        if not math.isfinite( n0 ):
+            n0 = 1.0
+        if not math.isfinite( n1 ):
+            n1 = 1.0
+        c0 = min( max( n0, -sThresh ), sThresh )
+        c1 = min( max( n1, -sThresh ), sThresh )
+        dd = dIndex[jJ]
+        if wetArr[jJ]:
+            maxT = ( c0 * climArr[1, dd] ) + climArr[0, dd]
+            minT = ( c1 * climArr[3, dd] ) + climArr[2, dd]
+        else:
+            maxT = ( c0 * climArr[5, dd] ) + climArr[4, dd]
+            minT = ( c1 * climArr[7, dd] ) + climArr[6, dd]
+        # end if
+        if not math.isfinite( maxT ):
+            maxT = climArr[4, dd]
+        if not math.isfinite( minT ):
+            minT = climArr[6, dd]
+        if ( maxT - minT ) < minDelta:
+            maxT = minT + minDelta
+        # end if
+        outArr[jJ, 0] = maxT
+        outArr[jJ, 1] = minT
+    # end for
+    return outArr
+
+def tempSeriesNumPy( epsArr, wetArr, dIndex, AMat, BMat, climArr, sThresh,
+                     minDelta ):
+    """Pure NumPy version of tempKernel for when Numba is not available.
+
+    The noise term is projected with B for all days at once, with the same
+    operation order as tempKernel so the two round the same way, and only
+    the lag one recursion through A is done day by day. Arguments and
+    return are the same as tempKernel.
+
+    """
     # start of function
-    EPSI_2[0, 0] = EPS_STD_NORMAL[0].ranval1( EPS_NORM_SAMP[0].ranstate )
-    EPSI_2[0, 1] = EPS_STD_NORMAL[1].ranval1( EPS_NORM_SAMP[1].ranstate )
-    # now make some checks
-    EPSI_2 = np.where( np.isnan( EPSI_2 ), 0.25, EPSI_2 )
-    EPSI_2 = np.where( np.isinf( EPSI_2 ), 0.25, EPSI_2 )
+    totDays = epsArr.shape[0]
+    epsArr = np.where( np.isfinite( epsArr ), epsArr, 0.25 )
+    epsB = np.empty( ( totDays, 2 ), dtype=np.float64 )
+    epsB[:, 0] = ( epsArr[:, 0] * BMat[0, 0] ) + ( epsArr[:, 1] * BMat[1, 0] )
+    epsB[:, 1] = ( epsArr[:, 0] * BMat[0, 1] ) + ( epsArr[:, 1] * BMat[1, 1] )
+    # the recursion itself, with scalars to avoid small array overhead
+    a00 = float( AMat[0, 0] )
+    a01 = float( AMat[0, 1] )
+    a10 = float( AMat[1, 0] )
+    a11 = float( AMat[1, 1] )
+    chiArr = np.ones( (totDays, 2), dtype=np.float64 )
+    e0List = epsB[:, 0].tolist()
+    e1List = epsB[:, 1].tolist()
+    c0 = 1.0
+    c1 = 1.0
+    for jJ in range( totDays ):
+        n0 = ( c0 * a00 ) + ( c1 * a10 ) + e0List[jJ]
+        n1 = ( c0 * a01 ) + ( c1 * a11 ) + e1List[jJ]
+        if not math.isfinite( n0 ):
+            n0 = 1.0
+        if not math.isfinite( n1 ):
+            n1 = 1.0
+        c0 = min( max( n0, -sThresh ), sThresh )
+        c1 = min( max( n1, -sThresh ), sThresh )
+        chiArr[jJ, 0] = c0
+        chiArr[jJ, 1] = c1
+    # end for
+    # now the day of year and state lookups
+    MaxT, MinT = tempsFromChis( chiArr[:, 0], chiArr[:, 1], wetArr, dIndex,
+                                climArr, minDelta )
+    outArr = np.empty( ( totDays, 2 ), dtype=np.float64 )
+    outArr[:, 0] = MaxT
+    outArr[:, 1] = MinT
     # end of function
-    return
+    return outArr
+
+def tempsFromChis( chi0, chi1, wetArr, dIndex, climArr, minDelta ):
+    """Tmax and Tmin from the Chi values, the day of year, and the state.
+    The first axis of the arrays is the day, so (TotDays,) arrays for one
+    realization or (days, lanes) arrays for several, see EAAWG_LaneSim.
 
-def calculateUpdate( curIndex, DayOYear, state ):
-    """Calculate the current day and update
-    
     Args:
-        curIndex (int): current date index
-        DayOYear (int): day of the year
-        state (string): wet or dry state
-    
+        chi0 (np.ndarray): Tmax Chi values
+        chi1 (np.ndarray): Tmin Chi values
+        wetArr (np.ndarray): boolean, True on wet days
+        dIndex (np.ndarray): integer day of the year index, 0 - 365, that
+                             broadcasts against chi0
+        climArr (np.ndarray): (8, NUM_DAYS_YR) from stackClimArrays
+        minDelta (float): minimum daily difference between Tmax and Tmin
+
+    Returns:
+        tuple: (MaxT, MinT) np.ndarray the same shape as chi0
+
     """
-    # imports
-    import EAAWG_HighRealResults as WGHRR
-    # globals
-    global WET_TMAX_AVE, WET_TMAX_STD, WET_TMIN_AVE, WET_TMIN_STD 
-    global DRY_TMAX_AVE, DRY_TMAX_STD, DRY_TMIN_AVE, DRY_TMIN_STD
-    global CHI_M0, MIN_DAILY_DELTA
     # start of function
-    np.seterr(all='raise')
-    if state == WGI.WET_STATE:
-        try:
-            cMaxT0 = ( (CHI_M0[0,0] * WET_TMAX_STD[(DayOYear - 1)]) + 
-                        WET_TMAX_AVE[(DayOYear - 1)] )
-        except:
-            cMaxT0 = WET_TMAX_AVE[(DayOYear - 1)]
-        try:
-            cMinT0 = ( (CHI_M0[0,1] * WET_TMIN_STD[(DayOYear - 1)]) + 
-                        WET_TMIN_AVE[(DayOYear - 1)] )
-        except:
-            cMinT0 = WET_TMIN_AVE[(DayOYear - 1)]
-    else:
-        try:
-            cMaxT0 = ( (CHI_M0[0,0] * DRY_TMAX_STD[(DayOYear - 1)]) + 
-                       DRY_TMAX_AVE[(DayOYear - 1)] )
-        except:
-            cMaxT0 = DRY_TMAX_AVE[(DayOYear - 1)]
-        try:
-            cMinT0 = ( (CHI_M0[0,1] * DRY_TMIN_STD[(DayOYear - 1)]) + 
-                        DRY_TMIN_AVE[(DayOYear - 1)] )
-        except:
-            cMinT0 = DRY_TMIN_AVE[(DayOYear - 1)]
-    # toggle back
-    np.seterr(all='warn')
-    acMaxT0 = np.array( cMaxT0, dtype=np.float64 )
-    acMaxT0 = np.where( np.isnan( acMaxT0 ), 
-                        DRY_TMAX_AVE[(DayOYear - 1)], acMaxT0 )
-    acMaxT0 = np.where( np.isinf( acMaxT0 ), 
-                        DRY_TMAX_AVE[(DayOYear - 1)], acMaxT0 )
-    acMinT0 = np.array( cMinT0, dtype=np.float64 )
-    acMinT0 = np.where( np.isnan( acMinT0 ), 
-                        DRY_TMIN_AVE[(DayOYear - 1)], acMinT0 )
-    acMinT0 = np.where( np.isinf( acMinT0 ), 
-                        DRY_TMIN_AVE[(DayOYear - 1)], acMinT0 )
-    passMaxT = float( acMaxT0 )
-    passMinT = float( acMinT0 )
-    if ( passMaxT - passMinT ) < MIN_DAILY_DELTA:
-        passMaxT = passMinT + MIN_DAILY_DELTA
-    # end if
-    # now are ready to update
-    WGHRR.assignTemp( curIndex, passMaxT, passMinT )
+    wetClim = climArr[0:4, dIndex]
+    dryClim = climArr[4:8, dIndex]
+    MaxT = np.where( wetArr, ( chi0 * wetClim[1] ) + wetClim[0],
+                     ( chi0 * dryClim[1] ) + dryClim[0] )
+    MinT = np.where( wetArr, ( chi1 * wetClim[3] ) + wetClim[2],
+                     ( chi1 * dryClim[3] ) + dryClim[2] )
+    MaxT = np.where( np.isfinite( MaxT ), MaxT, dryClim[0] )
+    MinT = np.where( np.isfinite( MinT ), MinT, dryClim[2] )
+    MaxT = np.where( ( MaxT - MinT ) < minDelta, MinT + minDelta, MaxT )
     # end of function
-    return
+    return MaxT, MinT
+
+def getTempKernel():
+    """Get the function to use for the full time series temperature 
+    calculation. The Numba compiled tempKernel if Numba is installed and
+    USE_COMPILED is True; otherwise tempSeriesNumPy.
+
+    Returns:
+        function: temperature kernel
 
-def rollOverChis():
-    """Convenience function to roll over the Chi squared values
     """
-    # local imports
-    from copy import deepcopy
     # globals
-    global CHI_M0, CHI_L1M0, NUM_OTHER
+    global TEMP_KERNEL_JIT
     # start of function
-    for iI in range(NUM_OTHER):
-        CHI_L1M0[0, iI] = deepcopy( CHI_M0[0, iI] )
-    # end for
+    if ( not USE_COMPILED ) or ( njit is None ):
+        return tempSeriesNumPy
+    # end if
+    if TEMP_KERNEL_JIT is None:
+        TEMP_KERNEL_JIT = njit( cache=True )( tempKernel )
+    # end if
     # end of function
-    return
+    return TEMP_KERNEL_JIT
+
+def calcTempSeries( epsArr, wetArr, doyArr ):
+    """Calculate Tmax and Tmin for all days of a realization at once.
+
+    Uses the module A and B matrices and smoothed climatology arrays, so 
+    constructArrays must be called first.
+
+    Args:
+        epsArr (np.ndarray): (TotDays, NUM_OTHER) standard normal variates
+        wetArr (np.ndarray): (TotDays,) boolean, True on wet days
+        doyArr (np.ndarray): (TotDays,) integer day of the year, 1 - 366
+
+    Returns:
+        tuple: (MaxT, MinT) np.ndarray of daily max and min temperatures
 
-def calcCHI0( ):
-    """Calculate the current Chi no lag
-    
     """
     # globals
-    global CHI_M0, CHI_L1M0, EPSI_2, A_DATA, B_DATA, SIGMA_THRESH
-    # calculations
-    # first set our A and B
-    A_0 = A_DATA.copy()
-    B_0 = B_DATA.copy()
-    np.seterr(all='raise')
-    try:
-        CHI_M0[:,:] = (np.matmul(CHI_L1M0, A_0) + np.matmul( EPSI_2, B_0 ))[:,:]
-    except:
-        CHI_M0[:,:] = 1.0
-    # do some checks
-    np.seterr(all='warn')
-    # first check to make sure that we actually got the calculation done
-    CHI_M0 = np.where( np.isnan( CHI_M0 ), 1.0, CHI_M0 )
-    CHI_M0 = np.where( np.isinf( CHI_M0 ), 1.0, CHI_M0 )
-    # next we need to provide a sigma threshold
-    CHI_M0 = np.where( CHI_M0 > SIGMA_THRESH, SIGMA_THRESH, CHI_M0 )
-    CHI_M0 = np.where( CHI_M0 < (-1.0*SIGMA_THRESH), (-1.0*SIGMA_THRESH), 
-                       CHI_M0 )
+    global A_DATA, B_DATA, SIGMA_THRESH, MIN_DAILY_DELTA
+    # start of function
+    kernFunc = getTempKernel()
+    outArr = kernFunc( np.ascontiguousarray( epsArr, dtype=np.float64 ),
+                       np.ascontiguousarray( wetArr, dtype=np.bool_ ),
+                       np.ascontiguousarray( doyArr - 1, dtype=np.int64 ),
+                       np.ascontiguousarray( A_DATA, dtype=np.float64 ),
+                       np.ascontiguousarray( B_DATA, dtype=np.float64 ),
+                       stackClimArrays(), float( SIGMA_THRESH ), 
+                       float( MIN_DAILY_DELTA ) )
     # end of function
-    return
+    return outArr[:, 0], outArr[:, 1]
 
 def cleanAllEnd():
     """Convenience method to clean or delete all trackers at the end """
     global A_DATA, B_DATA, M0, M1, WET_TMAX_AVE, WET_TMAX_STD, WET_TMIN_AVE
     global WET_TMIN_STD, DRY_TMAX_AVE, DRY_TMAX_STD, DRY_TMIN_AVE 
-    global DRY_TMIN_STD, EPS_STD_NORMAL, EPS_NORM_SAMP, EPSI_2
-    global CHI_M0, CHI_L1M0
+    global DRY_TMIN_STD
     # set to none
     A_DATA = None
     B_DATA = None
@@ -298,11 +371,6 @@ def cleanAllEnd():
     DRY_TMAX_STD = None
     DRY_TMIN_AVE = None
     DRY_TMIN_STD = None
-    EPS_STD_NORMAL = None
-    EPS_NORM_SAMP = None
-    EPSI_2 = None
-    CHI_M0 = None
-    CHI_L1M0 = None
     # end
     return
 
@@ -311,7 +379,6 @@ def setAllBegin():
     global NUM_OTHER, NUM_DAYS_YR, SIGMA_THRESH, A_DATA, B_DATA, M0, M1
     global WET_TMAX_AVE, WET_TMAX_STD, WET_TMIN_AVE, WET_TMIN_STD 
     global DRY_TMAX_AVE, DRY_TMAX_STD, DRY_TMIN_AVE, DRY_TMIN_STD
-    global EPS_STD_NORMAL, EPS_NORM_SAMP, EPSI_2, CHI_M0, CHI_L1M0
     # now do the setting
     A_DATA = np.ones( (NUM_OTHER, NUM_OTHER), dtype=np.float64 )
     B_DATA = np.ones( (NUM_OTHER, NUM_OTHER), dtype=np.float64 )
@@ -325,11 +392,6 @@ def setAllBegin():
     DRY_TMAX_STD = np.ones( NUM_DAYS_YR, dtype=np.float64 )
     DRY_TMIN_AVE = np.ones( NUM_DAYS_YR, dtype=np.float64 )
     DRY_TMIN_STD = np.ones( NUM_DAYS_YR, dtype=np.float64 )
-    EPS_STD_NORMAL = list()
-    EPS_NORM_SAMP = list()
-    EPSI_2 = np.ones( (1, NUM_OTHER), dtype=np.float64 )
-    CHI_M0 = np.ones( (1, NUM_OTHER), dtype=np.float64 )
-    CHI_L1M0 = np.ones( (1, NUM_OTHER), dtype=np.float64 )
     # end
     return
 
@@ -35,6 +35,7 @@ along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
 
 # imports
 import numpy as np
+import EAAWG_Seeds as WGSEED
 from scipy import stats as scstats
 from EAAWG_Inputs import MON_MAX_PP
 
@@ -77,9 +78,28 @@ class Gamma2PCont(object):
             ErrorMsg = "c must not be equal to zero!!!"
             raise CreateDistError( ErrorMsg )
         self.name = name
+        self.a = a
+        self.c = c
+        self.loc = loc
+        self.scale = scale
         self.gamma = scstats.gengamma( a, c, loc=loc, scale=scale )
         return
     
+    def genArray( self, rgen, asize=None ):
+        """Sample directly from a np.random.Generator. Uses the same 
+        transformation of a standard gamma variate as SciPy gengamma.
+        
+        Args:
+            rgen (np.random.Generator): the random generator for the sampler
+            asize (int): size of the return array, None for a scalar
+            
+        Returns:
+            numda (float or np.array): unbounded precipitation depths
+            
+        """
+        numda = rgen.standard_gamma( self.a, size=asize )
+        return ( numda ** ( 1.0 / self.c ) ) * self.scale + self.loc
+    
     def ranval1( self, rstate, mon, maxes=MON_MAX_PP, thresh=WD_THRESH ):
         """With the specified val between 0.0 and 1.0, which is essentially
         a probability, return the corresponding value from the cdf.
@@ -95,8 +115,12 @@ class Gamma2PCont(object):
             numd (int): the sampled wet day precipitation depth
             
         """
-        numda = self.gamma.rvs( size=1, random_state=rstate )
-        numd = numda[0]
+        if isinstance( rstate, np.random.Generator ):
+            numd = self.genArray( rstate )
+        else:
+            numda = self.gamma.rvs( size=1, random_state=rstate )
+            numd = numda[0]
+        # end if
         if numd > maxes[mon]:
             numd = maxes[mon]
         # end if
@@ -120,10 +144,33 @@ class Gamma2PCont(object):
             numda (np.array): the corresponding array of wet day precip depths
             
         """
-        numda = self.gamma.rvs( size=asize, random_state=rstate )
+        if isinstance( rstate, np.random.Generator ):
+            numda = self.genArray( rstate, asize=asize )
+        else:
+            numda = self.gamma.rvs( size=asize, random_state=rstate )
+        # end if
         numda = np.where( numda > maxes[mon], maxes[mon], numda )
         numda = np.where( numda < thresh, thresh, numda )
         return numda
+    
+    def rawArray( self, asize, rstate ):
+        """Sample asize values without applying the monthly maximum and the
+        minimum threshold. Used for buffering where the bounds are applied
+        when each value is used.
+        
+        Args:
+            asize (int) = size of the return array
+            rstate (np.random_state): the random state for the sampler
+            
+        Returns:
+            numda (np.array): the corresponding array of wet day precip depths
+            
+        """
+        if isinstance( rstate, np.random.Generator ):
+            return self.genArray( rstate, asize=asize )
+        # end if
+        numda = self.gamma.rvs( size=asize, random_state=rstate )
+        return numda
 
 
 class PrecipSampler(object):
@@ -134,15 +181,18 @@ class PrecipSampler(object):
     random.uniform distribution to draw the random numbers.
     """
     
-    def __init__( self, pd_sample_seed=None ):
+    def __init__( self, pd_sample_seed=None, backend="scipy" ):
         """Default initialization method
         
         KWargs:
             pd_sample_seed (int): the seed to use for the sampler
+            backend (str): "scipy" for a legacy np.random.RandomState used
+                           through SciPy distributions or "numpy" for a 
+                           np.random.Generator sampled directly
 
         """
         super().__init__()
-        self.ranstate = np.random.RandomState(seed=pd_sample_seed)
+        self.ranstate = WGSEED.makeRandomState( pd_sample_seed, backend )
     
     def getSingleVal( self, ):
         """Produce a single value from the random sampler from a uniform
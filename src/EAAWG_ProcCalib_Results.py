@@ -40,6 +40,9 @@ import os
 import pandas as pd
 import numpy as np
 import EAAWG_Inputs as WGI
+import EAAWG_RealStore as WGRS
+import EAAWG_Schema as WGSCM
+import EAAWG_LMoments as WGLM
 
 # parameters
 PROC_SPEI_START_TS = pd.Timestamp( 2030, 1, 1, 0 )
@@ -148,7 +151,8 @@ def estimatellogparams( npArray ):
     To estimate the distribution parameters (shape, scale, and location),
     the L-moments l1, l2, and t3 need to be calculated. These three
     L-moments can be estimated from the first three, sample weighted
-    probability moments (b0, b1, and b2).
+    probability moments (b0, b1, and b2). The calculations are in
+    EAAWG_LMoments.
     
     Args:
         npArray (np.ndarray): Numpy, 1D array
@@ -159,42 +163,141 @@ def estimatellogparams( npArray ):
             D["scale"]: alpha or scale
             D["loc"]: Eta or location
     """
-    # imports
-    import math
     # don't do any checking for type and assume that will always
     #  be Numpy ndarray for single argument
-    totLen = len( npArray )
-    # need a sorted array in increasing order
-    srtAr = np.sort( npArray )
-    # calculate sample probability weighted moments: b0, b1, b2
-    b0 = srtAr.mean()
-    b1 = 0.0
-    for iI in range(2, totLen + 1):
-        b1 += ( ( iI - 1 ) / ( totLen - 1 ) ) * srtAr[iI-1]
+    shape, scale, location = WGLM.fitGLO( npArray )
+    retDict = { "k" : float( shape[0] ),
+                "scale" : float( scale[0] ),
+                "loc" : float( location[0] ), }
+    # return
+    return retDict
+
+
+def collateStore( RStore ):
+    """Calculate the PEST collation values from a realization store using
+    reductions over the memory map rather than one DataFrame per realization.
+
+    Parameters
+    ----------
+    RStore : EAAWG_RealStore.RealizationStore
+        Open realization store.
+
+    Returns
+    -------
+    CoAnnAvesDF : pd.DataFrame
+        Annual average Precip_mm, ETo_mm, and Def_mm by realization.
+    MonthTrackDict : dict
+        Month number keys with np.ndarray of all 3-month cumulative deficits 
+        for that month.
+
+    """
+    # globals
+    global PROC_SPEI_START_TS, PROC_CN_START_TS, PROC_CN_END_TS
+    # start
+    DataDict = dict()
+    for varName in [ "Precip_mm", "ETo_mm", "Def_mm" ]:
+        AnnSums = RStore.annualSums( varName, start_ts=PROC_CN_START_TS, 
+                                     end_ts=PROC_CN_END_TS )
+        DataDict[varName] = AnnSums.to_numpy().mean( axis=1 ).astype( np.float32 )
     # end for
-    b1 = b1 / totLen
-    b2 = 0.0
-    for iI in range( 3, totLen + 1 ):
-        b2 += ( ( ( iI - 1 ) * ( iI - 2 ) ) / ( ( totLen - 1 ) * (totLen - 2 ) ) ) * srtAr[iI-1]
+    CoAnnAvesDF = pd.DataFrame( index=RStore.realNums, data=DataDict )
+    # 3-month cumulative deficits from monthly totals
+    MonLabels, MonSums = RStore.periodReduce( "Def_mm", freq="MS", how="sum",
+                                              start_ts=PROC_SPEI_START_TS,
+                                              end_ts=PROC_CN_END_TS )
+    D3Arr = np.full( MonSums.shape, np.nan, dtype=np.float64 )
+    D3Arr[:, 2:] = MonSums[:, 2:] + MonSums[:, 1:-1] + MonSums[:, :-2]
+    keepCols = np.asarray( MonLabels >= PROC_CN_START_TS )
+    D3Arr = D3Arr[:, keepCols]
+    D3Months = MonLabels[keepCols].month.to_numpy()
+    MonthTrackDict = dict()
+    for mon in range( 1, 13, 1 ):
+        MonthTrackDict[mon] = D3Arr[:, D3Months == mon].astype( np.float32 ).ravel()
     # end for
-    b2 = b2 / totLen
-    # calculate sample L-moments: l1, l2, t3
-    l1 = b0
-    l2 = (2.0 * b1 ) - b0
-    l3 = ( 6.0 * b2 ) -  ( 6.0 * b1 ) + b0
-    t3 = l3 / l2
-    # estimate the distribution parameters
-    shape = -1.0 * t3
-    scale = ( l2 * math.sin( shape * math.pi ) ) / ( shape * math.pi )
-    location = l1 - ( scale * ( ( 1.0 / shape ) - ( math.pi / math.sin( shape * math.pi ) ) ) )
-    retDict = { "k" : shape,
-                "scale" : scale,
-                "loc" : location, }
     # return
-    return retDict
+    return CoAnnAvesDF, MonthTrackDict
+
+
+def summarizeRealization( H0DF ):
+    """Calculate the PEST collation values for a single realization.
+
+    Can be called in a worker right after simulation so that the daily
+    outputs do not need to be read back in.
+
+    Parameters
+    ----------
+    H0DF : pd.DataFrame or EAAWG_Schema.CompactRealization
+        Realization outputs from EAAWG_HighRealResults.outputWSResults or
+        read from a realization file.
 
+    Returns
+    -------
+    SummDict : dict
+        Annual average "Precip_mm", "ETo_mm", and "Def_mm" and "D3Def",
+        a dictionary with month keys and np.ndarray of the 3-month
+        cumulative deficits for that month.
 
-def processOutputsForPEST( NumReal ):
+    """
+    # globals
+    global PROC_SPEI_START_TS, PROC_CN_START_TS, PROC_CN_END_TS
+    # start
+    MonH0DF = H0DF[["Def_mm"]].loc[PROC_SPEI_START_TS:PROC_CN_END_TS].resample( 'MS', ).sum()
+    AnnH0DF = H0DF[["Precip_mm", "ETo_mm", "Def_mm"]].loc[
+                    PROC_CN_START_TS:PROC_CN_END_TS].resample( 'AS' ).sum()
+    # process annual averages
+    SummDict = { "Precip_mm" : AnnH0DF["Precip_mm"].mean(),
+                 "ETo_mm" : AnnH0DF["ETo_mm"].mean(),
+                 "Def_mm" : AnnH0DF["Def_mm"].mean(),
+                 "D3Def" : dict(), }
+    # process to get collections of months to make SPEI distributions
+    D3DF = MonH0DF.rolling(window=3,).sum()
+    D3DF = D3DF.loc[PROC_CN_START_TS:].copy()
+    D3DF["Month"] = D3DF.index.month
+    for mon in range(1, 13, 1):
+        m3Mon = D3DF[D3DF["Month"] == mon].copy()
+        SummDict["D3Def"][mon] = m3Mon["Def_mm"].to_numpy(dtype=np.float32)
+    # end month for
+    # return
+    return SummDict
+
+
+def collateSummaries( RealsList, SummList ):
+    """Combine the realization summaries from summarizeRealization.
+
+    Parameters
+    ----------
+    RealsList : list
+        Realization numbers.
+    SummList : list
+        Summary dictionaries, in the same order as RealsList.
+
+    Returns
+    -------
+    CoAnnAvesDF : pd.DataFrame
+        Annual average Precip_mm, ETo_mm, and Def_mm by realization.
+    MonthTrackDict : dict
+        Month number keys with np.ndarray of all 3-month cumulative deficits
+        for that month.
+
+    """
+    # start
+    DataDict = dict()
+    for varName in [ "Precip_mm", "ETo_mm", "Def_mm" ]:
+        DataDict[varName] = np.array( [ x[varName] for x in SummList ],
+                                      dtype=np.float32 )
+    # end for
+    CoAnnAvesDF = pd.DataFrame( index=RealsList, data=DataDict )
+    MonthTrackDict = dict()
+    for mon in range(1, 13, 1):
+        MonthTrackDict[mon] = np.concatenate( [ x["D3Def"][mon] for x in
+                                                SummList ] ).astype( np.float32 )
+    # end for
+    # return
+    return CoAnnAvesDF, MonthTrackDict
+
+
+def processOutputsForPEST( NumReal, out_format="pickle", summaries=None,
+                           start_real=1 ):
     """Collate and process outputs for PEST analyses
     
     There are two main results employed for calibration:
@@ -206,81 +309,55 @@ def processOutputsForPEST( NumReal ):
     ----------
     NumReal : int
         Number of realizations in this simulation.
+    out_format : str, optional
+        "pickle" to read one pickle per realization or "store" to read 
+        slices from the basin realization store. The default is "pickle".
+    summaries : list, optional
+        Realization summaries from summarizeRealization, calculated in the
+        workers. When provided no outputs are read. The default is None.
+    start_real : int, optional
+        First realization number. The default is 1.
 
     Returns
     -------
     None.
 
     """
-    # imports
-    from copy import deepcopy
     # globals
-    global PROC_SPEI_START_TS, PROC_CN_START_TS, PROC_CN_END_TS
     global DROUGHT_TARGETS
     # parameters
     # locals
-    AnnAvePreList = list()
-    AnnAvePETList = list()
-    AnnAveDefList = list()
-    RealsList = [ x for x in range( 1, NumReal+1 ) ]
+    RealsList = [ x for x in range( start_real, start_real+NumReal ) ]
     MonthsList = [ x for x in range(1, 13, 1) ]
-    MonthTrackDict = dict()
     TargCDefDict = dict()
     # start
-    copyList = list()
-    for mon in MonthsList:
-        MonthTrackDict[mon] = deepcopy( copyList )
-    # end for
-    # need to loop through all of the realizations to collate
-    for RealNum in RealsList:
-        # get the name and location for serialized DataFrame for this real
-        H0FileName = "%s_R%d_DF.pickle" % (WGI.OUT_LABEL, RealNum)
-        H0OutFP = os.path.normpath( os.path.join( WGI.OUT_DIR, WGI.OUT_SUB_DIR, 
-                                                  H0FileName ) )
-        # read in the DataFrame
-        H0DF = pd.read_pickle( H0OutFP, compression='zip' )
-        MonH0DF = H0DF[["Def_mm"]].loc[PROC_SPEI_START_TS:PROC_CN_END_TS].resample( 'MS', ).sum()
-        H0DF = H0DF.loc[PROC_CN_START_TS:PROC_CN_END_TS].copy()
-        AnnH0DF = H0DF[["Precip_mm", "ETo_mm", "Def_mm"]].resample( 'AS' ).sum()
-        # process annual averages 
-        AnnAvePreList.append( AnnH0DF["Precip_mm"].mean() )
-        AnnAvePETList.append( AnnH0DF["ETo_mm"].mean() )
-        AnnAveDefList.append( AnnH0DF["Def_mm"].mean() )
-        # process to get collections of months to make SPEI distributions
-        D3DF = MonH0DF.rolling(window=3,).sum()
-        D3DF = D3DF.loc[PROC_CN_START_TS:].copy()
-        D3DF["Month"] = D3DF.index.month
-        for mon in MonthsList:
-            m3Mon = D3DF[D3DF["Month"] == mon].copy()
-            a3Mon = m3Mon["Def_mm"].to_numpy(dtype=np.float32)
-            MonthTrackDict[mon].extend( a3Mon.tolist() )
-        # end month for
-    # end realization for
-    # make the annual averages DataFrame
-    DataDict = { "Precip_mm" : np.array( AnnAvePreList, dtype=np.float32 ),
-                 "ETo_mm" : np.array( AnnAvePETList, dtype=np.float32 ),
-                 "Def_mm" : np.array( AnnAveDefList, dtype=np.float32 ), }
-    CoAnnAvesDF = pd.DataFrame( index=RealsList, data=DataDict )
+    if summaries is not None:
+        CoAnnAvesDF, MonthTrackDict = collateSummaries( RealsList, summaries )
+    elif out_format == "store":
+        CoAnnAvesDF, MonthTrackDict = collateStore( WGRS.RealizationStore() )
+    else:
+        SummList = list()
+        # need to loop through all of the realizations to collate
+        for RealNum in RealsList:
+            # get the name and location for serialized DataFrame for this real
+            H0FileName = "%s_R%d_DF.pickle" % (WGI.OUT_LABEL, RealNum)
+            H0OutFP = os.path.normpath( os.path.join( WGI.OUT_DIR, WGI.OUT_SUB_DIR,
+                                                      H0FileName ) )
+            # read in the DataFrame
+            H0DF = WGSCM.readRealization( H0OutFP )
+            SummList.append( summarizeRealization( H0DF ) )
+        # end realization for
+        CoAnnAvesDF, MonthTrackDict = collateSummaries( RealsList, SummList )
+    # end if
     # process our collections of monthly, 3-month cumulative deficit values.
-    for mon in MonthsList:
-        a3Mon = np.array( MonthTrackDict[mon], dtype=np.float32 )
-        # fit 'generalized logistic' distributions to this array
-        lD3Mon = estimatellogparams( a3Mon )
-        estCProbTarget = probDistLLogis( lD3Mon, np.array( [DROUGHT_TARGETS[mon][1]], 
-                                                           dtype=np.float32 ) )
-        #if np.isnan( estCProbTarget[0] ):
-        #    meanMoDef = a3Mon.mean()
-        #    meanDef = CoAnnAvesDF["Def_mm"].mean()
-        #    if ( meanDef >= 0.0 ) or ( meanMoDef >= 0.0 ):
-        #        cCDFEst = 1.0
-        #    else:
-        #        cCDFEst = 0.0
-        #    # end if
-        #else:
-        #    cCDFEst = float( estCProbTarget[0] )
-        ## end if
-        cCDFEst = float( estCProbTarget[0] )
-        TargCDefDict[mon] = cCDFEst
+    #  fit 'generalized logistic' distributions to all months at once
+    lShape, lScale, lLoc = WGLM.fitGLO( [ np.array( MonthTrackDict[mon],
+                                          dtype=np.float32 ) for mon in MonthsList ] )
+    TargDefs = np.array( [ DROUGHT_TARGETS[mon][1] for mon in MonthsList ],
+                         dtype=np.float32 )
+    estCProbTarget = WGLM.cdfGLO( lShape, lScale, lLoc, TargDefs )
+    for mM, mon in enumerate( MonthsList ):
+        TargCDefDict[mon] = float( estCProbTarget[mM] )
     # end for
     # now output
     OutFiler = os.path.normpath( os.path.join( WGI.CUR_DIR, "CollOuts.dat" ) )
@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: EAAWG_Profile
+   :platform: Windows, Linux
+   :synopsis: Per phase timing of the realization workers
+
+.. moduleauthor:: Nick Martin <nick.martin@alumni.stanford.edu>
+
+python EAAWGmp.py 10 --num_real 100 --profile
+
+With --profile the workers time each phase of a realization: sampling,
+events, the temperature recursion, PET, the output DataFrame, event
+output, the collation summary, and the file writes. The run writes
+<basin>_Profile.txt and <basin>_Profile.json to the outputs directory with
+the totals by phase, by worker process, and by task.
+
+Times are exclusive, a phase nested in another is only counted in the inner
+phase. Wall time is from time.perf_counter and CPU time from
+time.thread_time, the CPU time of the thread that ran the phase. Writes in
+the background writer threads, see EAAWG_Writer, overlap the simulation, so
+their wall time is not part of the task time. write_wait is the time a
+worker spent blocked on a full write queue or waiting for the writes at the
+end of a chunk; a large write_wait means the run is limited by I/O. Writes
+that finish after a task are counted with the next task of the chunk, so
+writes are only exact for the worker totals.
+
+When profiling is off, startPhase and endPhase return after one check, so
+the hooks can stay in the day loop.
+
+"""
+# Copyright and License
+"""
+Copyright 2023 Southwest Research Institute
+
+Module Author: Nick Martin <nick.martin@alumni.stanford.edu>
+
+This file is part of a custom weather generator framework with extreme events,
+hereafter WG Framework.
+
+WG Framework is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+WG Framework is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+# imports
+import json
+import os
+import threading
+import time
+
+# parameters
+PROFILE_EXT = "_Profile"
+"""File name ending for the profile report files"""
+PHASE_ORDER = [ "setup", "sampling", "states", "events", "temperature",
+                "output", "pet", "event_output", "summary", "write",
+                "write_wait" ]
+"""Report order of the phases. Other phase names follow these."""
+
+# module level variables
+ENABLED = False
+"""Flag for profiling in this process"""
+PHASE_TIMES = dict()
+"""[wall seconds, CPU seconds, calls] by phase since the last takeTimes"""
+PHASE_LOCK = threading.Lock()
+"""Lock for PHASE_TIMES, phases are also timed in writer threads"""
+THREAD_STATE = threading.local()
+"""Stack of the open phases in each thread"""
+
+
+#--------------------------------------------------------------------------
+# custom classes
+class phase(object):
+    """Context manager to time a phase
+
+    with WGPRF.phase( "pet" ):
+        ...
+
+    """
+
+    def __init__( self, name ):
+        """Default initialization method
+
+        Args:
+            name (str): phase name
+
+        """
+        self.name = name
+        self.tStart = None
+
+    def __enter__( self ):
+        self.tStart = startPhase()
+        return self
+
+    def __exit__( self, excType, excVal, excTB ):
+        endPhase( self.name, self.tStart )
+        return False
+
+
+class ProfileReport(object):
+    """Phase times from the workers merged in the parent process
+    """
+
+    def __init__( self ):
+        """Default initialization method"""
+        super().__init__()
+        self.tasks = list()
+        """Record for each task, realizations, worker, elapsed, and phases"""
+
+    def add( self, RealNums, workerID, elapsed, times ):
+        """Add the phase times of a task
+
+        Args:
+            RealNums (list): realization numbers simulated by the task
+            workerID (int): process id of the worker
+            elapsed (float): task wall time in seconds
+            times (dict): [wall, CPU, calls] by phase from takeTimes
+
+        Returns:
+            None.
+
+        """
+        if times is None:
+            return
+        # end if
+        self.tasks.append( { "reals" : [ int( x ) for x in RealNums ],
+                             "worker" : int( workerID ),
+                             "elapsed" : float( elapsed ),
+                             "phases" : times, } )
+
+    def totals( self, tasks=None ):
+        """Summed phase times
+
+        KWargs:
+            tasks (list): task records to sum, None for all
+
+        Returns:
+            dict: [wall, CPU, calls] by phase in PHASE_ORDER
+        """
+        if tasks is None:
+            tasks = self.tasks
+        # end if
+        totDict = dict()
+        for tRec in tasks:
+            addTimes( totDict, tRec["phases"] )
+        # end for
+        # return
+        return { x : totDict[x] for x in sortPhases( totDict ) }
+
+    def workerTotals( self ):
+        """Summed phase times for each worker process
+
+        Returns:
+            dict: totals, like totals, by worker process id
+
+        """
+        workerIDs = sorted( set( x["worker"] for x in self.tasks ) )
+        return { x : self.totals( tasks=[ y for y in self.tasks
+                                          if y["worker"] == x ] )
+                 for x in workerIDs }
+
+    def reportLines( self ):
+        """Summary table lines
+
+        Returns:
+            list: text lines
+
+        """
+        numReal = sum( len( x["reals"] ) for x in self.tasks )
+        taskWall = sum( x["elapsed"] for x in self.tasks )
+        OutLines = list()
+        OutLines.append( "Phase times for %d realizations in %d tasks, %.2f s "
+                         "task wall time\n\n" % ( numReal, len( self.tasks ),
+                                                  taskWall ) )
+        OutLines.append( "%-14s %10s %12s %12s %8s %8s %14s\n" %
+                         ( "Phase", "Calls", "Wall s", "CPU s", "CPU/Wall",
+                           "Wall %", "Wall ms/real" ) )
+        totDict = self.totals()
+        for phName, pTimes in totDict.items():
+            OutLines.append( "%-14s %10d %12.3f %12.3f %8.2f %8.1f %14.2f\n" %
+                             ( phName, pTimes[2], pTimes[0], pTimes[1],
+                               pTimes[1] / max( pTimes[0], 1.0e-12 ),
+                               100.0 * pTimes[0] / max( taskWall, 1.0e-12 ),
+                               1000.0 * pTimes[0] / max( numReal, 1 ) ) )
+        # end for
+        OutLines.append( "\nBy worker process\n" )
+        OutLines.append( "%-10s %12s %12s %12s\n" % ( "Worker", "Wall s",
+                                                      "CPU s", "write_wait s" ) )
+        for workerID, wTotals in self.workerTotals().items():
+            OutLines.append( "%-10d %12.3f %12.3f %12.3f\n" %
+                             ( workerID, sum( x[0] for x in wTotals.values() ),
+                               sum( x[1] for x in wTotals.values() ),
+                               wTotals.get( "write_wait", [ 0.0 ] )[0] ) )
+        # end for
+        # return
+        return OutLines
+
+    def write( self, OutRoot ):
+        """Write the summary table and the JSON report
+
+        Args:
+            OutRoot (str): file path without the extension
+
+        Returns:
+            None.
+
+        """
+        with open( "%s.txt" % OutRoot, 'w' ) as OF:
+            OF.write( "".join( self.reportLines() ) )
+        # end with
+        OutDict = { "totals" : self.totals(),
+                    "workers" : { str( x ) : y for x, y in
+                                  self.workerTotals().items() },
+                    "tasks" : self.tasks, }
+        with open( "%s.json" % OutRoot, 'w' ) as OF:
+            json.dump( OutDict, OF, indent=1 )
+        # end with
+
+
+#--------------------------------------------------------------------------
+# functions
+def setProfiling( enabled ):
+    """Turn profiling on or off for this process and clear the times
+
+    Args:
+        enabled (bool): True to profile
+
+    Returns:
+        None.
+
+    """
+    # globals
+    global ENABLED, PHASE_TIMES
+    # start
+    ENABLED = bool( enabled )
+    with PHASE_LOCK:
+        PHASE_TIMES = dict()
+    # end with
+    # return
+    return
+
+
+def startPhase():
+    """Start timing a phase. Must be matched by endPhase in the same
+    thread, with phases closed in reverse order.
+
+    Returns:
+        list: phase start record, None when profiling is off
+
+    """
+    if not ENABLED:
+        return None
+    # end if
+    phStack = getattr( THREAD_STATE, "stack", None )
+    if phStack is None:
+        phStack = list()
+        THREAD_STATE.stack = phStack
+    # end if
+    tStart = [ time.perf_counter(), time.thread_time(), 0.0, 0.0 ]
+    phStack.append( tStart )
+    return tStart
+
+
+def endPhase( name, tStart ):
+    """End timing a phase and add its exclusive time
+
+    Args:
+        name (str): phase name
+        tStart (list): record from startPhase
+
+    Returns:
+        None.
+
+    """
+    if tStart is None:
+        return
+    # end if
+    wallT = time.perf_counter() - tStart[0]
+    cpuT = time.thread_time() - tStart[1]
+    phStack = THREAD_STATE.stack
+    phStack.pop()
+    if len( phStack ) > 0:
+        phStack[-1][2] += wallT
+        phStack[-1][3] += cpuT
+    # end if
+    with PHASE_LOCK:
+        addTimes( PHASE_TIMES, { name : [ wallT - tStart[2], cpuT - tStart[3],
+                                          1 ] } )
+    # end with
+
+
+def takeTimes():
+    """Phase times since the last call, and start again
+
+    Returns:
+        dict: [wall, CPU, calls] by phase, None when profiling is off
+
+    """
+    # globals
+    global PHASE_TIMES
+    # start
+    if not ENABLED:
+        return None
+    # end if
+    with PHASE_LOCK:
+        outTimes = PHASE_TIMES
+        PHASE_TIMES = dict()
+    # end with
+    # return
+    return outTimes
+
+
+def addTimes( totDict, times ):
+    """Add phase times into totDict
+
+    Args:
+        totDict (dict): [wall, CPU, calls] by phase, updated
+        times (dict): [wall, CPU, calls] by phase to add
+
+    Returns:
+        None.
+
+    """
+    for phName, pTimes in times.items():
+        if phName in totDict:
+            tTimes = totDict[phName]
+            tTimes[0] += pTimes[0]
+            tTimes[1] += pTimes[1]
+            tTimes[2] += pTimes[2]
+        else:
+            totDict[phName] = list( pTimes )
+        # end if
+    # end for
+
+
+def sortPhases( times ):
+    """Phase names in report order"""
+    return [ x for x in PHASE_ORDER if x in times ] + \
+           sorted( x for x in times if x not in PHASE_ORDER )
+
+
+def profilePath( out_label ):
+    """Profile report file path, without the extension, in the outputs
+    directory"""
+    # imports
+    import EAAWG_Inputs as WGI
+    # return
+    return os.path.normpath( os.path.join( WGI.OUT_DIR, WGI.OUT_SUB_DIR,
+                                           "%s%s" % ( out_label,
+                                                      PROFILE_EXT ) ) )
+
+
+#EOF
@@ -0,0 +1,498 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: EAAWG_RealStore
+   :platform: Windows, Linux
+   :synopsis: Single file, columnar storage for all realizations of a basin
+
+.. moduleauthor:: Nick Martin <nick.martin@alumni.stanford.edu>
+
+Alternative to one zip compressed pickle per realization. All realizations
+for a basin are written into a single, memory-mappable NumPy array file with
+shape (number of realizations, number of days, number of variables) and
+float32 values. A JSON sidecar file holds the variable names, the
+simulation dates, the realization numbers, and which realizations are
+complete.
+
+Each worker process writes its realizations directly into its own slice of
+the array file so no collation step is needed. Readers get a realization,
+or a variable across all realizations, as a slice of the memory map.
+
+Statistics over realizations, like annual sums, monthly means, and quantile
+cones, are calculated with reductions over blocks of realizations read
+from the memory map so that the full store never needs to be in memory and
+no DataFrames are created per realization. Stores can also be built from
+the pickle outputs of previous runs with storeFromPickles.
+
+"""
+# Copyright and License
+"""
+Copyright 2023 Southwest Research Institute
+
+Module Author: Nick Martin <nick.martin@alumni.stanford.edu>
+
+This file is part of a custom weather generator framework with extreme events,
+hereafter WG Framework.
+
+WG Framework is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+WG Framework is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+# imports
+import os
+import json
+import numpy as np
+import pandas as pd
+import EAAWG_Inputs as WGI
+import EAAWG_Calendar as WGCAL
+import EAAWG_Schema as WGSCM
+
+# parameters
+STORE_VARS = [ "Tmax_C", "Tmin_C", "Precip_mm", "Tave_C", "MonDelta_T",
+               "ETo_mm", "Def_mm" ]
+"""Variables, in order, stored for each realization"""
+STORE_DATA_EXT = "_Store.npy"
+"""File name ending for the array file"""
+STORE_META_EXT = "_Store.json"
+"""File name ending for the metadata file"""
+STORE_DONE_EXT = "_Store_Done.npy"
+"""File name ending for the realization completion flags"""
+REAL_BLOCK = 256
+"""Number of realizations read at a time for reductions over the store"""
+
+# module level variables
+WRITE_STORE = None
+"""Open store for writing in this process. Opened on first write."""
+WRITE_LABEL = None
+"""File label of the store that writeRealization writes to, None for the
+basin store. Set for sharded runs before the workers start."""
+
+
+#--------------------------------------------------------------------------
+# custom classes
+class RealStoreError(Exception):
+    """Custom exception error for realization store issues
+    """
+    def __init__(self, arg):
+        super().__init__( arg )
+
+
+class RealizationStore(object):
+    """All realizations for a basin in a single memory-mapped array file.
+
+    Realization RealNum is at position RealNum - first realization number
+    along the first axis.
+    """
+
+    def __init__( self, out_label=None, out_dir=None, mode='r' ):
+        """Open an existing store.
+
+        KWargs:
+            out_label (str): file label, defaults to WGI.OUT_LABEL
+            out_dir (str): store directory, defaults to the outputs directory
+                           from WGI.OUT_DIR and WGI.OUT_SUB_DIR
+            mode (str): 'r' for read only or 'r+' for read and write
+
+        """
+        super().__init__()
+        self.out_label, self.out_dir = storeLocation( out_label, out_dir )
+        MetaFP = storePath( STORE_META_EXT, self.out_label, self.out_dir )
+        if not os.path.isfile( MetaFP ):
+            ErrorMsg = "No realization store found at %s!!!" % MetaFP
+            raise RealStoreError( ErrorMsg )
+        # end if
+        with open( MetaFP, 'r' ) as IF:
+            self.meta = json.load( IF )
+        # end with
+        self.mode = mode
+        self.varNames = list( self.meta["variables"] )
+        self.realNums = [ int(x) for x in self.meta["real_nums"] ]
+        self.firstReal = self.realNums[0]
+        self.DT_INDEX = pd.date_range( start=self.meta["start_date"],
+                                       periods=int( self.meta["num_days"] ),
+                                       freq='D' )
+        self.data = np.load( storePath( STORE_DATA_EXT, self.out_label,
+                                        self.out_dir ), mmap_mode=mode )
+        self.done = np.load( storePath( STORE_DONE_EXT, self.out_label,
+                                        self.out_dir ), mmap_mode=mode )
+
+    def realIndex( self, RealNum ):
+        """Position along the first axis for RealNum"""
+        rIndex = int( RealNum ) - self.firstReal
+        if ( rIndex < 0 ) or ( rIndex >= len( self.realNums ) ):
+            ErrorMsg = "Realization %d is not in this store!!!" % RealNum
+            raise RealStoreError( ErrorMsg )
+        # end if
+        return rIndex
+
+    def varIndex( self, varName ):
+        """Position along the last axis for varName"""
+        return self.varNames.index( varName )
+
+    def writeRealization( self, RealNum, H0DF ):
+        """Write a realization DataFrame into its slice and flag complete.
+
+        Args:
+            RealNum (int): realization number
+            H0DF (pd.DataFrame): realization outputs with STORE_VARS columns
+
+        """
+        rIndex = self.realIndex( RealNum )
+        self.data[rIndex, :, :] = H0DF[self.varNames].to_numpy( dtype=np.float32 )
+        self.data.flush()
+        self.done[rIndex] = 1
+        self.done.flush()
+
+    def isComplete( self ):
+        """True if every realization in the store has been written"""
+        return bool( np.all( self.done == 1 ) )
+
+    def missingReals( self ):
+        """List of realization numbers that have not been written"""
+        return [ self.realNums[x] for x in np.flatnonzero( self.done != 1 ) ]
+
+    def getRealization( self, RealNum ):
+        """Get a realization as a DataFrame, the same as from the pickle.
+
+        Args:
+            RealNum (int): realization number
+
+        Returns:
+            H0DF (pd.DataFrame): realization outputs
+
+        """
+        rIndex = self.realIndex( RealNum )
+        H0DF = pd.DataFrame( index=self.DT_INDEX,
+                             data=np.array( self.data[rIndex, :, :] ),
+                             columns=self.varNames )
+        return H0DF
+
+    def getVariable( self, varName, start_ts=None, end_ts=None ):
+        """Get one variable for all realizations as a (realizations, days)
+        view of the memory map.
+
+        Args:
+            varName (str): variable name
+
+        KWargs:
+            start_ts (pd.Timestamp): first day to include, None for start
+            end_ts (pd.Timestamp): last day to include, None for end
+
+        Returns:
+            varArr (np.ndarray): (realizations, days) values
+
+        """
+        sIndex, eIndex = self.dayRange( start_ts, end_ts )
+        return self.data[:, sIndex:eIndex, self.varIndex( varName )]
+
+    def periodReduce( self, varName, freq="YS", how="sum", start_ts=None, 
+                      end_ts=None, block_size=REAL_BLOCK ):
+        """Sum or average one variable over calendar periods for every
+        realization.
+
+        Args:
+            varName (str): variable name
+
+        KWargs:
+            freq (str): "YS" for calendar years or "MS" for months
+            how (str): "sum" or "mean"
+            start_ts (pd.Timestamp): first day to include, None for start
+            end_ts (pd.Timestamp): last day to include, None for end
+            block_size (int): realizations read from the memory map at a time
+
+        Returns:
+            tuple: (pdLabels, redArr) pd.DatetimeIndex period start labels, 
+                   like pandas resample, and (realizations, periods) 
+                   np.ndarray of float64 period values
+
+        """
+        sIndex, eIndex = self.dayRange( start_ts, end_ts )
+        pdLabels, pdStarts, pdCounts = periodBounds( 
+                                       self.DT_INDEX[sIndex:eIndex], freq )
+        vIndex = self.varIndex( varName )
+        numReal = len( self.realNums )
+        redArr = np.zeros( ( numReal, len( pdStarts ) ), dtype=np.float64 )
+        for rStart in range( 0, numReal, block_size ):
+            rEnd = min( rStart + block_size, numReal )
+            redArr[rStart:rEnd, :] = np.add.reduceat( 
+                                        self.data[rStart:rEnd, sIndex:eIndex, vIndex],
+                                        pdStarts, axis=1, dtype=np.float64 )
+        # end for
+        if how == "mean":
+            redArr /= pdCounts.reshape( 1, len( pdCounts ) )
+        elif how != "sum":
+            ErrorMsg = "Unknown period reduction %s!!!" % how
+            raise RealStoreError( ErrorMsg )
+        # end if
+        return pdLabels, redArr
+
+    def annualSums( self, varName, start_ts=None, end_ts=None ):
+        """Calendar year totals for every realization.
+
+        Returns:
+            pd.DataFrame: index is realization numbers and columns are the
+                          year start dates
+
+        """
+        pdLabels, redArr = self.periodReduce( varName, freq="YS", how="sum", 
+                                              start_ts=start_ts, end_ts=end_ts )
+        return pd.DataFrame( index=self.realNums, data=redArr, columns=pdLabels )
+
+    def monthlyMeans( self, varName, start_ts=None, end_ts=None ):
+        """Monthly average daily values for every realization.
+
+        Returns:
+            pd.DataFrame: index is realization numbers and columns are the
+                          month start dates
+
+        """
+        pdLabels, redArr = self.periodReduce( varName, freq="MS", how="mean", 
+                                              start_ts=start_ts, end_ts=end_ts )
+        return pd.DataFrame( index=self.realNums, data=redArr, columns=pdLabels )
+
+    def quantileCone( self, varName, quantiles=( 0.05, 0.25, 0.5, 0.75, 0.95 ),
+                      freq="YS", how="sum", start_ts=None, end_ts=None ):
+        """Quantiles across realizations of period values, for plotting the 
+        spread of outcomes through time.
+
+        KWargs:
+            quantiles (tuple): quantiles, as fractions, to calculate
+
+        Returns:
+            pd.DataFrame: index is the period start dates and columns are 
+                          the quantiles
+
+        """
+        pdLabels, redArr = self.periodReduce( varName, freq=freq, how=how, 
+                                              start_ts=start_ts, end_ts=end_ts )
+        qArr = np.quantile( redArr, np.array( quantiles ), axis=0 )
+        return pd.DataFrame( index=pdLabels, data=qArr.T, 
+                             columns=list( quantiles ) )
+
+    def dayRange( self, start_ts=None, end_ts=None ):
+        """Start and end, exclusive, positions along the day axis."""
+        if start_ts is None:
+            sIndex = 0
+        else:
+            sIndex = int( self.DT_INDEX.searchsorted( start_ts, side='left' ) )
+        # end if
+        if end_ts is None:
+            eIndex = len( self.DT_INDEX )
+        else:
+            eIndex = int( self.DT_INDEX.searchsorted( end_ts, side='right' ) )
+        # end if
+        return sIndex, eIndex
+
+
+#--------------------------------------------------------------------------
+# functions
+def storeLocation( out_label=None, out_dir=None ):
+    """Default file label and directory for the store.
+
+    Returns:
+        tuple: (out_label, out_dir)
+
+    """
+    if out_label is None:
+        out_label = WGI.OUT_LABEL
+    # end if
+    if out_dir is None:
+        out_dir = os.path.normpath( os.path.join( WGI.OUT_DIR, WGI.OUT_SUB_DIR ) )
+    # end if
+    return out_label, out_dir
+
+
+def storePath( fileExt, out_label=None, out_dir=None ):
+    """File path for one of the store files.
+
+    Args:
+        fileExt (str): one of STORE_DATA_EXT, STORE_META_EXT, STORE_DONE_EXT
+
+    KWargs:
+        out_label (str): file label, defaults to WGI.OUT_LABEL
+        out_dir (str): store directory, defaults to the outputs directory
+
+    Returns:
+        str: file path
+
+    """
+    out_label, out_dir = storeLocation( out_label, out_dir )
+    return os.path.normpath( os.path.join( out_dir, "%s%s" % ( out_label,
+                                                              fileExt ) ) )
+
+
+def periodBounds( DT_INDEX, freq="YS" ):
+    """Positions of the contiguous calendar periods in a daily index, from
+    the EAAWG_Calendar.SimCalendar month and year starts for the index.
+
+    Args:
+        DT_INDEX (pd.DateTimeIndex): daily index
+
+    KWargs:
+        freq (str): "YS" for calendar years or "MS" for months
+
+    Returns:
+        tuple: (pdLabels, pdStarts, pdCounts) period start dates, position 
+               of the first day of each period, and days in each period
+
+    """
+    # start
+    SimCal = WGCAL.SimCalendar( DT_INDEX[0], DT_INDEX[-1] )
+    if freq == "YS":
+        pdStarts = SimCal.yearStarts
+        pdMonths = np.ones( len( pdStarts ), dtype=np.int64 )
+    elif freq == "MS":
+        pdStarts = SimCal.monStarts
+        pdMonths = SimCal.month[pdStarts]
+    else:
+        ErrorMsg = "Unknown period frequency %s!!!" % freq
+        raise RealStoreError( ErrorMsg )
+    # end if
+    pdCounts = np.diff( np.r_[ pdStarts, SimCal.numDays ] )
+    pdLabels = pd.to_datetime( pd.DataFrame( { "year" : SimCal.year[pdStarts],
+                                               "month" : pdMonths,
+                                               "day" : 1, } ) )
+    # return
+    return pd.DatetimeIndex( pdLabels ), pdStarts, pdCounts
+
+
+def createStore( RealNums, DT_INDEX, varNames=STORE_VARS, out_label=None,
+                 out_dir=None ):
+    """Create an empty store for a consecutive set of realizations. Call
+    this once, in the main process, before starting the workers.
+
+    Args:
+        RealNums (list): consecutive realization numbers
+        DT_INDEX (pd.DateTimeIndex): index for all outputs
+
+    KWargs:
+        varNames (list): variables to store
+        out_label (str): file label, defaults to WGI.OUT_LABEL
+        out_dir (str): store directory, defaults to the outputs directory
+
+    Returns:
+        None.
+
+    """
+    # start
+    RealNums = [ int(x) for x in RealNums ]
+    if RealNums != list( range( RealNums[0], RealNums[0] + len( RealNums ) ) ):
+        ErrorMsg = "Store realization numbers must be consecutive!!!"
+        raise RealStoreError( ErrorMsg )
+    # end if
+    numReal = len( RealNums )
+    numDays = len( DT_INDEX )
+    dataArr = np.lib.format.open_memmap( storePath( STORE_DATA_EXT, out_label,
+                                                    out_dir ),
+                                         mode='w+', dtype=np.float32,
+                                         shape=( numReal, numDays,
+                                                 len( varNames ) ) )
+    dataArr.flush()
+    del dataArr
+    doneArr = np.lib.format.open_memmap( storePath( STORE_DONE_EXT, out_label,
+                                                    out_dir ),
+                                         mode='w+', dtype=np.uint8,
+                                         shape=( numReal, ) )
+    doneArr.flush()
+    del doneArr
+    MetaDict = { "label" : storeLocation( out_label, out_dir )[0],
+                 "variables" : list( varNames ),
+                 "start_date" : DT_INDEX[0].strftime("%Y-%m-%d"),
+                 "end_date" : DT_INDEX[numDays-1].strftime("%Y-%m-%d"),
+                 "num_days" : numDays,
+                 "real_nums" : RealNums, }
+    with open( storePath( STORE_META_EXT, out_label, out_dir ), 'w' ) as OF:
+        json.dump( MetaDict, OF, indent=2 )
+    # end with
+    # return
+    return
+
+
+def getWriteStore( ):
+    """The store that this process writes to. Opened once per process.
+
+    Returns:
+        RealizationStore: store opened for writing
+
+    """
+    # globals
+    global WRITE_STORE
+    # start
+    if WRITE_STORE is None:
+        WRITE_STORE = RealizationStore( out_label=WRITE_LABEL, mode='r+' )
+    # end if
+    # return
+    return WRITE_STORE
+
+
+def writeRealization( RealNum, H0DF ):
+    """Write a realization into the store for this basin. The store is
+    opened once per process.
+
+    Args:
+        RealNum (int): realization number
+        H0DF (pd.DataFrame): realization outputs with STORE_VARS columns
+
+    Returns:
+        None.
+
+    """
+    # start
+    getWriteStore().writeRealization( RealNum, H0DF )
+    # return
+    return
+
+
+def storeFromPickles( RealNums, out_label=None, out_dir=None ):
+    """Build a store from the one pickle per realization outputs of a
+    previous run so that those results can use the store readers.
+
+    Args:
+        RealNums (list): consecutive realization numbers to convert
+
+    KWargs:
+        out_label (str): file label, defaults to WGI.OUT_LABEL
+        out_dir (str): directory with the pickles and for the store
+
+    Returns:
+        RealizationStore: the new store opened read only
+
+    """
+    # start
+    out_label, out_dir = storeLocation( out_label, out_dir )
+    RealNums = [ int(x) for x in RealNums ]
+    RStore = None
+    for RealNum in RealNums:
+        H0FP = os.path.normpath( os.path.join( out_dir, "%s_R%d_DF.pickle" % 
+                                               ( out_label, RealNum ) ) )
+        H0DF = WGSCM.readRealization( H0FP )
+        if RStore is None:
+            createStore( RealNums, H0DF.index, out_label=out_label, 
+                         out_dir=out_dir )
+            RStore = RealizationStore( out_label=out_label, out_dir=out_dir, 
+                                       mode='r+' )
+        # end if
+        RStore.writeRealization( RealNum, H0DF )
+    # end for
+    # return
+    return RealizationStore( out_label=out_label, out_dir=out_dir )
+
+
+def cleanAllEnd():
+    """Convenience method to close the write store at the end"""
+    global WRITE_STORE
+    # start
+    WRITE_STORE = None
+
+
+#EOF
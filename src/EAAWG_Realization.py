@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: EAAWG_Realization
+   :platform: Windows, Linux
+   :synopsis: Simulation state for a single realization
+
+.. moduleauthor:: Nick Martin <nick.martin@alumni.stanford.edu>
+
+A Realization holds everything that changes while a realization is
+simulated: the random samplers, the sampled value trackers, the event
+timeline, and the H0 output array. Separate Realization objects share
+nothing that changes, so several realizations can be simulated in one
+process, for example on threads, without one advancing another's random
+streams.
+
+The distributions, which have no random state, are created from the input
+module when the Realization is created, so a Realization belongs to the
+basin that was active then. The smoothed climatology and A and B matrices
+in EAAWG_OtherWeather are read only and are still shared.
+
+A Realization is reused for any number of realizations. reseed replaces all
+of the random streams, and the set methods start new trackers and outputs.
+
+"""
+# Copyright and License
+"""
+Copyright 2023 Southwest Research Institute
+
+Module Author: Nick Martin <nick.martin@alumni.stanford.edu>
+
+This file is part of a custom weather generator framework with extreme events,
+hereafter WG Framework.
+
+WG Framework is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+WG Framework is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+# imports
+import numpy as np
+import EAAWG_Inputs as WGI
+import EAAWG_Seeds as WGSEED
+import EAAWG_SpellLength as WGSL
+import EAAWG_PrecipDepth as WGPD
+import EAAWG_StdNormal as WGSN
+import EAAWG_Dists_Samples as WGDS
+import EAAWG_OtherWeather as WGOW
+import EAAWG_HighRealResults as WGHRR
+import EAAWG_Events as EXEV
+
+# parameters
+MONTH_INTS = list( range(1, 13, 1) )
+"""Month indexes for the month keyed dictionaries"""
+
+
+#--------------------------------------------------------------------------
+# custom classes
+class Realization(object):
+    """Samplers, trackers, and outputs for one realization at a time
+    """
+
+    def __init__( self, backend="scipy" ):
+        """Default initialization method. Samplers are created unseeded and
+        must be seeded with reseed before use.
+
+        KWargs:
+            backend (str): sampling backend, "scipy" or "numpy"
+
+        """
+        super().__init__()
+        self.backend = backend
+        self.basin = WGI.OUT_LABEL
+        self.eventKeys = list( WGI.EVENT_KEYS )
+        # distributions
+        self.dryDists, self.wetDists, self.depthDists = WGDS.makeDistributions()
+        self.epsDists = [ WGSN.StdNormal() for _ in range( WGOW.NUM_OTHER ) ]
+        self.events = [ EXEV.makeEvent( x ) for x in self.eventKeys ]
+        # samplers
+        self.drySamp = { x : WGSL.DryStateSampler( backend=backend )
+                         for x in MONTH_INTS }
+        self.wetSamp = { x : WGSL.WetStateSampler( backend=backend )
+                         for x in MONTH_INTS }
+        self.depthSamp = { x : WGPD.PrecipSampler( backend=backend )
+                           for x in MONTH_INTS }
+        self.epsSamp = [ WGSN.ErrorTSampler( backend=backend )
+                         for _ in range( WGOW.NUM_OTHER ) ]
+        self.recurSamp = [ EXEV.EventRecurSampler( backend=backend )
+                           for _ in self.eventKeys ]
+        self.magSamp = [ EXEV.EventMagSampler( backend=backend )
+                         for _ in self.eventKeys ]
+        self.startSamp = WGPD.PrecipSampler( backend=backend )
+        # one stream per sampling family for the bulk draws of the array
+        #  engine so that the months do not share the same random numbers.
+        #  The array engine error variates come from epsSamp[0].
+        self.dryBulkSamp = WGSL.DryStateSampler( backend=backend )
+        self.wetBulkSamp = WGSL.WetStateSampler( backend=backend )
+        self.depthBulkSamp = WGPD.PrecipSampler( backend=backend )
+        self.buffers = None
+        """Buffered streams by month, (dry, wet, depth), when buffered"""
+        # trackers
+        self.stDrySpell = dict()
+        self.stWetSpell = dict()
+        self.stPDepth = dict()
+        self.epsi2 = np.ones( (1, WGOW.NUM_OTHER), dtype=np.float64 )
+        self.timeline = EXEV.EventTimeline( self.eventKeys, self.events )
+        """Custom event schedules and triggered events"""
+        # outputs
+        self.H0_REAL = None
+        """Simulated values, (days, EAAWG_HighRealResults.TOT_VALS)"""
+
+    def reseed( self, SeedDict, buffered=False, block_size=WGDS.BUFFER_SIZE ):
+        """Reseed all of the samplers for a new realization. The random
+        states are reseeded in place, see EAAWG_Seeds.reseedState.
+
+        Args:
+            SeedDict (dict): seeds by stream from
+                             EAAWG_Seeds.realizationSeeds
+
+        KWargs:
+            buffered (bool): use block buffers for the spell length and
+                             precipitation depth sampling
+            block_size (int): number of values per block when buffered
+
+        """
+        for jJ in MONTH_INTS:
+            WGSEED.reseedState( self.drySamp[jJ].ranstate,
+                                WGSEED.subSeed( SeedDict["dryspell"], jJ ) )
+            WGSEED.reseedState( self.wetSamp[jJ].ranstate,
+                                WGSEED.subSeed( SeedDict["wetspell"], jJ ) )
+            WGSEED.reseedState( self.depthSamp[jJ].ranstate,
+                                WGSEED.subSeed( SeedDict["pdepth"], jJ ) )
+        # end of month for
+        # the error samplers all use the same seed
+        for eSamp in self.epsSamp:
+            WGSEED.reseedState( eSamp.ranstate, SeedDict["stdnorm"] )
+        # end for
+        for evCnt in range( 1, len( self.eventKeys ) + 1, 1 ):
+            WGSEED.reseedState( self.recurSamp[evCnt-1].ranstate,
+                WGSEED.subSeed( SeedDict["evrecur"], evCnt, int_offset=evCnt ) )
+            WGSEED.reseedState( self.magSamp[evCnt-1].ranstate,
+                WGSEED.subSeed( SeedDict["evmag"], evCnt, int_offset=evCnt ) )
+        # end of custom event for
+        WGSEED.reseedState( self.startSamp.ranstate, SeedDict["pdstart"] )
+        WGSEED.reseedState( self.dryBulkSamp.ranstate, SeedDict["dryspell"] )
+        WGSEED.reseedState( self.wetBulkSamp.ranstate, SeedDict["wetspell"] )
+        WGSEED.reseedState( self.depthBulkSamp.ranstate, SeedDict["pdepth"] )
+        # buffers need to start empty for the new streams
+        self.buffers = None
+        if buffered:
+            self.buffers = dict()
+            for jJ in MONTH_INTS:
+                self.buffers[jJ] = (
+                    WGDS.BufferedStream( self.dryDists[jJ].ranArray,
+                                         self.drySamp[jJ].ranstate,
+                                         block_size=block_size ),
+                    WGDS.BufferedStream( self.wetDists[jJ].ranArray,
+                                         self.wetSamp[jJ].ranstate,
+                                         block_size=block_size ),
+                    WGDS.BufferedStream( self.depthDists[jJ].rawArray,
+                                         self.depthSamp[jJ].ranstate,
+                                         block_size=block_size ), )
+            # end of month for
+        # end if
+
+    def setTrackers( self, mon ):
+        """Start the spell length, precipitation depth, and error trackers
+        with a first sample of every month.
+
+        Args:
+            mon (int): starting month
+
+        """
+        self.stDrySpell = dict()
+        self.stWetSpell = dict()
+        self.stPDepth = dict()
+        self.sampleAll( mon )
+        self.updateTracker()
+
+    def sampleAll( self, mon, current_only=False ):
+        """Sample the spell lengths and precipitation depths for a day
+
+        Args:
+            mon (int): current month
+
+        KWargs:
+            current_only (bool): only sample, and advance the stream for,
+                        the current month. Only the current month values
+                        are used in the simulation so this gives the same
+                        distributions with 1/12 of the sampling. The
+                        streams are advanced differently so realizations
+                        are not identical to the default.
+
+        """
+        if current_only:
+            MonthInts = [ mon ]
+        else:
+            MonthInts = MONTH_INTS
+        # end if
+        if self.buffers is not None:
+            maxPP = WGPD.MON_MAX_PP[mon]
+            for jJ in MonthInts:
+                dryBuf, wetBuf, depBuf = self.buffers[jJ]
+                self.stDrySpell[jJ] = dryBuf.next()
+                self.stWetSpell[jJ] = wetBuf.next()
+                pVal = depBuf.next()
+                if pVal > maxPP:
+                    pVal = maxPP
+                # end if
+                if pVal < WGPD.WD_THRESH:
+                    pVal = WGPD.WD_THRESH
+                # end if
+                self.stPDepth[jJ] = pVal
+            # end of month for
+            return
+        # end if
+        for jJ in MonthInts:
+            self.stDrySpell[jJ] = self.dryDists[jJ].ranval1(
+                                        self.drySamp[jJ].ranstate )
+            self.stWetSpell[jJ] = self.wetDists[jJ].ranval1(
+                                        self.wetSamp[jJ].ranstate )
+        # end of month for
+        for kK in MonthInts:
+            self.stPDepth[kK] = self.depthDists[kK].ranval1(
+                                        self.depthSamp[kK].ranstate, mon )
+        # end of month for
+
+    def updateTracker( self ):
+        """Sample the error terms for a day. Values that are not finite
+        are replaced with 0.25."""
+        for iI in range( WGOW.NUM_OTHER ):
+            self.epsi2[0, iI] = self.epsDists[iI].ranval1(
+                                        self.epsSamp[iI].ranstate )
+        # end for
+        self.epsi2 = np.where( np.isnan( self.epsi2 ), 0.25, self.epsi2 )
+        self.epsi2 = np.where( np.isinf( self.epsi2 ), 0.25, self.epsi2 )
+
+    def startWet( self ):
+        """Sample the starting state, True for wet"""
+        return self.startSamp.getSingleVal() > 0.5
+
+    def setEventTrackers( self, TotDays ):
+        """Draw the custom event schedules for the simulation period and
+        start the event timeline. See EAAWG_Events.EventTimeline.
+
+        Args:
+            TotDays (int): total number of days in realization
+
+        """
+        self.timeline.start( [ x.ranstate for x in self.recurSamp ],
+                             [ x.ranstate for x in self.magSamp ], TotDays )
+
+    def createOutputs( self, TotDays ):
+        """Create a new, zeroed, H0 output array. A new array is made for
+        each realization because queued writes may still use the last one."""
+        self.H0_REAL = np.zeros( ( TotDays, WGHRR.TOT_VALS ), dtype=np.float32 )
+
+    def assignDryDep( self, tIndex ):
+        """Assign a dry day"""
+        self.H0_REAL[tIndex, WGHRR.PRE_IND] = 0.0
+
+    def assignWetDep( self, tIndex, pVal ):
+        """Assign a wet day precipitation depth"""
+        self.H0_REAL[tIndex, WGHRR.PRE_IND] = pVal
+
+
+#EOF
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: EAAWG_Schedule
+   :platform: Windows, Linux
+   :synopsis: Dynamic scheduling of realizations over the process pool
+
+.. moduleauthor:: Nick Martin <nick.martin@alumni.stanford.edu>
+
+Realizations are sent to the pool in chunks that are sized as the run
+goes. The first chunks are single realizations to measure the time per
+realization. After that each chunk is sized to take about
+TARGET_CHUNK_SECONDS, which keeps the pool overhead small for fast
+realizations, but never more than the remaining realizations divided by
+CHUNK_FACTOR times the number of workers. Chunks get smaller toward the
+end of the run so that the workers finish at about the same time rather
+than leaving a few long chunks running on an otherwise idle pool.
+
+Chunks are returned as they finish, in any order, and the completion is
+reported while the run progresses. The results are put back in task order
+before returning.
+
+"""
+# Copyright and License
+"""
+Copyright 2023 Southwest Research Institute
+
+Module Author: Nick Martin <nick.martin@alumni.stanford.edu>
+
+This file is part of a custom weather generator framework with extreme events,
+hereafter WG Framework.
+
+WG Framework is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+WG Framework is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+# imports
+import math
+import os
+import time
+import queue
+from collections import deque
+import EAAWG_Writer as WGWR
+import EAAWG_Profile as WGPRF
+
+# parameters
+TARGET_CHUNK_SECONDS = 2.0
+"""Target run time for a chunk of realizations, in seconds"""
+CHUNK_FACTOR = 2
+"""Chunks in flight per worker, and the divisor for the remaining
+realizations when sizing a chunk"""
+TIME_WEIGHT = 0.2
+"""Weight of the newest realization time in the moving average"""
+
+
+#--------------------------------------------------------------------------
+# custom classes
+class ChunkSizer(object):
+    """Chunk sizes from the measured time per realization
+    """
+
+    def __init__( self, numProc, chunk_size=None ):
+        """Default initialization method
+
+        Args:
+            numProc (int): number of worker processes
+
+        KWargs:
+            chunk_size (int): fixed chunk size, None for adaptive
+
+        """
+        super().__init__()
+        self.numProc = max( int( numProc ), 1 )
+        self.fixedSize = chunk_size
+        self.aveTime = None
+        """Moving average run time per realization, in seconds"""
+
+    def record( self, elapsed ):
+        """Add a measured realization run time, in seconds"""
+        if self.aveTime is None:
+            self.aveTime = elapsed
+        else:
+            self.aveTime = ( ( 1.0 - TIME_WEIGHT ) * self.aveTime ) + \
+                           ( TIME_WEIGHT * elapsed )
+        # end if
+
+    def nextSize( self, numLeft ):
+        """Size of the next chunk
+
+        Args:
+            numLeft (int): number of realizations not yet sent to the pool
+
+        Returns:
+            int: chunk size
+
+        """
+        if self.fixedSize is not None:
+            return max( min( int( self.fixedSize ), numLeft ), 1 )
+        # end if
+        if self.aveTime is None:
+            return 1
+        # end if
+        timeSize = int( TARGET_CHUNK_SECONDS / max( self.aveTime, 1.0e-6 ) )
+        tailSize = math.ceil( numLeft / ( CHUNK_FACTOR * self.numProc ) )
+        # return
+        return max( min( timeSize, tailSize ), 1 )
+
+
+#--------------------------------------------------------------------------
+# functions
+def runChunk( WorkerFunc, ChunkTasks ):
+    """Run a chunk of tasks in a worker process. Waits for the background
+    output writes so that the chunk's outputs are complete on return.
+
+    Args:
+        WorkerFunc (function): realization worker function
+        ChunkTasks (list): (task index, argument tuple) for each task
+
+    Returns:
+        list: (task index, worker return, run time in seconds, worker
+              process id, phase times) for each task. Phase times are None
+              unless profiling, see EAAWG_Profile.
+
+    """
+    # start
+    ChunkOut = list()
+    for tIndex, tArgs in ChunkTasks:
+        tStart = time.perf_counter()
+        tRes = WorkerFunc( *tArgs )
+        ChunkOut.append( ( tIndex, tRes, time.perf_counter() - tStart,
+                           os.getpid(), WGPRF.takeTimes() ) )
+    # end for
+    WGWR.flushWriter( )
+    # writes that finished after the last task go with it
+    lastTimes = ChunkOut[-1][4]
+    if lastTimes is not None:
+        WGPRF.addTimes( lastTimes, WGPRF.takeTimes() )
+    # end if
+    # return
+    return ChunkOut
+
+
+def printProgress( numDone, numTasks, elapsed ):
+    """Default progress report, one line per completed chunk
+
+    Args:
+        numDone (int): number of completed tasks
+        numTasks (int): total number of tasks
+        elapsed (float): seconds since the start of the run
+
+    """
+    if numDone < numTasks:
+        estLeft = elapsed * ( ( numTasks / numDone ) - 1.0 )
+        print("Completed %d of %d realizations, %.1f s elapsed, about "
+              "%.1f s left" % ( numDone, numTasks, elapsed, estLeft ),
+              flush=True )
+    else:
+        print("Completed %d of %d realizations in %.1f s" %
+              ( numDone, numTasks, elapsed ), flush=True )
+    # end if
+
+
+def runTasks( pool, numProc, WorkerFunc, AllArgs, chunk_size=None,
+              progress=printProgress, on_result=None, on_profile=None,
+              task_sizes=None ):
+    """Run all of the tasks over the pool with dynamic chunk sizes. Replaces
+    pool.starmap( WorkerFunc, AllArgs ).
+
+    Args:
+        pool (multiprocessing.Pool): the process pool
+        numProc (int): number of processes in the pool
+        WorkerFunc (function): realization worker function
+        AllArgs (list): argument tuple for each task
+
+    KWargs:
+        chunk_size (int): fixed chunk size, None for adaptive
+        progress (function): called as progress( numDone, numTasks,
+                             elapsed ) after each chunk, None for no
+                             reporting
+        on_result (function): called as on_result( task index, worker
+                             return ) for each task as its chunk finishes,
+                             None to skip
+        on_profile (function): called as on_profile( task index, worker
+                             process id, run time in seconds, phase times )
+                             for each task when profiling, None to skip
+        task_sizes (list): number of realizations in each task, so that
+                           progress counts realizations, None for one each
+
+    Returns:
+        list: worker returns in the order of AllArgs
+
+    """
+    # start
+    numTasks = len( AllArgs )
+    if task_sizes is None:
+        task_sizes = [ 1 ] * numTasks
+    # end if
+    numReals = sum( task_sizes )
+    sizer = ChunkSizer( numProc, chunk_size=chunk_size )
+    pending = deque( enumerate( AllArgs ) )
+    doneQ = queue.Queue()
+    results = [ None ] * numTasks
+    numDone = 0
+    inFlight = 0
+    runStart = time.perf_counter()
+    while ( len( pending ) > 0 ) or ( inFlight > 0 ):
+        # keep a few chunks queued for each worker
+        while ( len( pending ) > 0 ) and \
+                ( inFlight < ( CHUNK_FACTOR * numProc ) ):
+            cSize = sizer.nextSize( len( pending ) )
+            ChunkTasks = [ pending.popleft() for _ in range( cSize ) ]
+            pool.apply_async( runChunk, ( WorkerFunc, ChunkTasks ),
+                              callback=doneQ.put, error_callback=doneQ.put )
+            inFlight += 1
+        # end while
+        ChunkOut = doneQ.get()
+        inFlight -= 1
+        if isinstance( ChunkOut, BaseException ):
+            raise ChunkOut
+        # end if
+        for tIndex, tRes, tElapsed, tWorker, tTimes in ChunkOut:
+            results[tIndex] = tRes
+            sizer.record( tElapsed )
+            if on_result is not None:
+                on_result( tIndex, tRes )
+            # end if
+            if ( on_profile is not None ) and ( tTimes is not None ):
+                on_profile( tIndex, tWorker, tElapsed, tTimes )
+            # end if
+        # end for
+        numDone += sum( task_sizes[x[0]] for x in ChunkOut )
+        if progress is not None:
+            progress( numDone, numReals, time.perf_counter() - runStart )
+        # end if
+    # end while
+    # return
+    return results
+
+
+#EOF
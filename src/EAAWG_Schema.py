@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: EAAWG_Schema
+   :platform: Windows, Linux
+   :synopsis: Output schemas for the realization pickle files
+
+.. moduleauthor:: Nick Martin <nick.martin@alumni.stanford.edu>
+
+Realization pickle files are written with one of the SCHEMAS.
+
+  * full: the original float64 DataFrame with all of the output columns
+  * compact: only the PRIMITIVE_VARS, as float32. Tave_C, MonDelta_T, and
+    Def_mm are calculated from these when read.
+  * quantized: compact with Precip_mm stored as uint16 multiples of
+    PRECIP_QUANTUM. Falls back to float32 for a realization with a depth
+    too large for uint16.
+
+readRealization returns a pd.DataFrame for full files and a
+CompactRealization for the others. CompactRealization supports the column
+selection used by the collation and store readers and only calculates the
+derived columns that are asked for. toFrame gives the full DataFrame.
+
+Compact values are float32, the same as in the realization store, so
+collated results can differ from full files in the last digits.
+
+"""
+# Copyright and License
+"""
+Copyright 2023 Southwest Research Institute
+
+Module Author: Nick Martin <nick.martin@alumni.stanford.edu>
+
+This file is part of a custom weather generator framework with extreme events,
+hereafter WG Framework.
+
+WG Framework is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+WG Framework is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+# imports
+import numpy as np
+import pandas as pd
+import EAAWG_Codecs as WGCOD
+import EAAWG_Calendar as WGCAL
+
+# parameters
+SCHEMAS = [ "full", "compact", "quantized" ]
+"""Realization file schemas"""
+DEF_SCHEMA = "full"
+"""Default realization file schema"""
+FULL_VARS = [ "Tmax_C", "Tmin_C", "Precip_mm", "Tave_C", "MonDelta_T",
+              "ETo_mm", "Def_mm" ]
+"""Columns, in order, of a full realization DataFrame"""
+PRIMITIVE_VARS = [ "Tmax_C", "Tmin_C", "Precip_mm", "ETo_mm" ]
+"""Columns stored in compact realization files"""
+PRECIP_QUANTUM = 0.01
+"""Precipitation depth resolution, in mm, for the quantized schema"""
+
+
+#--------------------------------------------------------------------------
+# custom classes
+class CompactRealization(object):
+    """Realization read from a compact file. Derived columns are calculated
+    on first access and kept.
+    """
+
+    def __init__( self, StoredDF ):
+        """Default initialization method
+
+        Args:
+            StoredDF (pd.DataFrame): compact DataFrame as stored
+
+        """
+        super().__init__()
+        self.index = StoredDF.index
+        self.columns = list( FULL_VARS )
+        self.values = dict()
+        """np.ndarray float64 column values, keyed by column name"""
+        pQuantum = StoredDF.attrs.get( "precip_quantum", None )
+        for varName in PRIMITIVE_VARS:
+            vArr = StoredDF[varName].to_numpy( dtype=np.float64 )
+            if ( varName == "Precip_mm" ) and ( pQuantum is not None ):
+                vArr = vArr * pQuantum
+            # end if
+            self.values[varName] = vArr
+        # end for
+
+    def getValues( self, varName ):
+        """Column values, calculating derived columns as needed
+
+        Args:
+            varName (str): column name, one of FULL_VARS
+
+        Returns:
+            np.ndarray: float64 values
+
+        """
+        if varName in self.values:
+            return self.values[varName]
+        # end if
+        if varName == "Tave_C":
+            vArr = 0.5 * ( self.values["Tmax_C"] + self.values["Tmin_C"] )
+        elif varName == "Def_mm":
+            vArr = self.values["Precip_mm"] - self.values["ETo_mm"]
+        elif varName == "MonDelta_T":
+            MonCodes = WGCAL.getCalendar( self.index[0],
+                                          self.index[-1] ).monCode
+            MonCounts = np.bincount( MonCodes )
+            MonDelta = ( np.bincount( MonCodes, weights=self.values["Tmax_C"] ) -
+                         np.bincount( MonCodes, weights=self.values["Tmin_C"] ) ) / \
+                       MonCounts
+            vArr = MonDelta[MonCodes]
+        else:
+            raise KeyError( varName )
+        # end if
+        self.values[varName] = vArr
+        return vArr
+
+    def __getitem__( self, key ):
+        """Column selection like a DataFrame, a pd.Series for a column name
+        or a pd.DataFrame for a list of names"""
+        if isinstance( key, str ):
+            return pd.Series( self.getValues( key ), index=self.index,
+                              name=key )
+        # end if
+        return pd.DataFrame( { x : self.getValues( x ) for x in key },
+                             index=self.index )
+
+    def __len__( self ):
+        return len( self.index )
+
+    def toFrame( self ):
+        """Full realization DataFrame, like a full schema file"""
+        return self[self.columns]
+
+
+#--------------------------------------------------------------------------
+# functions
+def compactFrame( H0DF, schema="compact" ):
+    """Compact DataFrame to store for a realization
+
+    Args:
+        H0DF (pd.DataFrame): full realization outputs
+
+    KWargs:
+        schema (str): "compact" or "quantized"
+
+    Returns:
+        pd.DataFrame: primitive columns with the schema in attrs
+
+    """
+    # start
+    CompDF = pd.DataFrame( { x : H0DF[x].to_numpy( dtype=np.float32 )
+                             for x in PRIMITIVE_VARS }, index=H0DF.index )
+    CompDF.attrs["schema"] = schema
+    if schema == "quantized":
+        qArr = np.rint( H0DF["Precip_mm"].to_numpy() / PRECIP_QUANTUM )
+        if ( qArr.min() >= 0 ) and ( qArr.max() <= np.iinfo( np.uint16 ).max ):
+            CompDF["Precip_mm"] = qArr.astype( np.uint16 )
+            CompDF.attrs["precip_quantum"] = PRECIP_QUANTUM
+        # end if
+    # end if
+    # return
+    return CompDF
+
+
+def writeRealization( H0DF, OutFP, schema=DEF_SCHEMA, codec=WGCOD.DEF_CODEC ):
+    """Write a realization file
+
+    Args:
+        H0DF (pd.DataFrame): full realization outputs
+        OutFP (str): file path
+
+    KWargs:
+        schema (str): one of SCHEMAS
+        codec (str): one of EAAWG_Codecs.CODECS
+
+    Returns:
+        None.
+
+    """
+    if schema != "full":
+        H0DF = compactFrame( H0DF, schema=schema )
+    # end if
+    WGCOD.writeRealPickle( H0DF, OutFP, codec=codec )
+    # return
+    return
+
+
+def readRealization( InFP ):
+    """Read a realization file of any schema and codec
+
+    Args:
+        InFP (str): file path
+
+    Returns:
+        pd.DataFrame or CompactRealization: realization outputs
+
+    """
+    StoredDF = WGCOD.readRealPickle( InFP )
+    if StoredDF.attrs.get( "schema", "full" ) == "full":
+        return StoredDF
+    # end if
+    # return
+    return CompactRealization( StoredDF )
+
+
+#EOF
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: EAAWG_Seeds
+   :platform: Windows, Linux
+   :synopsis: Random stream seeding for realizations
+
+.. moduleauthor:: Nick Martin <nick.martin@alumni.stanford.edu>
+
+Two seeding modes are provided.
+
+"legacy" is the original approach. Each sampler family has a base seed
+and the realization number is added to it, so realization streams overlap
+in seed space with neighbouring realizations and sampler families.
+
+"philox" uses counter based streams. A Philox key is generated once per
+basin from a np.random.SeedSequence of the root seed and the basin label.
+Each (realization, stream, sub-stream) then gets its own block of the
+Philox counter space, with the realization number in the most significant
+counter word. Streams only depend on these integers so results are
+identical regardless of the number of processes, the chunk size, or how
+the realizations are split into runs, and creating a stream is only the
+construction of a np.random.Philox object.
+
+"""
+# Copyright and License
+"""
+Copyright 2023 Southwest Research Institute
+
+Module Author: Nick Martin <nick.martin@alumni.stanford.edu>
+
+This file is part of a custom weather generator framework with extreme events,
+hereafter WG Framework.
+
+WG Framework is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+WG Framework is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+# imports
+import zlib
+import numpy as np
+import EAAWG_Inputs as WGI
+
+# module level variables
+SEEDING_MODES = [ "legacy", "philox" ]
+"""Available seeding modes"""
+SEEDING = "legacy"
+"""Current seeding mode"""
+ROOT_SEED = int( 20230815 )
+"""Root entropy for counter based streams"""
+STREAM_IDS = { "stdnorm" : 1,
+               "pdepth" : 2,
+               "wetspell" : 3,
+               "dryspell" : 4,
+               "evrecur" : 5,
+               "evmag" : 6,
+               "pdstart" : 7,
+               "lanes" : 8, }
+"""Counter word identifying each random stream family. Do not renumber,
+streams are only reproducible while these stay the same."""
+REAL_STREAMS = [ "stdnorm", "pdepth", "wetspell", "dryspell", "evrecur",
+                 "evmag", "pdstart" ]
+"""Stream families seeded for each realization. "lanes" is one stream for
+a group of realizations, see laneGroupGenerator."""
+PHILOX_KEY = None
+"""Philox key for the current basin and root seed"""
+
+
+#--------------------------------------------------------------------------
+# custom classes
+class StreamSeed(object):
+    """Seed for one stream family of one realization with counter based
+    seeding. Sub-streams, like months or event types, are independent
+    blocks of the stream family.
+    """
+
+    def __init__( self, realNum, stream ):
+        """Default initialization method
+
+        Args:
+            realNum (int): realization number
+            stream (str): stream family, key in STREAM_IDS
+
+        """
+        super().__init__()
+        self.realNum = int( realNum )
+        self.stream = stream
+        self.streamID = STREAM_IDS[stream]
+
+    def bitGenerator( self, sub=0 ):
+        """Create the Philox bit generator for a sub-stream
+
+        KWargs:
+            sub (int): sub-stream index
+
+        Returns:
+            np.random.Philox: bit generator positioned at the start of the
+                              sub-stream
+
+        """
+        counter = np.array( [ 0, sub, self.streamID, self.realNum ],
+                            dtype=np.uint64 )
+        return np.random.Philox( key=getPhiloxKey(), counter=counter )
+
+
+#--------------------------------------------------------------------------
+# functions
+def setSeeding( mode, root_seed=None ):
+    """Set the seeding mode for this process
+
+    Args:
+        mode (str): "legacy" or "philox"
+
+    KWargs:
+        root_seed (int): root entropy for counter based streams, defaults
+                         to ROOT_SEED
+
+    """
+    # globals
+    global SEEDING, ROOT_SEED, PHILOX_KEY
+    # start
+    if mode not in SEEDING_MODES:
+        errMsg = "Unknown seeding mode %s. Must be one of %s" % \
+                 ( mode, SEEDING_MODES )
+        raise ValueError( errMsg )
+    # end if
+    SEEDING = mode
+    if root_seed is not None:
+        ROOT_SEED = int( root_seed )
+    # end if
+    PHILOX_KEY = None
+    # end
+    return
+
+
+def getPhiloxKey():
+    """Philox key for the current basin, generated once per process
+
+    Returns:
+        np.ndarray: (2,) uint64 key
+
+    """
+    # globals
+    global PHILOX_KEY
+    # start
+    if PHILOX_KEY is None:
+        basinKey = zlib.crc32( WGI.OUT_LABEL.encode( "utf-8" ) )
+        sSeq = np.random.SeedSequence( entropy=[ ROOT_SEED, basinKey ] )
+        PHILOX_KEY = sSeq.generate_state( 2, dtype=np.uint64 )
+    # end if
+    # return
+    return PHILOX_KEY
+
+
+def realizationSeeds( RealNum, SNSeed, PDSeed, WSLSeed, DSLSeed, EVRecurSeed,
+                      EVMagSeed ):
+    """Seeds for all of the stream families of a realization
+
+    Args:
+        RealNum (int): realization number
+        SNSeed (int): base seed for the standard normal sampler
+        PDSeed (int): the precipitation depth sampler seed
+        WSLSeed (int): wet state spell length sampling seed
+        DSLSeed (int): dry state spell length sampling seed
+        EVRecurSeed(int): event recurrence interval sampling seed
+        EVMagSeed(int): event magnitude sampling seed
+
+    Returns:
+        dict: seed, int for legacy or StreamSeed for philox, keyed by the
+              stream family names in STREAM_IDS
+
+    """
+    # start
+    if SEEDING == "philox":
+        seedDict = dict()
+        for stream in REAL_STREAMS:
+            seedDict[stream] = StreamSeed( RealNum, stream )
+        # end for
+    else:
+        seedDict = { "stdnorm" : SNSeed + RealNum,
+                     "pdepth" : PDSeed + RealNum,
+                     "wetspell" : WSLSeed + RealNum,
+                     "dryspell" : DSLSeed + RealNum,
+                     "evrecur" : EVRecurSeed + RealNum,
+                     "evmag" : EVMagSeed + RealNum,
+                     "pdstart" : PDSeed + RealNum - 1, }
+    # end if
+    # return
+    return seedDict
+
+
+def laneGroupGenerator( FirstReal, NumLanes, BaseSeeds ):
+    """Random generator shared by a group of realizations that are
+    simulated together, one per lane, see EAAWG_LaneSim. The stream depends
+    on the first realization number and the number of lanes so a group
+    gives the same realizations whatever process runs it.
+
+    Args:
+        FirstReal (int): first realization number of the group
+        NumLanes (int): number of realizations in the group
+        BaseSeeds (list): the six base seeds passed to the workers, used
+                          for legacy seeding
+
+    Returns:
+        np.random.Generator: the group generator
+
+    """
+    if SEEDING == "philox":
+        bitGen = StreamSeed( FirstReal, "lanes" ).bitGenerator( sub=NumLanes )
+    else:
+        bitGen = np.random.PCG64( [ int( x ) for x in BaseSeeds ] +
+                                  [ int( FirstReal ), int( NumLanes ) ] )
+    # end if
+    # return
+    return np.random.Generator( bitGen )
+
+
+def subSeed( seed, sub, int_offset=0 ):
+    """Seed for a sub-stream, like a month or an event type
+
+    Args:
+        seed (int or StreamSeed): seed for the stream family
+        sub (int): sub-stream index
+
+    KWargs:
+        int_offset (int): offset added to integer seeds
+
+    Returns:
+        int or np.random.Philox: the sub-stream seed
+
+    """
+    if isinstance( seed, StreamSeed ):
+        return seed.bitGenerator( sub=sub )
+    # return
+    return seed + int_offset
+
+
+def makeRandomState( seed, backend ):
+    """Create the random state for a sampler
+
+    Args:
+        seed (int, StreamSeed, or np.random.BitGenerator): sampler seed
+        backend (str): "scipy" for a legacy np.random.RandomState used
+                       through SciPy distributions or "numpy" for a
+                       np.random.Generator sampled directly
+
+    Returns:
+        np.random.RandomState or np.random.Generator
+
+    """
+    if isinstance( seed, StreamSeed ):
+        seed = seed.bitGenerator()
+    elif ( SEEDING == "philox" ) and \
+            ( not isinstance( seed, np.random.BitGenerator ) ):
+        seed = np.random.Philox( seed )
+    # end if
+    if backend == "numpy":
+        return np.random.default_rng( seed=seed )
+    # return
+    return np.random.RandomState( seed=seed )
+
+
+def reseedState( ranstate, seed ):
+    """Reseed a random state in place. Objects holding a reference to the
+    random state, like buffered streams, stay valid.
+
+    Args:
+        ranstate (np.random.RandomState or np.random.Generator): random state
+        seed (int, StreamSeed, or np.random.BitGenerator): new seed. Bit
+                generators must be the same type as the one in ranstate.
+
+    """
+    if isinstance( seed, StreamSeed ):
+        seed = seed.bitGenerator()
+    # end if
+    if isinstance( ranstate, np.random.Generator ):
+        bitGen = ranstate.bit_generator
+        if not isinstance( seed, np.random.BitGenerator ):
+            seed = type( bitGen )( seed )
+        # end if
+        bitGen.state = seed.state
+    elif isinstance( seed, np.random.BitGenerator ):
+        ranstate.set_state( seed.state )
+    else:
+        ranstate.seed( seed )
+    # end if
+    # return
+    return
+
+
+#EOF
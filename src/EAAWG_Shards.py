@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: EAAWG_Shards
+   :platform: Windows, Linux
+   :synopsis: Split realizations into shards and merge the shard outputs
+
+.. moduleauthor:: Nick Martin <nick.martin@alumni.stanford.edu>
+
+A shard is a consecutive block of realizations run by one invocation of
+EAAWGmp, usually on its own node. Shards only remove and write their own
+outputs so that any number of them can share an outputs directory. Each
+finished shard writes a manifest with its realization range and run
+settings. The merge step checks that the manifests cover the realization
+set with no gaps or overlaps and with the same settings, checks that all
+outputs are present, and then assembles the basin outputs for collation.
+
+Realization streams only depend on the realization number, see
+EAAWG_Seeds, so a sharded run gives the same realizations as a single run.
+
+"""
+# Copyright and License
+"""
+Copyright 2023 Southwest Research Institute
+
+Module Author: Nick Martin <nick.martin@alumni.stanford.edu>
+
+This file is part of a custom weather generator framework with extreme events,
+hereafter WG Framework.
+
+WG Framework is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+WG Framework is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+# imports
+import os
+import re
+import glob
+import json
+import pickle
+import EAAWG_Inputs as WGI
+import EAAWG_RealStore as WGRS
+
+# parameters
+SHARD_MANIFEST_EXT = "_Manifest.json"
+"""File name ending for shard manifests"""
+SHARD_SUMMARY_EXT = "_Summaries.pickle"
+"""File name ending for the realization summaries calculated in a shard"""
+MERGE_BLOCK = 64
+"""Number of realizations copied at a time when merging shard stores"""
+
+
+#--------------------------------------------------------------------------
+# custom classes
+class ShardError(Exception):
+    """Custom exception error for shard and merge issues
+    """
+    def __init__(self, arg):
+        super().__init__( arg )
+
+
+#--------------------------------------------------------------------------
+# functions
+def outputDir():
+    """Directory for realization and shard outputs"""
+    return os.path.normpath( os.path.join( WGI.OUT_DIR, WGI.OUT_SUB_DIR ) )
+
+
+def shardLabel( StartReal, NumReal ):
+    """File label for a shard. Used for the shard store, manifest, and
+    summaries.
+
+    Args:
+        StartReal (int): first realization in the shard
+        NumReal (int): number of realizations in the shard
+
+    Returns:
+        str: label
+
+    """
+    return "%s_S%d-%d" % ( WGI.OUT_LABEL, StartReal, StartReal + NumReal - 1 )
+
+
+def shardPath( StartReal, NumReal, fileExt ):
+    """File path for a shard file with ending fileExt"""
+    return os.path.normpath( os.path.join( outputDir(), "%s%s" %
+                                           ( shardLabel( StartReal, NumReal ),
+                                             fileExt ) ) )
+
+
+def parseShard( shardStr ):
+    """Parse a shard specification
+
+    Args:
+        shardStr (str): "INDEX/COUNT" with INDEX from 1 to COUNT
+
+    Returns:
+        tuple: (shard index, shard count)
+
+    """
+    mObj = re.fullmatch( r"\s*(\d+)\s*/\s*(\d+)\s*", shardStr )
+    if mObj is None:
+        raise ValueError( "Shard must be INDEX/COUNT, not %s" % shardStr )
+    # end if
+    shardIndex = int( mObj.group(1) )
+    shardCount = int( mObj.group(2) )
+    if ( shardCount < 1 ) or ( shardIndex < 1 ) or ( shardIndex > shardCount ):
+        raise ValueError( "Shard index must be from 1 to COUNT, not %s" %
+                          shardStr )
+    # end if
+    # return
+    return shardIndex, shardCount
+
+
+def parseRealRange( rangeStr ):
+    """Parse an explicit realization range
+
+    Args:
+        rangeStr (str): "FIRST-LAST", inclusive
+
+    Returns:
+        tuple: (first realization, number of realizations)
+
+    """
+    mObj = re.fullmatch( r"\s*(\d+)\s*-\s*(\d+)\s*", rangeStr )
+    if mObj is None:
+        raise ValueError( "Realization range must be FIRST-LAST, not %s" %
+                          rangeStr )
+    # end if
+    firstReal = int( mObj.group(1) )
+    lastReal = int( mObj.group(2) )
+    if ( firstReal < 1 ) or ( lastReal < firstReal ):
+        raise ValueError( "Invalid realization range %s" % rangeStr )
+    # end if
+    # return
+    return firstReal, ( lastReal - firstReal + 1 )
+
+
+def shardRange( NumReal, shardIndex, shardCount, start_real=1 ):
+    """Consecutive block of realizations for a shard. Blocks differ in size
+    by at most one realization.
+
+    Args:
+        NumReal (int): total number of realizations over all shards
+        shardIndex (int): shard index, from 1 to shardCount
+        shardCount (int): number of shards
+
+    KWargs:
+        start_real (int): first realization of the complete set
+
+    Returns:
+        tuple: (first realization, number of realizations)
+
+    """
+    if shardCount > NumReal:
+        raise ValueError( "More shards, %d, than realizations, %d" %
+                          ( shardCount, NumReal ) )
+    # end if
+    baseCnt, extraCnt = divmod( NumReal, shardCount )
+    sIndex = shardIndex - 1
+    firstReal = start_real + ( sIndex * baseCnt ) + min( sIndex, extraCnt )
+    shardReal = baseCnt + ( 1 if sIndex < extraCnt else 0 )
+    # return
+    return firstReal, shardReal
+
+
+def delShardOutputs( StartReal, NumReal ):
+    """Delete previous outputs for only the realizations in this shard and
+    any previous files for the same shard.
+
+    Args:
+        StartReal (int): first realization in the shard
+        NumReal (int): number of realizations in the shard
+
+    Returns:
+        None.
+
+    """
+    # start
+    OutDir = outputDir()
+    RealPat = re.compile( r"^%s_R(\d+)_" % re.escape( WGI.OUT_LABEL ) )
+    ShardLab = shardLabel( StartReal, NumReal )
+    for fName in os.listdir( OutDir ):
+        mObj = RealPat.match( fName )
+        if mObj is not None:
+            if not ( StartReal <= int( mObj.group(1) ) < StartReal + NumReal ):
+                continue
+            # end if
+        elif not fName.startswith( "%s_" % ShardLab ):
+            continue
+        # end if
+        oldF = os.path.join( OutDir, fName )
+        try:
+            os.remove( oldF )
+        except OSError as e:
+            print("Error: %s : %s" % (oldF, e.strerror))
+        # end try
+    # end for
+    # return
+    return
+
+
+def writeJSON( OutFP, OutDict ):
+    """Write a JSON file so that readers never see a partial file"""
+    TmpFP = "%s.tmp" % OutFP
+    with open( TmpFP, 'w' ) as OF:
+        json.dump( OutDict, OF, indent=2 )
+    # end with
+    os.replace( TmpFP, OutFP )
+
+
+def writeShardOutputs( StartReal, NumReal, Settings, NumFails,
+                       summaries=None ):
+    """Write the shard manifest, and the summaries when calculated in the
+    workers. Call after all realizations in the shard have finished.
+
+    Args:
+        StartReal (int): first realization in the shard
+        NumReal (int): number of realizations in the shard
+        Settings (dict): run settings that must match for all shards
+        NumFails (int): number of failed realizations
+
+    KWargs:
+        summaries (list): realization summaries in realization order
+
+    Returns:
+        None.
+
+    """
+    # start
+    if summaries is not None:
+        SummFP = shardPath( StartReal, NumReal, SHARD_SUMMARY_EXT )
+        with open( "%s.tmp" % SummFP, 'wb' ) as OF:
+            pickle.dump( summaries, OF, protocol=pickle.HIGHEST_PROTOCOL )
+        # end with
+        os.replace( "%s.tmp" % SummFP, SummFP )
+    # end if
+    ManDict = { "label" : shardLabel( StartReal, NumReal ),
+                "first_real" : int( StartReal ),
+                "num_real" : int( NumReal ),
+                "num_fails" : int( NumFails ),
+                "has_summaries" : summaries is not None,
+                "settings" : Settings, }
+    writeJSON( shardPath( StartReal, NumReal, SHARD_MANIFEST_EXT ), ManDict )
+    # return
+    return
+
+
+def readManifests():
+    """Read all of the shard manifests in the outputs directory
+
+    Returns:
+        list: manifest dictionaries sorted by first realization
+
+    """
+    ManPat = os.path.join( outputDir(), "%s_S*%s" % ( WGI.OUT_LABEL,
+                                                      SHARD_MANIFEST_EXT ) )
+    ManList = list()
+    for ManFP in glob.glob( ManPat ):
+        with open( ManFP, 'r' ) as IF:
+            ManList.append( json.load( IF ) )
+        # end with
+    # end for
+    ManList.sort( key=lambda x: x["first_real"] )
+    # return
+    return ManList
+
+
+def validateShards( ManList, NumReal=None, start_real=1 ):
+    """Check that the shard manifests make up one complete run
+
+    Args:
+        ManList (list): manifests from readManifests
+
+    KWargs:
+        NumReal (int): expected total number of realizations. None to
+                       accept the range covered by the shards.
+        start_real (int): expected first realization
+
+    Returns:
+        tuple: (first realization, number of realizations, settings)
+
+    """
+    # start
+    if len( ManList ) < 1:
+        raise ShardError( "No shard manifests found in %s!!!" % outputDir() )
+    # end if
+    Settings = ManList[0]["settings"]
+    nextReal = start_real
+    for ManDict in ManList:
+        if ManDict["first_real"] != nextReal:
+            ErrorMsg = "Shard %s starts at realization %d, expected %d. " \
+                       "Shards have a gap or overlap!!!" % \
+                       ( ManDict["label"], ManDict["first_real"], nextReal )
+            raise ShardError( ErrorMsg )
+        # end if
+        if ManDict["num_fails"] != 0:
+            ErrorMsg = "Shard %s had %d failed realizations!!!" % \
+                       ( ManDict["label"], ManDict["num_fails"] )
+            raise ShardError( ErrorMsg )
+        # end if
+        if ManDict["settings"] != Settings:
+            ErrorMsg = "Shard %s was run with different settings than " \
+                       "shard %s!!!" % ( ManDict["label"], ManList[0]["label"] )
+            raise ShardError( ErrorMsg )
+        # end if
+        nextReal += ManDict["num_real"]
+    # end for
+    TotReal = nextReal - start_real
+    if ( NumReal is not None ) and ( TotReal != NumReal ):
+        ErrorMsg = "Shards cover %d realizations, expected %d. Missing " \
+                   "realizations start at %d!!!" % ( TotReal, NumReal, nextReal )
+        raise ShardError( ErrorMsg )
+    # end if
+    # return
+    return start_real, TotReal, Settings
+
+
+def mergeShards( NumReal=None, start_real=1 ):
+    """Validate the shards and assemble the basin realization set.
+
+    For store outputs the shard stores are copied into the basin store.
+    For pickle outputs the realization files are checked. Summaries
+    calculated in the shard workers are joined in realization order.
+
+    KWargs:
+        NumReal (int): expected total number of realizations. None to
+                       accept the range covered by the shards.
+        start_real (int): expected first realization
+
+    Returns:
+        tuple: (first realization, number of realizations, output format,
+               summaries list or None)
+
+    """
+    # start
+    ManList = readManifests()
+    FirstReal, TotReal, Settings = validateShards( ManList, NumReal=NumReal,
+                                                   start_real=start_real )
+    OutFormat = Settings["output"]
+    RealNums = list( range( FirstReal, FirstReal + TotReal, 1 ) )
+    if OutFormat == "store":
+        BasinStore = None
+        for ManDict in ManList:
+            try:
+                ShardStore = WGRS.RealizationStore( out_label=ManDict["label"] )
+            except WGRS.RealStoreError as e:
+                raise ShardError( "Shard %s: %s" % ( ManDict["label"], e ) )
+            # end try
+            if not ShardStore.isComplete():
+                ErrorMsg = "Shard store %s is missing realizations %s!!!" % \
+                           ( ManDict["label"], ShardStore.missingReals() )
+                raise ShardError( ErrorMsg )
+            # end if
+            if BasinStore is None:
+                WGRS.createStore( RealNums, ShardStore.DT_INDEX,
+                                  varNames=ShardStore.varNames )
+                BasinStore = WGRS.RealizationStore( mode='r+' )
+            # end if
+            sInd = BasinStore.realIndex( ShardStore.firstReal )
+            for bStart in range( 0, len( ShardStore.realNums ), MERGE_BLOCK ):
+                bEnd = min( bStart + MERGE_BLOCK, len( ShardStore.realNums ) )
+                BasinStore.data[sInd+bStart:sInd+bEnd, :, :] = \
+                    ShardStore.data[bStart:bEnd, :, :]
+            # end for
+            BasinStore.done[sInd:sInd+len( ShardStore.realNums )] = 1
+            del ShardStore
+        # end for
+        BasinStore.data.flush()
+        BasinStore.done.flush()
+        del BasinStore
+    elif OutFormat == "pickle":
+        MissList = [ x for x in RealNums if not os.path.isfile(
+                        os.path.join( outputDir(), "%s_R%d_DF.pickle" %
+                                      ( WGI.OUT_LABEL, x ) ) ) ]
+        if len( MissList ) > 0:
+            ErrorMsg = "Missing realization outputs %s!!!" % MissList
+            raise ShardError( ErrorMsg )
+        # end if
+    # end if
+    if all( x["has_summaries"] for x in ManList ):
+        Summaries = list()
+        for ManDict in ManList:
+            with open( shardPath( ManDict["first_real"], ManDict["num_real"],
+                                  SHARD_SUMMARY_EXT ), 'rb' ) as IF:
+                Summaries.extend( pickle.load( IF ) )
+            # end with
+        # end for
+    elif OutFormat == "none":
+        ErrorMsg = "Shards without outputs are also missing summaries!!!"
+        raise ShardError( ErrorMsg )
+    else:
+        Summaries = None
+    # end if
+    # return
+    return FirstReal, TotReal, OutFormat, Summaries
+
+
+#EOF
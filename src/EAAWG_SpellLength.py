@@ -34,6 +34,7 @@ along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
 
 # imports
 import numpy as np
+import EAAWG_Seeds as WGSEED
 from scipy import stats as scstats
 
 
@@ -69,12 +70,18 @@ class NegBinomial(object):
             ErrorMsg = "P greater >= 1.0 or <= 0.0!!!"
             raise CreateDistError( ErrorMsg )
         self.name = name
+        self.N = N
+        self.P = P
+        self.location = int( location )
         self.nbinom = scstats.nbinom( N, P, loc=location )
     
     def ranval1( self, rstate):
         """With the specified val between 0.0 and 1.0, which is essentially
         a probability, return the corresponding value from the cdf.
         
+        If rstate is a np.random.Generator, the value is drawn directly from
+        the Generator rather than through the SciPy distribution.
+        
         Args:
             rstate (np.random_state): the random state for the sampler
             
@@ -82,6 +89,9 @@ class NegBinomial(object):
             numd (int): the sampled number of days for the spell length
             
         """
+        if isinstance( rstate, np.random.Generator ):
+            return int( rstate.negative_binomial( self.N, self.P ) ) + self.location
+        # end if
         numda = self.nbinom.rvs( size=1, random_state=rstate )
         numd = numda[0]
         return numd
@@ -97,6 +107,10 @@ class NegBinomial(object):
             numda (np.array): the corresponding array of spell lengths
             
         """
+        if isinstance( rstate, np.random.Generator ):
+            numda = rstate.negative_binomial( self.N, self.P, size=asize ) 
+            return numda + self.location
+        # end if
         numda = self.nbinom.rvs( size=asize, random_state=rstate )
         return numda
 
@@ -107,10 +121,18 @@ class WetStateSampler(object):
     random.uniform distribution to draw the random numbers.
     """
     
-    def __init__( self, wet_state_seed=None ):
-        """Default initialization method"""
+    def __init__( self, wet_state_seed=None, backend="scipy" ):
+        """Default initialization method
+        
+        KWargs:
+            wet_state_seed (int): the seed to use for the sampler
+            backend (str): "scipy" for a legacy np.random.RandomState used
+                           through SciPy distributions or "numpy" for a 
+                           np.random.Generator sampled directly
+
+        """
         super().__init__()
-        self.ranstate = np.random.RandomState(seed=wet_state_seed)
+        self.ranstate = WGSEED.makeRandomState( wet_state_seed, backend )
     
     def getSingleVal( self, ):
         """Produce a single value from the random sampler from a uniform
@@ -129,10 +151,18 @@ class DryStateSampler(object):
     random.uniform distribution to draw the random numbers.
     """
     
-    def __init__( self, dry_state_seed=None ):
-        """Default initialization method"""
+    def __init__( self, dry_state_seed=None, backend="scipy" ):
+        """Default initialization method
+        
+        KWargs:
+            dry_state_seed (int): the seed to use for the sampler
+            backend (str): "scipy" for a legacy np.random.RandomState used
+                           through SciPy distributions or "numpy" for a 
+                           np.random.Generator sampled directly
+
+        """
         super().__init__()
-        self.ranstate = np.random.RandomState(seed=dry_state_seed)
+        self.ranstate = WGSEED.makeRandomState( dry_state_seed, backend )
     
     def getSingleVal( self, ):
         """Produce a single value from the random sampler from a uniform
@@ -34,6 +34,7 @@ along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
 
 # imports
 import numpy as np
+import EAAWG_Seeds as WGSEED
 from scipy import stats as scstats
 from EAAWG_PrecipDepth import CreateDistError
 
@@ -54,6 +55,8 @@ class StdNormal(object):
             ErrorMsg = "scale must be a number!!!"
             raise CreateDistError( ErrorMsg )
         self.name = name
+        self.loc = float( loc )
+        self.scale = float( scale )
         self.stnorm = scstats.norm( loc=loc, scale=scale )
     
     def ranval1( self, rstate):
@@ -66,6 +69,9 @@ class StdNormal(object):
             numd (int): the sampled number of days for the spell length
             
         """
+        if isinstance( rstate, np.random.Generator ):
+            return ( rstate.standard_normal() * self.scale ) + self.loc
+        # end if
         numda = self.stnorm.rvs( size=1, random_state=rstate )
         numd = numda[0]
         return numd
@@ -81,6 +87,9 @@ class StdNormal(object):
             numda (np.array): the corresponding array of spell lengths
             
         """
+        if isinstance( rstate, np.random.Generator ):
+            return ( rstate.standard_normal( size=asize ) * self.scale ) + self.loc
+        # end if
         numda = self.stnorm.rvs( size=asize, random_state=rstate )
         return numda
 
@@ -91,15 +100,18 @@ class ErrorTSampler(object):
     random.uniform distribution to draw the random numbers.
     """
     
-    def __init__( self, seed=None ):
+    def __init__( self, seed=None, backend="scipy" ):
         """Default initialization method
         
         Kwargs:
             seed (int): default is none but sets the seed for the object
+            backend (str): "scipy" for a legacy np.random.RandomState used
+                           through SciPy distributions or "numpy" for a 
+                           np.random.Generator sampled directly
 
         """
         super().__init__()
-        self.ranstate = np.random.RandomState(seed=seed)
+        self.ranstate = WGSEED.makeRandomState( seed, backend )
     
     def getSingleVal( self, ):
         """Produce a single value from the random sampler from a uniform
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: EAAWG_Writer
+   :platform: Windows, Linux
+   :synopsis: Background output writing in the worker processes
+
+.. moduleauthor:: Nick Martin <nick.martin@alumni.stanford.edu>
+
+Realization outputs are handed to writer threads in the worker process so
+that compression and file system latency overlap with the simulation of the
+next realization. Zip compression and file writes release the GIL, so a
+writer thread runs alongside the simulation.
+
+The write queue is bounded. When the writers fall behind, the worker
+blocks on submitWrite until a slot frees up, which keeps the number of
+realizations held in memory small. Each write job has its file paths, or
+store, bound when it is submitted, so switching basins with jobs still in
+the queue is safe.
+
+flushWriter waits for the queued writes and raises the first write error.
+EAAWG_Schedule.runChunk calls it at the end of each chunk, so outputs are
+complete on disk before the main process sees the chunk's results.
+
+"""
+# Copyright and License
+"""
+Copyright 2023 Southwest Research Institute
+
+Module Author: Nick Martin <nick.martin@alumni.stanford.edu>
+
+This file is part of a custom weather generator framework with extreme events,
+hereafter WG Framework.
+
+WG Framework is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+WG Framework is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+# imports
+import os
+import queue
+import threading
+import EAAWG_Profile as WGPRF
+
+# parameters
+NUM_WRITERS = 1
+"""Default number of writer threads per process. 0 writes in the worker."""
+WRITE_QUEUE_SIZE = 4
+"""Most write jobs waiting in the queue before submitWrite blocks"""
+
+# module level variables
+WRITERS = 0
+"""Writer threads for this process"""
+WRITE_QUEUE = None
+"""Queue of write jobs for this process"""
+WRITER_THREADS = list()
+"""Running writer threads"""
+WRITER_PID = None
+"""Process that started the writer threads. Threads do not survive a fork."""
+WRITE_ERRORS = list()
+"""Exceptions raised by write jobs since the last flush"""
+
+
+#--------------------------------------------------------------------------
+# functions
+def writerLoop( jobQ ):
+    """Writer thread. Runs write jobs until the process ends."""
+    while True:
+        wFunc, wArgs, wKWargs = jobQ.get()
+        tStart = WGPRF.startPhase()
+        try:
+            wFunc( *wArgs, **wKWargs )
+        except Exception as e:
+            WRITE_ERRORS.append( e )
+        finally:
+            WGPRF.endPhase( "write", tStart )
+            jobQ.task_done()
+        # end try
+    # end while
+
+
+def setWriters( numWriters ):
+    """Set the number of writer threads for this process. Threads are
+    started on first use and only once per process.
+
+    Args:
+        numWriters (int): writer threads, 0 to write in the worker
+
+    Returns:
+        None.
+
+    """
+    # globals
+    global WRITERS, WRITE_QUEUE, WRITER_THREADS, WRITER_PID
+    # start
+    numWriters = max( int( numWriters ), 0 )
+    if ( numWriters == WRITERS ) and ( WRITER_PID == os.getpid() ):
+        return
+    # end if
+    if ( WRITE_QUEUE is not None ) and ( WRITER_PID == os.getpid() ):
+        flushWriter()
+    # end if
+    WRITERS = numWriters
+    WRITE_QUEUE = None
+    WRITER_THREADS = list()
+    WRITER_PID = os.getpid()
+    if numWriters < 1:
+        return
+    # end if
+    WRITE_QUEUE = queue.Queue( maxsize=WRITE_QUEUE_SIZE )
+    for _ in range( numWriters ):
+        wThread = threading.Thread( target=writerLoop, args=( WRITE_QUEUE, ),
+                                    daemon=True )
+        wThread.start()
+        WRITER_THREADS.append( wThread )
+    # end for
+    # return
+    return
+
+
+def submitWrite( wFunc, *wArgs, **wKWargs ):
+    """Queue a write job, or run it now when there are no writer threads.
+    Blocks while the queue is full.
+
+    Args:
+        wFunc (function): write function, called as wFunc( *wArgs,
+                          **wKWargs )
+
+    Returns:
+        None.
+
+    """
+    if ( WRITE_QUEUE is None ) or ( WRITER_PID != os.getpid() ):
+        with WGPRF.phase( "write" ):
+            wFunc( *wArgs, **wKWargs )
+        # end with
+    else:
+        with WGPRF.phase( "write_wait" ):
+            WRITE_QUEUE.put( ( wFunc, wArgs, wKWargs ) )
+        # end with
+    # end if
+    # return
+    return
+
+
+def flushWriter( ):
+    """Wait for all queued writes to finish. Raises the first write error
+    since the last flush.
+
+    Returns:
+        None.
+
+    """
+    # start
+    if ( WRITE_QUEUE is not None ) and ( WRITER_PID == os.getpid() ):
+        with WGPRF.phase( "write_wait" ):
+            WRITE_QUEUE.join()
+        # end with
+    # end if
+    if len( WRITE_ERRORS ) > 0:
+        wErr = WRITE_ERRORS[0]
+        WRITE_ERRORS.clear()
+        raise wErr
+    # end if
+    # return
+    return
+
+
+def writeText( OutFP, OutText ):
+    """Write a text file"""
+    with open( OutFP, 'w' ) as OF:
+        OF.write( OutText )
+    # end with
+
+
+#EOF
@@ -9,7 +9,74 @@
 python EAAWGmp.py 10 --num_real 1000
 
 10 workers and 1000 realizations. Chunk size sets the number that go to a 
-worker at a time
+worker at a time. By default chunks are sized as the run goes, from the
+measured time per realization, and progress is printed as chunks finish.
+--chunk_size 5 gives fixed chunks.
+
+python EAAWGmp.py 10 --num_real 1000 --engine array
+
+Same as above but each realization is simulated with the bulk array engine
+in EAAWG_ArraySim rather than the day by day loop.
+
+python EAAWGmp.py 10 --num_real 1000 --engine array --spells runs
+
+Array engine with one spell length draw per wet or dry spell, expanded to
+days, rather than spell lengths drawn for every day, see
+EAAWG_ArraySim.calcSpellRuns.
+
+python EAAWGmp.py 10 --num_real 1024 --engine lanes --backend numpy --lanes 128
+
+Groups of 128 realizations simulated together, one per lane, with a shared
+random generator for each group, see EAAWG_LaneSim. Realizations are not
+the same as with the other engines, and depend on the number of lanes. A
+run that is not a multiple of the lanes still simulates the whole of its
+last group.
+
+python EAAWGmp.py 10 --num_real 168 --summarize --output none
+
+PEST calibration run. Each worker calculates the collation summary for its
+realizations and returns it through the pool. No daily outputs are written
+or read back.
+
+python EAAWGmp.py 10 --num_real 10000 --shard 3/20 --output store
+
+Shard 3 of 20 for a 10,000 realization run, realizations 1001 through 1500.
+Only this shard's outputs are removed and written, so shards can run on
+separate nodes that share the outputs directory. --reals 1001-1500 gives an
+explicit range instead.
+
+python EAAWGmp.py 1 --num_real 10000 --merge
+
+After all shards finish, check that the shards make up the complete
+realization set, assemble the basin outputs, and write CollOuts.dat.
+
+python EAAWGmp.py 10 --num_real 1000 --seeding philox
+
+Counter based random streams per realization, see EAAWG_Seeds. Results for
+a realization are the same for any number of workers, chunk size, or
+START_REAL split.
+
+python EAAWGmp.py 10 --num_real 1000 --resume
+
+Restart a run that was stopped. Realizations recorded as finished in the
+run checkpoint, with matching seeds and output hashes, are kept and only the
+rest are simulated, see EAAWG_Checkpoint.
+
+python EAAWGmp.py 10 --num_real 1000 --codec none
+
+Write the realization pickles uncompressed, much faster to write and read
+than the default zip. See EAAWG_Codecs for the codecs and a benchmark.
+--schema compact stores only the primitive series as float32, see
+EAAWG_Schema.
+
+python EAAWGmp.py 10 --num_real 100 --profile
+
+Time each phase of the realizations in the workers and write the phase
+totals, by worker and by task, to Frio_Profile.txt and Frio_Profile.json
+in the outputs directory, see EAAWG_Profile.
+
+Several basins are run together with EAAWG_Batch.py, which shares one pool
+across the basins in a basin configuration table.
 
 Main will simulate from START_REAL to START_REAL + num_real of realizations. 
 The random seed is set using the realization number so that can break the 
@@ -44,9 +111,16 @@ import argparse
 from multiprocessing import Pool
 import os
 import sys
+import time
 import site
 site.addsitedir( os.getcwd() )
 import EAAWG_ProcCalib_Results as RProc
+import EAAWG_Schedule as WGSCH
+import EAAWG_Writer as WGWR
+import EAAWG_Codecs as WGCOD
+import EAAWG_Schema as WGSCM
+import EAAWG_Profile as WGPRF
+import EAAWG_LaneSim as WGLS
 
 START_REAL = 1
 #START_REAL = 7001
@@ -67,10 +141,16 @@ EVENT_RECUR_DEF_SEED = int( 62379 )
 """Event recurrence interval default seed"""
 EVENT_MAG_DEF_SEED = int( 73871 )
 """Event magnitude default seed"""
-CHUNK_SIZE = 5
+CHUNK_SIZE = None
 """Chunk size to use with the mp module
-This is effectively the number of realization sent to a worker process at one 
-time."""
+This is effectively the number of realization sent to a worker process at one
+time. None sizes the chunks from the measured realization run time, see
+EAAWG_Schedule."""
+WORKER_STATIC = dict()
+"""Static structures for this process, built once by initWorker. Keys are
+backend, seeding, basin, CALENDAR, the EAAWG_Calendar.SimCalendar, and
+REALIZATION, the EAAWG_Realization.Realization reused for each
+realization."""
 
 
 #-----------------------------------------------------------------------
@@ -108,8 +188,145 @@ def delPrevOutputs( ):
     return
 
 
+def createOutputStore( StartReal, NumReal, out_label=None ):
+    """Create the empty basin realization store before starting workers.
+
+    Parameters
+    ----------
+    StartReal : int
+        First realization number.
+    NumReal : int
+        Number of realizations.
+    out_label : str, optional
+        Store file label. The default is None for the basin store.
+
+    Returns
+    -------
+    None.
+
+    """
+    # imports
+    import EAAWG_Calendar as WGCAL
+    import EAAWG_RealStore as WGRS
+    # start
+    WGRS.createStore( list( range( StartReal, StartReal + NumReal, 1 ) ),
+                      WGCAL.getCalendar().DT_INDEX, out_label=out_label )
+    WGRS.WRITE_LABEL = out_label
+    # return
+    return
+
+
+def initWorker( Backend="scipy", Seeding="legacy", RootSeed=None,
+                Profile=None ):
+    """Build the static structures once per process. Used as the Pool
+    initializer and called again by the workers, where it does nothing
+    unless the backend, the seeding, or the basin changed.
+
+    The smoothed climatology and A and B arrays, the simulation calendar,
+    and the Realization with the distributions, samplers, and events are
+    created here. Workers then only reseed the Realization for each
+    realization.
+
+    Args:
+        Backend (str): sampling backend, "scipy" or "numpy"
+        Seeding (str): seeding mode, "legacy" or "philox", see EAAWG_Seeds
+        RootSeed (int): root seed for "philox" seeding, None for the
+                        EAAWG_Seeds default
+        Profile (bool): turn phase profiling on or off for this process,
+                        see EAAWG_Profile. None leaves it as is.
+
+    Returns:
+        None.
+
+    """
+    # imports
+    import EAAWG_Inputs as WGI
+    import EAAWG_Calendar as WGCAL
+    import EAAWG_OtherWeather as WGOW
+    import EAAWG_Realization as WGRL
+    import EAAWG_Seeds as WGSEED
+    # globals
+    global WORKER_STATIC
+    # start
+    if Profile is not None:
+        WGPRF.setProfiling( Profile )
+    # end if
+    if ( WORKER_STATIC.get( "backend", None ) == Backend ) and \
+            ( WORKER_STATIC.get( "seeding", None ) == ( Seeding, RootSeed ) ) and \
+            ( WORKER_STATIC.get( "basin", None ) == WGI.OUT_LABEL ):
+        return
+    # end if
+    # samplers are created with the bit generator type for the seeding
+    WGSEED.setSeeding( Seeding, root_seed=RootSeed )
+    SimCal = WGCAL.getCalendar()
+    WGOW.constructArrays()
+    WORKER_STATIC = { "backend" : Backend,
+                      "seeding" : ( Seeding, RootSeed ),
+                      "basin" : WGI.OUT_LABEL,
+                      "CALENDAR" : SimCal,
+                      "REALIZATION" : WGRL.Realization( backend=Backend ), }
+    # return
+    return
+
+
+def outputRealization( RealNum, SimCal, Real, OutFormat, Summarize, writers=1,
+                       codec="zip", schema="full" ):
+    """Write out, and optionally summarize, the simulated realization.
+    Writes are queued for the background writer threads, so the outputs may
+    still be in progress on return, see EAAWG_Writer.flushWriter.
+
+    Args:
+        RealNum (int): the current realization number
+        SimCal (EAAWG_Calendar.SimCalendar): simulation calendar
+        Real (EAAWG_Realization.Realization): the simulated realization
+        OutFormat (str): realization output, "pickle", "store", or "none"
+        Summarize (bool): calculate the PEST collation summary
+
+    KWargs:
+        writers (int): background writer threads, 0 to write here
+        codec (str): realization file codec, see EAAWG_Codecs
+        schema (str): realization file schema, see EAAWG_Schema
+
+    Returns:
+        int or tuple. 0 for success, or (0, summary dictionary) when
+        Summarize
+
+    """
+    # imports
+    import EAAWG_HighRealResults as WGHRR
+    import EAAWG_Events as EXEV
+    import EAAWG_ProcCalib_Results as RProc
+    import EAAWG_Writer as WGWR
+    # start
+    WGWR.setWriters( writers )
+    with WGPRF.phase( "output" ):
+        H0DF = WGHRR.outputWSResults( RealNum, SimCal.DT_INDEX,
+                                      SimCal.numDays, Real.H0_REAL,
+                                      out_format=OutFormat, sim_cal=SimCal,
+                                      codec=codec, schema=schema )
+    # end with
+    if OutFormat != "none":
+        with WGPRF.phase( "event_output" ):
+            EXEV.outputBigEvents( RealNum, SimCal.DT_INDEX,
+                                  trig_dict=Real.timeline.trigDict(),
+                                  next_dict=Real.timeline.nextDict() )
+        # end with
+    # end if
+    if Summarize:
+        with WGPRF.phase( "summary" ):
+            RealSummary = RProc.summarizeRealization( H0DF )
+        # end with
+        return ( 0, RealSummary )
+    # end if
+    # return
+    return 0
+
+
 def WG_Worker_Main( RealNum, SNSeed, PDSeed, WSLSeed, DSLSeed, EVRecurSeed,
-                    EVMagSeed ):
+                    EVMagSeed, Buffered=False, CurMonOnly=False, 
+                    Backend="scipy", OutFormat="pickle", Summarize=False,
+                    Seeding="legacy", RootSeed=None, Writers=1,
+                    Codec="zip", Schema="full" ):
     """ Main functionality to run a single realization
 
     Args:
@@ -120,139 +337,275 @@ def WG_Worker_Main( RealNum, SNSeed, PDSeed, WSLSeed, DSLSeed, EVRecurSeed,
         DSLSeed (int): dry state spell length sampling seed
         EVRecurSeed(int): event recurrence interval sampling seed
         EVMagSeed(int): event magnitude sampling seed
+        Buffered (bool): use block buffered sampling, gives identical 
+                         results to unbuffered sampling
+        CurMonOnly (bool): only sample the current month each day
+        Backend (str): sampling backend, "scipy" for SciPy distributions
+                       with np.random.RandomState or "numpy" to sample
+                       directly from np.random.Generator
+        OutFormat (str): realization output, "pickle", "store", or "none"
+        Summarize (bool): calculate the PEST collation summary for this
+                          realization in the worker
+        Seeding (str): seeding mode, "legacy" or "philox". The base seeds
+                       are only used for "legacy".
+        RootSeed (int): root seed for "philox" seeding
+        Writers (int): background output writer threads, 0 to write
+                       in the worker, see EAAWG_Writer
+        Codec (str): realization file codec for "pickle" output, see
+                     EAAWG_Codecs
+        Schema (str): realization file schema for "pickle" output, see
+                      EAAWG_Schema
 
     Returns:
         int. The return code::
             0 -- Success!
             1 -- Failure, generic
+        or tuple (return code, summary dictionary) when Summarize
 
     """
     # imports
-    import pandas as pd
+    import numpy as np
     import EAAWG_Inputs as WGI
-    import EAAWG_Dists_Samples as WGDS
-    import EAAWG_PrecipDepth as WGPD
     import EAAWG_OtherWeather as WGOW
     import EAAWG_HighRealResults as WGHRR
-    import EAAWG_Events as EXEV
+    import EAAWG_Seeds as WGSEED
     # 
-    # set our local seeds
-    pdSampSeed = PDSeed + RealNum
-    sndSampSeed = SNSeed + RealNum
-    wetSSampSeed = WSLSeed + RealNum
-    drySSampSeed = DSLSeed + RealNum
-    evrSSampSeed = EVRecurSeed + RealNum
-    evmSSampSeed = EVMagSeed + RealNum
-    # get our start and end
+    # get our start and the static structures for this process
     start_date = WGI.START_DATE
-    end_date = WGI.END_DATE
-    # calculate our total days and set up our time index for output
-    timeD = end_date - start_date
-    TOTAL_DAYS = int( timeD.days + 1 )
-    DT_INDEX = pd.date_range( start=start_date, end=end_date, freq='D' )
-    # with the time index set, then we have everything that we need to
-    # set-up our structures
-    WGOW.constructArrays()
-    # set-up the sampling and other things for standard weather generator
-    WGDS.setDistributions( pdSampSeed, wetSSampSeed, drySSampSeed )
-    WGDS.setTrackers( start_date.month )
-    WGOW.setupDistsSamples(seed_std_norm=sndSampSeed)
-    WGOW.updateTracker()
-    # set-up sampling and custom events
-    EXEV.setEvents(evrSSampSeed, evmSSampSeed)
-    EXEV.setTrackers()
-    # get our starting state sampler
-    StarterSamp = WGPD.PrecipSampler(pd_sample_seed=(pdSampSeed - 1))
-    # get our time index in a list for an iterator
-    TimesList = DT_INDEX.to_pydatetime().tolist()
+    initWorker( Backend, Seeding, RootSeed )
+    tSetup = WGPRF.startPhase()
+    # set our local seeds
+    SeedDict = WGSEED.realizationSeeds( RealNum, SNSeed, PDSeed, WSLSeed,
+                                        DSLSeed, EVRecurSeed, EVMagSeed )
+    SimCal = WORKER_STATIC["CALENDAR"]
+    Real = WORKER_STATIC["REALIZATION"]
+    TOTAL_DAYS = SimCal.numDays
+    # reseed the sampling, trackers, and custom events for this realization
+    Real.reseed( SeedDict, buffered=Buffered )
+    Real.setTrackers( start_date.month )
+    Real.setEventTrackers( TOTAL_DAYS )
+    # get the month for each day in a list for an iterator
+    MonthList = SimCal.monthList
     # no loop at the realization level
     curMonth = start_date.month
     # now get the starting state
-    TestVal = StarterSamp.getSingleVal()
-    if TestVal > 0.5:
+    if Real.startWet():
         h0State = WGI.WET_STATE
-        h0remdur = WGDS.ST_WETSPELL[curMonth]
+        h0remdur = Real.stWetSpell[curMonth]
     else:
         h0State = WGI.DRY_STATE
-        h0remdur = WGDS.ST_DRYSPELL[curMonth]
+        h0remdur = Real.stDrySpell[curMonth]
     # end if
-    # get the event information
-    NumCustomEvents = len( WGI.EVENT_KEYS )
-    EvTrigTimes = [ EXEV.NEXT_EVENT_DICT[x][0] for x in WGI.EVENT_KEYS ]
-    EvTrigMags = [ EXEV.NEXT_EVENT_DICT[x][1] for x in WGI.EVENT_KEYS ]
+    # custom event timeline, see EAAWG_Events.EventTimeline
+    EvTimeline = Real.timeline
     # now create/set our realization tracking array
-    WGHRR.createSimStructures(TOTAL_DAYS)
-    # set the event processing vars
-    eventTriggered = False
-    eventTrigMag = 0.0
+    Real.createOutputs( TOTAL_DAYS )
+    # daily error variates, states, and day of year for the temperature
+    #  calculation which is done for all days at the end
+    EpsArr = np.zeros( (TOTAL_DAYS, WGOW.NUM_OTHER), dtype=np.float64 )
+    WetArr = np.zeros( TOTAL_DAYS, dtype=bool )
+    DoyArr = SimCal.doy
+    WGPRF.endPhase( "setup", tSetup )
     # inner loop over times
     for jJ in range(TOTAL_DAYS):
-        cTime = TimesList[jJ]
         # get the current month
-        curMonth = cTime.month
+        curMonth = MonthList[jJ]
         # sample all every time step
-        WGDS.sampleAll( curMonth )
-        WGOW.updateTracker()
-        # get the current day of the year
-        curDayoYr = cTime.timetuple().tm_yday                
+        tSample = WGPRF.startPhase()
+        Real.sampleAll( curMonth, current_only=CurMonOnly )
+        Real.updateTracker()
+        WGPRF.endPhase( "sampling", tSample )
+        EpsArr[jJ, :] = Real.epsi2[0, :]
         # now that everything is sampled check our state and if wet
         # then we get a precip depth
         if h0State == WGI.WET_STATE:
             if h0remdur <= 0:
                 # then need to change state to dry
                 h0State = WGI.DRY_STATE
-                h0remdur = WGDS.ST_DRYSPELL[curMonth]
-                WGHRR.assignDryDep( jJ )
+                h0remdur = Real.stDrySpell[curMonth]
+                Real.assignDryDep( jJ )
             else:
-                # check if any events should be triggered
-                for eE in range(NumCustomEvents):
-                    if EvTrigTimes[eE] < jJ:
-                        eventTriggered = True
-                        eventTrigMag += EvTrigMags[eE]
-                        # now need to sample our new events
-                        EXEV.updateTriggeredEvent( eE, cTime, jJ )
-                    # end if
-                # end for event
-                # assign the sampled precipitation depth
-                if eventTriggered:
-                    pVal = eventTrigMag
-                    # now update the event that tracked
-                    EvTrigTimes = [ EXEV.NEXT_EVENT_DICT[x][0] for x in WGI.EVENT_KEYS ]
-                    EvTrigMags = [ EXEV.NEXT_EVENT_DICT[x][1] for x in WGI.EVENT_KEYS ]
-                    eventTriggered = False
-                    eventTrigMag = 0.0
-                else: 
-                    pVal = WGDS.ST_PDEPTH[curMonth]
+                # check if any events should be triggered, the timeline
+                #  records them and schedules the next ones
+                if jJ >= EvTimeline.nextDay:
+                    tEvent = WGPRF.startPhase()
+                    pVal = EvTimeline.trigger( jJ )
+                    WGPRF.endPhase( "events", tEvent )
+                else:  
+                    pVal = Real.stPDepth[curMonth]
                 # end if event
-                WGHRR.assignWetDep( jJ, pVal )
+                Real.assignWetDep( jJ, pVal )
             # end if a wet day
         else:
             # then the H0 branch is currently dry
             # check if time to toggle states
             if h0remdur <= 0:
                 h0State = WGI.WET_STATE
-                h0remdur = WGDS.ST_WETSPELL[curMonth]
-                pVal = WGDS.ST_PDEPTH[curMonth]
-                WGHRR.assignWetDep( jJ, pVal )
+                h0remdur = Real.stWetSpell[curMonth]
+                pVal = Real.stPDepth[curMonth]
+                Real.assignWetDep( jJ, pVal )
             else:
-                WGHRR.assignDryDep( jJ )
-        # do the other parameters
-        WGOW.calcCHI0( )
-        # now update our temp values
-        WGOW.calculateUpdate( jJ, curDayoYr, h0State )
+                Real.assignDryDep( jJ )
+        # track the state for the other parameters
+        WetArr[jJ] = ( h0State == WGI.WET_STATE )
         # decrement counters before moving on
         h0remdur -= 1
-        # copy our array
-        WGOW.rollOverChis()
     # end of time for loop
+    # do the other parameters for all days
+    with WGPRF.phase( "temperature" ):
+        MaxT, MinT = WGOW.calcTempSeries( EpsArr, WetArr, DoyArr )
+    # end with
+    Real.H0_REAL[:, WGHRR.TMAX_IND] = MaxT
+    Real.H0_REAL[:, WGHRR.TMIN_IND] = MinT
     # now output the realization
-    #WGHRR.outputRealResults( RealNum, DT_INDEX)
-    WGHRR.outputWSResults( RealNum, DT_INDEX, TOTAL_DAYS )
-    #EXEV.outputEventTracking( RealNum, DT_INDEX )
-    EXEV.outputBigEvents( RealNum, DT_INDEX )
+    #WGHRR.outputRealResults( RealNum, DT_INDEX, Real.H0_REAL )
+    #EXEV.outputEventTracking( RealNum, DT_INDEX, Real.timeline.trigDict(),
+    #                          Real.timeline.nextDict() )
     # end of realizations loop
     # end
-    return 0
+    return outputRealization( RealNum, SimCal, Real, OutFormat, Summarize,
+                              writers=Writers, codec=Codec, schema=Schema )
+
+def WG_Worker_Array( RealNum, SNSeed, PDSeed, WSLSeed, DSLSeed, EVRecurSeed,
+                     EVMagSeed, Backend="scipy", OutFormat="pickle",
+                     Summarize=False, Seeding="legacy", RootSeed=None,
+                     Writers=1, Codec="zip", Schema="full", Spells="daily" ):
+    """ Array version of WG_Worker_Main to run a single realization
+
+    All random streams are drawn in bulk and the realization is calculated
+    over NumPy arrays in EAAWG_ArraySim rather than one day at a time.
+
+    Args:
+        RealNum (int): the current realization number
+        SNSeed (int): base seed for the standard normal sampler
+        PDSeed (int): the precipitation depth sampler seed
+        WSLSeed (int): wet state spell length sampling seed
+        DSLSeed (int): dry state spell length sampling seed
+        EVRecurSeed(int): event recurrence interval sampling seed
+        EVMagSeed(int): event magnitude sampling seed
+        Backend (str): sampling backend, "scipy" or "numpy"
+        OutFormat (str): realization output, "pickle", "store", or "none"
+        Summarize (bool): calculate the PEST collation summary for this
+                          realization in the worker
+        Seeding (str): seeding mode, "legacy" or "philox". The base seeds
+                       are only used for "legacy".
+        RootSeed (int): root seed for "philox" seeding
+        Writers (int): background output writer threads, 0 to write
+                       in the worker, see EAAWG_Writer
+        Codec (str): realization file codec for "pickle" output, see
+                     EAAWG_Codecs
+        Schema (str): realization file schema for "pickle" output, see
+                      EAAWG_Schema
+        Spells (str): "daily" or "runs" spell generation, see
+                      EAAWG_ArraySim.simulateRealization
+
+    Returns:
+        int. The return code::
+            0 -- Success!
+            1 -- Failure, generic
+        or tuple (return code, summary dictionary) when Summarize
+
+    """
+    # imports
+    import EAAWG_ArraySim as WGAS
+    import EAAWG_Seeds as WGSEED
+    #
+    # static structures for this process
+    initWorker( Backend, Seeding, RootSeed )
+    SimCal = WORKER_STATIC["CALENDAR"]
+    Real = WORKER_STATIC["REALIZATION"]
+    # set our local seeds
+    SeedDict = WGSEED.realizationSeeds( RealNum, SNSeed, PDSeed, WSLSeed,
+                                        DSLSeed, EVRecurSeed, EVMagSeed )
+    # simulate
+    WGAS.simulateRealization( SimCal, Real, SeedDict, spells=Spells )
+    # now output the realization
+    # end
+    return outputRealization( RealNum, SimCal, Real, OutFormat, Summarize,
+                              writers=Writers, codec=Codec, schema=Schema )
+
+
+def WG_Worker_Lanes( RealNums, SNSeed, PDSeed, WSLSeed, DSLSeed, EVRecurSeed,
+                     EVMagSeed, OutFormat="pickle", Summarize=False,
+                     Seeding="legacy", RootSeed=None, Writers=1, Codec="zip",
+                     Schema="full", NumLanes=None ):
+    """ Lanes version of WG_Worker_Array to run realizations from a group
+
+    The whole lane group is simulated together in EAAWG_LaneSim, so that
+    each realization is the same however the group is split into tasks,
+    and the realizations in RealNums are output. Arguments are the same as
+    WG_Worker_Array except for those below. Sampling is always with NumPy
+    Generators.
+
+    Args:
+        RealNums (tuple): realization numbers, all from one lane group, see
+                          EAAWG_LaneSim.laneGroups
+        NumLanes (int): realizations in a lane group, None for
+                        EAAWG_LaneSim.DEF_LANES
+
+    Returns:
+        list. WG_Worker_Array return for each realization in RealNums
+
+    """
+    # imports
+    import EAAWG_Seeds as WGSEED
+    #
+    # static structures for this process
+    initWorker( "numpy", Seeding, RootSeed )
+    SimCal = WORKER_STATIC["CALENDAR"]
+    if NumLanes is None:
+        NumLanes = WGLS.DEF_LANES
+    # end if
+    # the group generator
+    FirstReal = WGLS.groupStart( RealNums[0], NumLanes, start_real=START_REAL )
+    GroupGen = WGSEED.laneGroupGenerator( FirstReal, NumLanes,
+                                          [ SNSeed, PDSeed, WSLSeed, DSLSeed,
+                                            EVRecurSeed, EVMagSeed ] )
+    # simulate
+    LaneReals = WGLS.simulateLanes( SimCal, GroupGen, NumLanes )
+    # now output the realizations
+    # end
+    return [ outputRealization( x, SimCal, LaneReals[x - FirstReal],
+                                OutFormat, Summarize, writers=Writers,
+                                codec=Codec, schema=Schema )
+             for x in RealNums ]
+
+
+def workerExtraArgs( args ):
+    """Trailing worker arguments, after the base seeds, from the parsed
+    command line options. Used by this driver and EAAWG_Batch so the
+    argument order only has to match the worker signatures here.
+
+    Args:
+        args (argparse.Namespace): parsed options with engine, buffered,
+                                   current_month, backend, output,
+                                   summarize, seeding, root_seed, writers,
+                                   codec, schema, spells, and lanes
+
+    Returns:
+        tuple: arguments for WG_Worker_Array when args.engine is "array",
+               for WG_Worker_Lanes when it is "lanes", and for
+               WG_Worker_Main otherwise
+
+    """
+    # start
+    if args.engine == "lanes":
+        ExtraArgs = ( args.output, args.summarize, args.seeding,
+                      args.root_seed, args.writers, args.codec, args.schema,
+                      args.lanes )
+    elif args.engine == "array":
+        ExtraArgs = ( args.backend, args.output, args.summarize, args.seeding,
+                      args.root_seed, args.writers, args.codec,
+                      args.schema, args.spells )
+    else:
+        ExtraArgs = ( args.buffered, args.current_month, args.backend,
+                      args.output, args.summarize, args.seeding,
+                      args.root_seed, args.writers, args.codec,
+                      args.schema )
+    # end if
+    # return
+    return ExtraArgs
+
 
 if __name__ == "__main__":
     # use the command line processor so that can tell how many processes or cores to use
@@ -264,39 +617,370 @@ if __name__ == "__main__":
         type=int,
         default=DEF_NUM_REALIZATIONS,
         help='Number of realizations for simulation')
+    parser.add_argument(
+        '--engine',
+        choices=['loop', 'array', 'lanes'],
+        default='loop',
+        help='Simulation engine, day by day loop, bulk array, or groups of '
+             'realizations simulated together in lanes')
+    parser.add_argument(
+        '--lanes',
+        type=int,
+        default=None,
+        help='Realizations simulated together with the lanes engine, '
+             'default %d' % WGLS.DEF_LANES)
+    parser.add_argument(
+        '--spells',
+        choices=['daily', 'runs'],
+        default='daily',
+        help='Spell generation with the array engine, spell lengths drawn '
+             'for every day or one draw for each spell; runs gives '
+             'different realizations than daily')
+    parser.add_argument(
+        '--buffered',
+        action='store_true',
+        help='Use block buffered sampling with the loop engine')
+    parser.add_argument(
+        '--current_month',
+        action='store_true',
+        help='Only sample the current month each day with the loop engine')
+    parser.add_argument(
+        '--backend',
+        choices=['scipy', 'numpy'],
+        default='scipy',
+        help='Sampling backend, SciPy distributions or NumPy Generators')
+    parser.add_argument(
+        '--output',
+        choices=['pickle', 'store', 'none'],
+        default='pickle',
+        help='Realization output, one pickle each, a single basin store, '
+             'or none; none requires --summarize')
+    parser.add_argument(
+        '--summarize',
+        action='store_true',
+        help='Calculate PEST collation summaries in the workers rather than '
+             'reading the outputs back in')
+    parser.add_argument(
+        '--seeding',
+        choices=['legacy', 'philox'],
+        default='legacy',
+        help='Random stream seeding, base seed plus realization number or '
+             'counter based Philox streams that do not depend on how the '
+             'realizations are split up')
+    parser.add_argument(
+        '--root_seed',
+        type=int,
+        default=None,
+        help='Root seed for philox seeding')
+    parser.add_argument(
+        '--shard',
+        default=None,
+        help='Run shard INDEX/COUNT of the num_real realizations, e.g. 3/20')
+    parser.add_argument(
+        '--reals',
+        default=None,
+        help='Run an explicit shard of realizations FIRST-LAST, e.g. 1001-1500')
+    parser.add_argument(
+        '--merge',
+        action='store_true',
+        help='Validate and merge the shard outputs and collate; nothing is '
+             'simulated')
+    parser.add_argument(
+        '--chunk_size',
+        type=int,
+        default=CHUNK_SIZE,
+        help='Fixed number of realizations sent to a worker at a time; '
+             'default sizes the chunks from the realization run time')
+    parser.add_argument(
+        '--codec',
+        choices=WGCOD.CODECS,
+        default=WGCOD.DEF_CODEC,
+        help='Compression for pickle realization files; lz4 and zstd need '
+             'their packages installed')
+    parser.add_argument(
+        '--schema',
+        choices=WGSCM.SCHEMAS,
+        default=WGSCM.DEF_SCHEMA,
+        help='Columns kept in pickle realization files; compact keeps only '
+             'float32 Tmax, Tmin, Precip, and ETo and calculates the rest '
+             'when read, quantized also stores Precip as 0.01 mm integers')
+    parser.add_argument(
+        '--writers',
+        type=int,
+        default=WGWR.NUM_WRITERS,
+        help='Background output writer threads in each worker, 0 to write '
+             'in the worker before the next realization')
+    parser.add_argument(
+        '--quiet',
+        action='store_true',
+        help='Do not print progress as realizations finish')
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Resume a stopped run from its checkpoint, only running the '
+             'realizations that are missing or corrupt')
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Time each phase of the realizations in the workers and write '
+             'a profile report, see EAAWG_Profile')
+    parser.add_argument(
+        '--input_cache',
+        action='store_true',
+        help='Write the compact basin input file, when missing or out of '
+             'date, for faster start up of later runs')
     # parse the command line arguments received
     args = parser.parse_args()
     # extract our arguments
     num_proc = args.nbr_workers
     num_real = args.num_real
-    # remove any old files
-    delPrevOutputs( )
+    if ( args.output == "none" ) and ( not args.summarize ):
+        parser.error( "--output none requires --summarize" )
+    # end if
+    if ( args.shard is not None ) and ( args.reals is not None ):
+        parser.error( "use only one of --shard and --reals" )
+    # end if
+    if ( args.chunk_size is not None ) and ( args.chunk_size < 1 ):
+        parser.error( "--chunk_size must be at least 1" )
+    # end if
+    if args.codec not in WGCOD.availableCodecs():
+        parser.error( "codec %s is not available, use one of %s" %
+                      ( args.codec, WGCOD.availableCodecs() ) )
+    # end if
+    if ( args.spells != "daily" ) and ( args.engine != "array" ):
+        parser.error( "--spells %s requires --engine array" % args.spells )
+    # end if
+    if args.engine == "lanes":
+        if args.backend != "numpy":
+            parser.error( "--engine lanes requires --backend numpy" )
+        # end if
+        if args.lanes is None:
+            args.lanes = WGLS.DEF_LANES
+        elif args.lanes < 1:
+            parser.error( "--lanes must be at least 1" )
+        # end if
+    elif args.lanes is not None:
+        parser.error( "--lanes requires --engine lanes" )
+    # end if
+    # merge the outputs of a sharded run
+    if args.merge:
+        import EAAWG_Shards as WGSH
+        try:
+            MergeStart, MergeNum, MergeFormat, Summaries = \
+                WGSH.mergeShards( NumReal=num_real, start_real=START_REAL )
+        except WGSH.ShardError as e:
+            parser.error( str( e ) )
+        # end try
+        RProc.processOutputsForPEST( MergeNum, out_format=MergeFormat,
+                                     summaries=Summaries,
+                                     start_real=MergeStart )
+        print("Merged %d realizations, %d through %d" %
+              ( MergeNum, MergeStart, MergeStart + MergeNum - 1 ) )
+        sys.exit(0)
+    # end if
+    # realizations for this run
+    StartReal = START_REAL
+    RunReal = num_real
+    ShardRun = ( args.shard is not None ) or ( args.reals is not None )
+    try:
+        if args.reals is not None:
+            import EAAWG_Shards as WGSH
+            StartReal, RunReal = WGSH.parseRealRange( args.reals )
+        elif args.shard is not None:
+            import EAAWG_Shards as WGSH
+            ShardIndex, ShardCount = WGSH.parseShard( args.shard )
+            StartReal, RunReal = WGSH.shardRange( num_real, ShardIndex,
+                                                  ShardCount,
+                                                  start_real=START_REAL )
+        # end if
+    except ValueError as e:
+        parser.error( str( e ) )
+    # end try
+    if args.engine == 'lanes':
+        WorkerFunc = WG_Worker_Lanes
+    elif args.engine == 'array':
+        WorkerFunc = WG_Worker_Array
+    else:
+        WorkerFunc = WG_Worker_Main
+    # end if
+    ExtraArgs = workerExtraArgs( args )
+    # load the basin inputs once here so that forked workers inherit them
+    import EAAWG_Inputs as WGI
+    import EAAWG_Seeds as WGSEED
+    import EAAWG_Checkpoint as WGCKP
+    WGI.WRITE_INPUT_CACHE = args.input_cache
+    WGI.loadBasinInputs( )
+    WGSEED.setSeeding( args.seeding, root_seed=args.root_seed )
+    BaseSeeds = [ STD_NORM_DEF_SEED, PDEPTH_DEF_SEED, WET_STA_DEF_SEED,
+                  DRY_STA_DEF_SEED, EVENT_RECUR_DEF_SEED, EVENT_MAG_DEF_SEED ]
+    RunSettings = { "basin" : WGI.OUT_LABEL,
+                    "start_date" : WGI.START_DATE.strftime("%Y-%m-%d"),
+                    "end_date" : WGI.END_DATE.strftime("%Y-%m-%d"),
+                    "engine" : args.engine,
+                    "buffered" : args.buffered,
+                    "current_month" : args.current_month,
+                    "spells" : args.spells,
+                    "lanes" : args.lanes,
+                    "backend" : args.backend,
+                    "output" : args.output,
+                    "seeding" : args.seeding,
+                    "root_seed" : args.root_seed,
+                    "base_seeds" : BaseSeeds, }
+    # checkpoint of the finished realizations for resume
+    RunLabel = WGSH.shardLabel( StartReal, RunReal ) if ShardRun else \
+               WGI.OUT_LABEL
+    CkptSettings = dict( RunSettings, summarize=args.summarize,
+                         first_real=StartReal, num_real=RunReal )
+    DoneReals = list()
+    DoneSummaries = dict()
+    if args.resume:
+        try:
+            DoneReals, DoneSummaries = WGCKP.resumeCheckpoint( RunLabel,
+                                                               CkptSettings,
+                                                               BaseSeeds )
+        except WGCKP.CheckpointError as e:
+            parser.error( str( e ) )
+        # end try
+    # end if
+    if len( DoneReals ) > 0:
+        print("Resuming with %d of %d realizations already complete" %
+              ( len( DoneReals ), RunReal ) )
+        if args.output == "store":
+            import EAAWG_RealStore as WGRS
+            WGRS.WRITE_LABEL = RunLabel if ShardRun else None
+        # end if
+    else:
+        # remove any old files, only for this shard's realizations when
+        #  sharded
+        if ShardRun:
+            WGSH.delShardOutputs( StartReal, RunReal )
+        else:
+            delPrevOutputs( )
+        # end if
+        if args.output == "store":
+            createOutputStore( StartReal, RunReal,
+                               out_label=( RunLabel if ShardRun else None ) )
+        # end if
+    # end if
+    Ckpt = WGCKP.CheckpointWriter( RunLabel, CkptSettings, BaseSeeds,
+                                   append=( len( DoneReals ) > 0 ) )
+    DoneSet = set( DoneReals )
+    TodoReals = [ x for x in range( StartReal, StartReal + RunReal, 1 )
+                  if x not in DoneSet ]
+    # the lanes engine takes the realizations of a lane group as a task
+    if args.engine == 'lanes':
+        TaskReals = WGLS.laneGroups( TodoReals, args.lanes,
+                                     start_real=START_REAL )
+    else:
+        TaskReals = [ ( x, ) for x in TodoReals ]
+    # end if
     # output
-    print("Using %d processes for %d realizations" % ( num_proc, num_real))
-    print("Simulate realizations %d through %d" % (START_REAL, 
-                                            ( START_REAL + num_real ) - 1) )
+    print("Using %d processes for %d realizations" % ( num_proc, RunReal))
+    print("Simulate realizations %d through %d" % (StartReal, 
+                                            ( StartReal + RunReal ) - 1) )
+    def profileTask( tIndex, workerID, elapsed, times ):
+        """Add the phase times of a finished task to the profile report"""
+        ProfRep.add( list( TaskReals[tIndex] ), workerID, elapsed, times )
+    def recordTask( tIndex, tRes ):
+        """Checkpoint each realization of a finished task"""
+        if args.engine == 'lanes':
+            for RealNum, rRes in zip( TaskReals[tIndex], tRes ):
+                Ckpt.record( RealNum, rRes )
+            # end for
+        else:
+            Ckpt.record( TaskReals[tIndex][0], tRes )
+        # end if
+    WGPRF.setProfiling( args.profile )
+    ProfRep = WGPRF.ProfileReport()
     # now check what our number of realizations are ...
-    if num_real < 2:
+    TaskArgs = [ ( x if args.engine == 'lanes' else x[0] ) for x in TaskReals ]
+    if len( TaskArgs ) < 1:
+        TaskResults = list()
+    elif len( TaskArgs ) < 2:
         # this is the run once case
-        tRes = WG_Worker_Main( 1, STD_NORM_DEF_SEED, PDEPTH_DEF_SEED, 
-                               WET_STA_DEF_SEED, DRY_STA_DEF_SEED, 
-                               EVENT_RECUR_DEF_SEED, EVENT_MAG_DEF_SEED )
-        results = [ tRes ]
+        tStart = time.perf_counter()
+        tRes = WorkerFunc( TaskArgs[0], STD_NORM_DEF_SEED, PDEPTH_DEF_SEED,    
+                           WET_STA_DEF_SEED, DRY_STA_DEF_SEED, 
+                           EVENT_RECUR_DEF_SEED, EVENT_MAG_DEF_SEED,
+                           *ExtraArgs )
+        tElapsed = time.perf_counter() - tStart
+        WGWR.flushWriter( )
+        recordTask( 0, tRes )
+        if args.profile:
+            profileTask( 0, os.getpid(), tElapsed, WGPRF.takeTimes() )
+        # end if
+        TaskResults = [ tRes ]
     else:
         # create our list of tuples to use for the mapping
-        AllArgs = [ ( int(x), STD_NORM_DEF_SEED, PDEPTH_DEF_SEED, 
+        AllArgs = [ ( x, STD_NORM_DEF_SEED, PDEPTH_DEF_SEED, 
                      WET_STA_DEF_SEED, DRY_STA_DEF_SEED, EVENT_RECUR_DEF_SEED, 
-                     EVENT_MAG_DEF_SEED) for x in 
-                    range(START_REAL, START_REAL + num_real, 1) ]
-        with Pool(processes=num_proc) as pool:
-            results = pool.starmap( WG_Worker_Main, AllArgs, 
-                                    chunksize=CHUNK_SIZE )
+                     EVENT_MAG_DEF_SEED) + ExtraArgs for x in TaskArgs ]
+        with Pool(processes=num_proc, initializer=initWorker,
+                  initargs=( args.backend, args.seeding,
+                             args.root_seed, args.profile ) ) as pool:
+            TaskResults = WGSCH.runTasks( pool, num_proc, WorkerFunc, AllArgs,
+                                          chunk_size=args.chunk_size,
+                                          progress=( None if args.quiet else
+                                                     WGSCH.printProgress ),
+                                          on_result=recordTask,
+                                          on_profile=profileTask,
+                                          task_sizes=[ len( x ) for x in
+                                                       TaskReals ] )
         # end of with block
+    # end if
+    Ckpt.close()
+    # one result per realization
+    if args.engine == 'lanes':
+        NewResults = [ x for tRes in TaskResults for x in tRes ]
+    else:
+        NewResults = TaskResults
+    # end if
+    if args.profile:
+        ProfRoot = WGPRF.profilePath( RunLabel )
+        ProfRep.write( ProfRoot )
+        print("%s" % "".join( ProfRep.reportLines() ))
+        print("Profile written to %s.txt and %s.json" % ( ProfRoot, ProfRoot ))
+    # end if
+    # results in realization order, including those from the checkpoint
+    ResDict = dict( zip( TodoReals, NewResults ) )
+    results = list()
+    for RealNum in range( StartReal, StartReal + RunReal, 1 ):
+        if RealNum in ResDict:
+            results.append( ResDict[RealNum] )
+        elif args.summarize:
+            results.append( ( 0, DoneSummaries[RealNum] ) )
+        else:
+            results.append( 0 )
+        # end if
+    # end for
+    # split out the summaries calculated in the workers
+    if args.summarize:
+        Summaries = [ x[1] for x in results ]
+        results = [ x[0] for x in results ]
+    else:
+        Summaries = None
+    # end if
+    # sharded runs record the shard for the merge step
+    if ShardRun:
+        TotFails = sum( results )
+        WGSH.writeShardOutputs( StartReal, RunReal, RunSettings, TotFails,
+                                summaries=Summaries )
+        if TotFails == 0:
+            print("Finished shard of %d realizations successfully" % RunReal)
+            sys.exit(0)
+        else:
+            ErrorMessage = "Finished %d successful runs out of %d realizations" % ( RunReal - TotFails, RunReal )
+            print("%s" % ErrorMessage)
+            sys.exit(-2)
+        # end if
+    # end if
     # check the results
-    if num_real < 5:
+    if RunReal < 5:
         if results[0] == 0:
-            SuccessMessage = "Finished %d realizations successfully" % num_real
-            RProc.processOutputsForPEST(num_real)
+            SuccessMessage = "Finished %d realizations successfully" % RunReal
+            RProc.processOutputsForPEST(RunReal, out_format=args.output,
+                                        summaries=Summaries,
+                                        start_real=StartReal)
             print("%s" % SuccessMessage)
             sys.exit(0)
         else:
@@ -307,13 +991,15 @@ if __name__ == "__main__":
     else:
         TotFails = sum( results )
         if TotFails == 0:
-            SuccessMessage = "Finished %d realizations successfully" % num_real
-            RProc.processOutputsForPEST(num_real)
+            SuccessMessage = "Finished %d realizations successfully" % RunReal
+            RProc.processOutputsForPEST(RunReal, out_format=args.output,
+                                        summaries=Summaries,
+                                        start_real=StartReal)
             print("%s" % SuccessMessage)
             sys.exit(0)
         else:
-            NumSuccess = num_real - TotFails
-            ErrorMessage = "Finished %d successful runs out of %d realizations" % (NumSuccess, num_real)
+            NumSuccess = RunReal - TotFails
+            ErrorMessage = "Finished %d successful runs out of %d realizations" % (NumSuccess, RunReal)
             print("%s" % ErrorMessage)
             sys.exit(-2)
         # end if
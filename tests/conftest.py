@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Shared set up for the weather generator tests.
+
+The drivers are run as scripts in a temporary working directory with
+synthetic basin inputs, see writeSyntheticInputs, and a short three year
+simulation period that covers the first years of the collation, so that
+each run takes a few seconds. The input modules find Inputs and Results
+from the working directory when imported, so each run is a separate
+process started through RUNNER, which shortens the period before running
+the driver as __main__.
+
+"""
+# Copyright and License
+"""
+Copyright 2023 Southwest Research Institute
+
+Module Author: Nick Martin <nick.martin@alumni.stanford.edu>
+
+This file is part of a custom weather generator framework with extreme events,
+hereafter WG Framework.
+
+WG Framework is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+WG Framework is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+# imports
+import os
+import pickle
+import subprocess
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# parameters
+SRC_DIR = os.path.normpath( os.path.join( os.path.dirname( __file__ ), "..",
+                                          "src" ) )
+"""Weather generator modules"""
+DATA_DIR = os.path.normpath( os.path.join( os.path.dirname( __file__ ),
+                                           "data" ) )
+"""Reference outputs"""
+SHORT_START = "2030-01-01 00:00"
+"""First day of the short simulation period"""
+SHORT_END = "2032-12-31 23:59"
+"""Last day of the short simulation period"""
+RUNNER = """
+import runpy, sys
+import pandas as pd
+sys.path.insert( 0, sys.argv[1] )
+import EAAWG_Inputs as WGI
+WGI.START_DATE = pd.Timestamp( sys.argv[2] )
+WGI.END_DATE = pd.Timestamp( sys.argv[3] )
+sys.argv = sys.argv[4:]
+runpy.run_path( sys.argv[0], run_name="__main__" )
+"""
+"""Runs a driver script with the short period, arguments are the source
+directory, start, end, script path, and the script arguments"""
+
+if SRC_DIR not in sys.path:
+    sys.path.insert( 0, SRC_DIR )
+# end if
+
+
+def writeSyntheticInputs( InDir, basin="Frio" ):
+    """Write smooth synthetic climatology and lag correlation inputs for a
+    basin. Only the file formats matter for the tests.
+
+    Args:
+        InDir (str): inputs directory, created if needed
+
+    KWargs:
+        basin (str): basin label used as the dictionary key
+
+    """
+    # start
+    os.makedirs( InDir, exist_ok=True )
+    doyArr = np.arange( 1, 367, 1 )
+    def climDF( base, amp ):
+        seasonal = amp * np.sin( 2.0 * np.pi * ( doyArr - 100 ) / 366.0 )
+        return pd.DataFrame( { "Tmax_C" : base + seasonal,
+                               "Tmin_C" : base - 10.0 + seasonal,
+                               "Tave_C" : base - 5.0 + seasonal, },
+                             index=doyArr )
+    ClimDFs = { "WetAve" : climDF( 24.0, 8.0 ),
+                "DryAve" : climDF( 26.0, 9.0 ),
+                "WetStd" : climDF( 3.0, 0.5 ) + 7.0,
+                "DryStd" : climDF( 3.5, 0.5 ) + 7.0, }
+    for cName, cDF in ClimDFs.items():
+        FilePath = os.path.join( InDir, "OWeath_Smooth_%s_1981-2010_DictDF.pkl"
+                                 % cName )
+        with open( FilePath, "wb" ) as OF:
+            pickle.dump( { basin : cDF }, OF )
+        # end with
+    # end for
+    M0DF = pd.DataFrame( { "rho_X1" : [ 1.0, 0.6 ], "rho_X2" : [ 0.6, 1.0 ] },
+                         index=[ "rho_1X", "rho_2X" ] )
+    M1DF = pd.DataFrame( { "rho_X1_L1" : [ 0.6, 0.3 ],
+                           "rho_X2_L1" : [ 0.4, 0.7 ] },
+                         index=[ "rho_1X", "rho_2X" ] )
+    for mName, mDF in [ ( "Rho0", M0DF ), ( "Rho1", M1DF ) ]:
+        FilePath = os.path.join( InDir, "OWeath_%s_1991-2020_DFDict.pkl" %
+                                 mName )
+        with open( FilePath, "wb" ) as OF:
+            pickle.dump( { basin : mDF }, OF )
+        # end with
+    # end for
+    # return
+    return
+
+
+def runScript( WorkDir, ScriptArgs, src_dir=SRC_DIR, check=True ):
+    """Run a driver script in WorkDir with the short period
+
+    Args:
+        WorkDir (str): working directory, with Inputs
+        ScriptArgs (list): script name in src_dir and its arguments
+
+    KWargs:
+        src_dir (str): directory with the weather generator modules
+        check (bool): fail the test when the script fails
+
+    Returns:
+        subprocess.CompletedProcess: with the captured output
+
+    """
+    # start
+    CmdList = [ sys.executable, "-c", RUNNER, src_dir, SHORT_START, SHORT_END,
+                os.path.join( src_dir, ScriptArgs[0] ) ] + \
+              [ str( x ) for x in ScriptArgs[1:] ]
+    Proc = subprocess.run( CmdList, cwd=WorkDir, capture_output=True,
+                           text=True )
+    if check and ( Proc.returncode != 0 ):
+        pytest.fail( "%s failed with %d\n%s\n%s" %
+                     ( " ".join( ScriptArgs ), Proc.returncode, Proc.stdout,
+                       Proc.stderr ) )
+    # end if
+    # return
+    return Proc
+
+
+class WGRunner(object):
+    """Runs the weather generator drivers in one working directory"""
+
+    def __init__( self, WorkDir ):
+        """Default initialization method
+
+        Args:
+            WorkDir (str): working directory, synthetic inputs are written
+                           to WorkDir/Inputs
+
+        """
+        super().__init__()
+        self.workDir = str( WorkDir )
+        writeSyntheticInputs( os.path.join( self.workDir, "Inputs" ) )
+        os.makedirs( os.path.join( self.workDir, "Results", "Simulated" ),
+                     exist_ok=True )
+
+    def run( self, *ScriptArgs, check=True ):
+        """Run EAAWGmp.py with the arguments, see runScript"""
+        return runScript( self.workDir, [ "EAAWGmp.py" ] + list( ScriptArgs ),
+                          check=check )
+
+    def collOuts( self ):
+        """Contents of CollOuts.dat from the last collation"""
+        with open( os.path.join( self.workDir, "CollOuts.dat" ), "rb" ) as IF:
+            return IF.read()
+
+    def simPath( self, FileName ):
+        """Path of a file in the simulated realizations directory"""
+        return os.path.join( self.workDir, "Results", "Simulated", FileName )
+
+
+@pytest.fixture
+def wg( tmp_path ):
+    """WGRunner in a fresh temporary directory"""
+    return WGRunner( tmp_path )
+
+
+#EOF
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Invariants of the simulation drivers on the short synthetic period, see
+conftest.
+
+data/baseline_loop.npz holds realizations 1 to 3 from the original day by
+day loop, commit "baseline", with the same inputs and period. Each was run
+in a new process, because the original loop kept drawing the temperature
+noise of the first realization that a process ran.
+
+"""
+# Copyright and License
+"""
+Copyright 2023 Southwest Research Institute
+
+Module Author: Nick Martin <nick.martin@alumni.stanford.edu>
+
+This file is part of a custom weather generator framework with extreme events,
+hereafter WG Framework.
+
+WG Framework is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+WG Framework is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with WG Framework.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+# imports
+import os
+import numpy as np
+import pytest
+import conftest as WGT
+import EAAWG_Schema as WGSCM
+
+
+def readReal( runner, RealNum ):
+    """Realization DataFrame from the pickle output of a run"""
+    return WGSCM.readRealization( runner.simPath( "Frio_R%d_DF.pickle" %
+                                                  RealNum ) )
+
+
+def test_loop_matches_baseline( wg ):
+    """The default loop engine gives the original realizations exactly"""
+    Baseline = np.load( os.path.join( WGT.DATA_DIR, "baseline_loop.npz" ),
+                        allow_pickle=False )
+    NumReal = Baseline["values"].shape[0]
+    wg.run( 1, "--num_real", NumReal )
+    for rI in range( NumReal ):
+        H0DF = readReal( wg, rI + 1 )
+        assert list( H0DF.columns ) == Baseline["columns"].tolist()
+        assert np.array_equal( H0DF.index.values.astype( "datetime64[D]" ),
+                               Baseline["dates"] )
+        maxDiff = np.abs( H0DF.to_numpy( dtype=np.float64 ) -
+                          Baseline["values"][rI] ).max()
+        assert maxDiff == 0.0
+    # end for
+
+
+def test_collation_paths_match( wg ):
+    """Pickle, store, and worker summary collation give the same CollOuts"""
+    CollOuts = dict()
+    for OutArgs in [ [ "--output", "pickle" ], [ "--output", "store" ],
+                     [ "--summarize", "--output", "none" ] ]:
+        wg.run( 1, "--num_real", 3, "--engine", "array", "--quiet", *OutArgs )
+        CollOuts[" ".join( OutArgs )] = wg.collOuts()
+    # end for
+    CollList = list( CollOuts.values() )
+    assert all( x == CollList[0] for x in CollList[1:] ), list( CollOuts )
+
+
+@pytest.mark.parametrize( "EngineArgs", [ [ "--engine", "array" ],
+                                          [ "--engine", "lanes",
+                                            "--lanes", 3 ] ] )
+def test_philox_shards_merge( wg, tmp_path, EngineArgs ):
+    """A philox run in two shards and merged is the same as a single run.
+    With 3 lanes the shard boundary is inside a lane group."""
+    RunArgs = [ 1, "--num_real", 4, "--seeding", "philox", "--backend",
+                "numpy", "--quiet" ] + EngineArgs
+    wg.run( *RunArgs )
+    Sharded = WGT.WGRunner( tmp_path / "shards" )
+    for Shard in [ "1/2", "2/2" ]:
+        Sharded.run( *( RunArgs + [ "--shard", Shard ] ) )
+    # end for
+    Sharded.run( 1, "--num_real", 4, "--merge" )
+    assert Sharded.collOuts() == wg.collOuts()
+    for RealNum in range( 1, 5, 1 ):
+        assert readReal( Sharded, RealNum ).equals( readReal( wg, RealNum ) )
+    # end for
+
+
+def test_resume( wg ):
+    """A stopped run resumes from its checkpoint to the same outputs"""
+    RunArgs = [ 1, "--num_real", 4, "--engine", "array", "--quiet" ]
+    wg.run( *RunArgs )
+    FullColl = wg.collOuts()
+    FullR4 = readReal( wg, 4 )
+    # stop after two realizations, the header line and two records
+    CkptFP = wg.simPath( "Frio_Checkpoint.jsonl" )
+    with open( CkptFP, "r" ) as IF:
+        CkptLines = IF.readlines()
+    # end with
+    with open( CkptFP, "w" ) as OF:
+        OF.writelines( CkptLines[:3] )
+    # end with
+    for RealNum in [ 3, 4 ]:
+        os.remove( wg.simPath( "Frio_R%d_DF.pickle" % RealNum ) )
+    # end for
+    Proc = wg.run( *( RunArgs + [ "--resume" ] ) )
+    assert "Resuming with 2 of 4 realizations already complete" in Proc.stdout
+    assert wg.collOuts() == FullColl
+    assert readReal( wg, 4 ).equals( FullR4 )
+
+
+def test_temp_kernel_matches_numpy():
+    """The Numba compiled temperature kernel matches the NumPy version"""
+    pytest.importorskip( "numba" )
+    import EAAWG_Inputs as WGI
+    import EAAWG_OtherWeather as WGOW
+    # start
+    WGOW.USE_COMPILED = True
+    TempKernel = WGOW.getTempKernel()
+    assert TempKernel is not WGOW.tempSeriesNumPy
+    rng = np.random.default_rng( 20230815 )
+    TotDays = 1096
+    epsOne = rng.standard_normal( TotDays )
+    epsOne[[ 10, 500 ]] = np.nan
+    epsArr = np.repeat( epsOne.reshape( TotDays, 1 ), 2, axis=1 )
+    wetArr = rng.random( TotDays ) < 0.3
+    dIndex = np.arange( TotDays, dtype=np.int64 ) % 366
+    AMat = np.array( WGI.A_DATA_LIST, dtype=np.float64 )
+    BMat = np.array( WGI.B_DATA_LIST, dtype=np.float64 )
+    doyArr = np.arange( 366, dtype=np.float64 )
+    seasonal = np.sin( 2.0 * np.pi * ( doyArr - 100.0 ) / 366.0 )
+    climArr = np.vstack( [ 24.0 + 8.0 * seasonal, 10.0 + 0.5 * seasonal,
+                           14.0 + 8.0 * seasonal, 10.0 + 0.5 * seasonal,
+                           26.0 + 9.0 * seasonal, 10.5 + 0.5 * seasonal,
+                           16.0 + 9.0 * seasonal, 10.5 + 0.5 * seasonal ] )
+    KernArgs = ( epsArr, wetArr, dIndex, AMat, BMat, climArr,
+                 float( WGOW.SIGMA_THRESH ), float( WGOW.MIN_DAILY_DELTA ) )
+    maxDiff = np.abs( TempKernel( *KernArgs ) -
+                      WGOW.tempSeriesNumPy( *KernArgs ) ).max()
+    assert maxDiff <= 1.0e-14
+
+
+#EOF